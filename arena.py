@@ -0,0 +1,392 @@
+"""
+Multi-snake arena for the Snake Game.
+
+Two to sixteen snakes share one arena, one of them optionally steered from
+the keyboard and the rest by bots. All snakes move at once each tick:
+
+- Tails that are not growing leave their cell this tick, so a head may
+  follow any tail.
+- A snake dies if its head leaves the arena, enters a cell held by any
+  snake's body, or enters the same cell as another head (all of those
+  heads die). Two heads swapping cells run into each other's necks, so
+  both die.
+- Dead snakes are removed; the last snake alive wins, or the highest score
+  if the rest die together.
+
+Collisions are resolved in one pass over the snakes against a shared
+occupancy grid holding the ID of the snake in every cell, so a tick costs
+O(snakes) however long they grow instead of O(snakes x length). Snakes are
+always processed in ID order and food is drawn from a seeded generator, so
+a game plays out the same every time given the same moves.
+
+Usage:
+    python arena.py [--snakes 4] [--no-human]   # play against bots
+    python arena.py --check                     # compare with a naive collision scan
+    python arena.py --benchmark                 # ticks per second for 2 to 16 snakes
+"""
+
+import argparse
+import random
+import time
+from collections import deque
+from itertools import islice
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pygame
+
+from bots import DIRECTIONS, is_opposite
+from snake_game import (BLACK, BLUE, CELL_CENTERS, FRAME_WIDTH, GRID_HEIGHT, GRID_SIZE, GRID_WIDTH, INITIAL_SPEED,
+                        KEY_DIRECTIONS, SEGMENT_RECTS, WHITE, WINDOW_HEIGHT, WINDOW_WIDTH, Direction, Food, Snake,
+                        play_mode)
+
+MIN_SNAKES = 2
+MAX_SNAKES = 16
+EMPTY = 0  # Grid value of a free cell; snake ID + 1 otherwise
+START_LENGTH = 3
+# One colour per snake; the first one is the player's
+SNAKE_COLORS = [
+    (0, 200, 0), (230, 60, 60), (60, 120, 255), (240, 200, 40),
+    (200, 80, 220), (40, 210, 210), (255, 140, 0), (160, 160, 160),
+    (120, 255, 120), (255, 130, 170), (150, 110, 60), (110, 90, 255),
+    (190, 255, 60), (0, 150, 120), (255, 255, 255), (120, 40, 40),
+]
+
+
+def cell_index(x: int, y: int) -> int:
+    """Return the grid index of cell (x, y)."""
+    return y * GRID_WIDTH + x
+
+
+class ArenaGame:
+    """Several snakes moving simultaneously in one arena."""
+
+    def __init__(self, snakes: int = 4, rng=None, food_count: Optional[int] = None):
+        """Create an arena for ``snakes`` snakes.
+
+        ``rng`` is an optional ``random.Random`` used for reproducible games.
+        ``food_count`` apples are on the board at once (half the number of
+        snakes, at least one, by default).
+        """
+        if not MIN_SNAKES <= snakes <= MAX_SNAKES:
+            raise ValueError(f"An arena holds {MIN_SNAKES} to {MAX_SNAKES} snakes, not {snakes}")
+        self.rng = rng if rng is not None else random.Random()
+        self.count = snakes
+        self.food_count = food_count if food_count is not None else max(1, snakes // 2)
+        self.reset()
+
+    def reset(self):
+        """Start a new game with every snake back at its starting place."""
+        self.grid = bytearray(GRID_WIDTH * GRID_HEIGHT)
+        self.snakes: List[Snake] = []
+        self.alive = [True] * self.count
+        self.scores = [0] * self.count
+        self.ticks = 0
+        for snake_id in range(self.count):
+            snake = Snake()
+            # One row each; even IDs start on the left heading right, odd ones on the right heading left
+            row = (snake_id + 1) * GRID_HEIGHT // (self.count + 1)
+            if snake_id % 2:
+                x = GRID_WIDTH - START_LENGTH - 1
+                snake.body = deque((x + i, row) for i in range(START_LENGTH))
+                snake.direction = Direction.LEFT
+            else:
+                snake.body = deque((START_LENGTH - i, row) for i in range(START_LENGTH))
+            for x, y in snake.body:
+                self.grid[cell_index(x, y)] = snake_id + 1
+            self.snakes.append(snake)
+        self.foods: List[Food] = []
+        for _ in range(self.food_count):
+            food = Food(self.rng)
+            self.foods.append(food)
+            self._place_food(food)
+
+    @property
+    def finished(self) -> bool:
+        """True once at most one snake is left."""
+        return sum(self.alive) <= 1
+
+    def winner(self) -> Optional[int]:
+        """Return the ID of the last snake alive, or the best scorer if none is; None while playing or tied."""
+        if not self.finished:
+            return None
+        living = [snake_id for snake_id in range(self.count) if self.alive[snake_id]]
+        if living:
+            return living[0]
+        best = max(self.scores)
+        leaders = [snake_id for snake_id in range(self.count) if self.scores[snake_id] == best]
+        return leaders[0] if len(leaders) == 1 else None
+
+    def occupant(self, position: Tuple[int, int]) -> Optional[int]:
+        """Return the ID of the snake in ``position``, or None if it is free (or off the board)."""
+        x, y = position
+        if not (0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT):
+            return None
+        value = self.grid[cell_index(x, y)]
+        return value - 1 if value != EMPTY else None
+
+    def is_blocked(self, position: Tuple[int, int]) -> bool:
+        """Return True if moving into ``position`` now would be fatal, ignoring other heads' moves."""
+        x, y = position
+        return not (0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT) or self.grid[cell_index(x, y)] != EMPTY
+
+    def _place_food(self, food: Food):
+        """Move ``food`` to a random cell free of snakes and other food."""
+        taken = {other.position for other in self.foods if other is not food}
+        while True:
+            x, y = food.generate_position()
+            if self.grid[cell_index(x, y)] == EMPTY and (x, y) not in taken:
+                food.position = (x, y)
+                return
+
+    def update(self) -> List[int]:
+        """Move every living snake one cell; returns the IDs of the snakes that died."""
+        grid = self.grid
+        moving = [snake_id for snake_id in range(self.count) if self.alive[snake_id]]
+        targets = []
+        heads: Dict[Tuple[int, int], int] = {}
+        for snake_id in moving:
+            snake = self.snakes[snake_id]
+            head_x, head_y = snake.body[0]
+            dx, dy = snake.direction.value
+            target = (head_x + dx, head_y + dy)
+            targets.append(target)
+            heads[target] = heads.get(target, 0) + 1
+            if not snake.grow_pending:
+                # Tails leave before heads arrive
+                tail_x, tail_y = snake.body[-1]
+                grid[cell_index(tail_x, tail_y)] = EMPTY
+
+        dead = []
+        survivors = []
+        for snake_id, target in zip(moving, targets):
+            x, y = target
+            if (not (0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT) or grid[cell_index(x, y)] != EMPTY
+                    or heads[target] > 1):
+                dead.append(snake_id)
+            else:
+                survivors.append(snake_id)
+
+        for snake_id in dead:
+            self.alive[snake_id] = False
+            for x, y in self.snakes[snake_id].body:
+                grid[cell_index(x, y)] = EMPTY
+
+        food_cells = {food.position: food for food in self.foods}
+        eaten = []
+        for snake_id in survivors:
+            snake = self.snakes[snake_id]
+            snake.move()
+            x, y = snake.body[0]
+            grid[cell_index(x, y)] = snake_id + 1
+            food = food_cells.get((x, y))
+            if food is not None:
+                snake.grow()
+                self.scores[snake_id] += 10
+                eaten.append(food)
+        for food in eaten:
+            self._place_food(food)
+        self.ticks += 1
+        return dead
+
+
+def naive_deaths(arena: ArenaGame) -> List[int]:
+    """Return the snakes that die on the next tick, found by scanning every body.
+
+    Reference for ``ArenaGame.update``, which must agree with it.
+    """
+    moving = [snake_id for snake_id in range(arena.count) if arena.alive[snake_id]]
+    targets = {}
+    for snake_id in moving:
+        snake = arena.snakes[snake_id]
+        dx, dy = snake.direction.value
+        targets[snake_id] = (snake.body[0][0] + dx, snake.body[0][1] + dy)
+    dead = []
+    for snake_id in moving:
+        x, y = target = targets[snake_id]
+        if not (0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT):
+            dead.append(snake_id)
+            continue
+        if any(other != snake_id and targets[other] == target for other in moving):
+            dead.append(snake_id)
+            continue
+        for other in moving:
+            body = arena.snakes[other].body
+            # The tail moves away unless the snake is growing
+            remaining = body if arena.snakes[other].grow_pending else islice(body, len(body) - 1)
+            if target in remaining:
+                dead.append(snake_id)
+                break
+    return dead
+
+
+class ArenaBot:
+    """Heads for the nearest apple, avoiding cells that are or may become occupied."""
+
+    def __init__(self, rng: Optional[random.Random] = None):
+        """Create the bot with an optional random number generator for tie breaks."""
+        self.rng = rng if rng is not None else random.Random()
+
+    def choose_direction(self, arena: ArenaGame, snake_id: int) -> Direction:
+        """Return the direction for snake ``snake_id`` this tick."""
+        snake = arena.snakes[snake_id]
+        head_x, head_y = snake.body[0]
+        rival_targets = set()
+        for other in range(arena.count):
+            if other != snake_id and arena.alive[other]:
+                other_x, other_y = arena.snakes[other].body[0]
+                rival_targets.update((other_x + dx, other_y + dy) for dx, dy in ((0, 1), (0, -1), (1, 0), (-1, 0)))
+
+        options = []
+        for direction in DIRECTIONS:
+            if is_opposite(snake.direction, direction):
+                continue
+            dx, dy = direction.value
+            target = (head_x + dx, head_y + dy)
+            if arena.is_blocked(target):
+                continue
+            distance = min(abs(target[0] - fx) + abs(target[1] - fy) for fx, fy in (f.position for f in arena.foods))
+            # Free neighbours keep the bot out of dead ends; cells rival heads can reach are risky
+            room = sum(not arena.is_blocked((target[0] + ex, target[1] + ey))
+                       for ex, ey in ((0, 1), (0, -1), (1, 0), (-1, 0)))
+            options.append((target in rival_targets, room == 0, distance, self.rng.random(), direction))
+        if not options:
+            return snake.direction
+        return min(options)[-1]
+
+
+def draw_arena(screen: pygame.Surface, arena: ArenaGame, font: pygame.font.Font, human: Optional[int]):
+    """Draw the arena, snakes, apples and scores."""
+    screen.fill(BLACK)
+    pygame.draw.rect(screen, BLUE, pygame.Rect(0, 0, WINDOW_WIDTH, WINDOW_HEIGHT), FRAME_WIDTH)
+    for food in arena.foods:
+        food.draw(screen)
+    for snake_id, snake in enumerate(arena.snakes):
+        if not arena.alive[snake_id]:
+            continue
+        if snake_id == human:
+            snake.draw(screen)
+            continue
+        color = SNAKE_COLORS[snake_id]
+        for cell in islice(snake.body, 1, None):
+            pygame.draw.rect(screen, color, SEGMENT_RECTS[cell], border_radius=6)
+        pygame.draw.circle(screen, color, CELL_CENTERS[snake.body[0]], GRID_SIZE // 2)
+        pygame.draw.circle(screen, WHITE, CELL_CENTERS[snake.body[0]], GRID_SIZE // 2, 2)
+    for snake_id in range(arena.count):
+        label = "You" if snake_id == human else f"Bot {snake_id}"
+        color = SNAKE_COLORS[snake_id] if arena.alive[snake_id] else (80, 80, 80)
+        screen.blit(font.render(f"{label}: {arena.scores[snake_id]}", True, color),
+                    (10 + (snake_id % 8) * 98, 8 + (snake_id // 8) * 20))
+    if arena.finished:
+        winner = arena.winner()
+        text = "Draw" if winner is None else ("You win!" if winner == human else f"Bot {winner} wins")
+        message = font.render(f"{text}  R: play again  ESC: quit", True, WHITE)
+        screen.blit(message, message.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)))
+
+
+def play(snakes: int, human: bool, speed: float):
+    """Play an arena game in a window: snake 0 from the keyboard (if ``human``), the rest by bots."""
+    arena = ArenaGame(snakes)
+    player = 0 if human else None
+    bots = {snake_id: ArenaBot() for snake_id in range(snakes) if snake_id != player}
+
+    def frame(screen, font, keys):
+        for key in keys:
+            if key == pygame.K_r and arena.finished:
+                arena.reset()
+            elif key in KEY_DIRECTIONS and player is not None:
+                arena.snakes[player].change_direction(KEY_DIRECTIONS[key])
+        if not arena.finished:
+            for snake_id, bot in bots.items():
+                if arena.alive[snake_id]:
+                    arena.snakes[snake_id].change_direction(bot.choose_direction(arena, snake_id))
+            arena.update()
+        draw_arena(screen, arena, font, player)
+        return speed
+
+    play_mode("Snake Arena", 22, frame)
+
+
+def steer_all(arena: ArenaGame, bots: Sequence[ArenaBot]):
+    """Let a bot choose the direction of every living snake."""
+    for snake_id, bot in enumerate(bots):
+        if arena.alive[snake_id]:
+            arena.snakes[snake_id].change_direction(bot.choose_direction(arena, snake_id))
+
+
+def check(seeds, max_ticks: int = 2000) -> int:
+    """Play bot games and compare every tick with ``naive_deaths`` and a rebuilt grid.
+
+    Raises AssertionError on the first disagreement; returns the ticks checked.
+    """
+    ticks = 0
+    for seed in seeds:
+        rng = random.Random(seed)
+        arena = ArenaGame(rng.randint(MIN_SNAKES, MAX_SNAKES), random.Random(seed))
+        # Noisy bots collide with each other more often
+        bots = [ArenaBot(random.Random(seed * 100 + i)) for i in range(arena.count)]
+        while not arena.finished and arena.ticks < max_ticks:
+            steer_all(arena, bots)
+            for snake_id in range(arena.count):
+                if rng.random() < 0.05:
+                    arena.snakes[snake_id].change_direction(rng.choice(DIRECTIONS))
+            expected = naive_deaths(arena)
+            dead = arena.update()
+            assert dead == expected, f"seed {seed} tick {arena.ticks}: {dead} died, expected {expected}"
+            grid = bytearray(GRID_WIDTH * GRID_HEIGHT)
+            for snake_id, snake in enumerate(arena.snakes):
+                if arena.alive[snake_id]:
+                    for x, y in snake.body:
+                        assert grid[cell_index(x, y)] == EMPTY, f"seed {seed} tick {arena.ticks}: overlap"
+                        grid[cell_index(x, y)] = snake_id + 1
+            assert grid == arena.grid, f"seed {seed} tick {arena.ticks}: grid out of date"
+            ticks += 1
+    return ticks
+
+
+def benchmark(ticks: int = 5000):
+    """Print the time per tick of the occupancy grid and of a naive body scan for 2 to 16 bot snakes."""
+    for snakes in (2, 4, 8, 16):
+        arena = ArenaGame(snakes, random.Random(0))
+        grid_time = naive_time = 0.0
+        done = segments = 0
+        while done < ticks:
+            arena.reset()
+            bots = [ArenaBot(random.Random(i)) for i in range(snakes)]
+            while not arena.finished and done < ticks:
+                steer_all(arena, bots)
+                start = time.perf_counter()
+                naive_deaths(arena)
+                naive_time += time.perf_counter() - start
+                start = time.perf_counter()
+                arena.update()
+                grid_time += time.perf_counter() - start
+                segments += sum(len(arena.snakes[i].body) for i in range(snakes) if arena.alive[i])
+                done += 1
+        print(f"{snakes:2d} snakes, {segments / done:5.0f} segments on average: "
+              f"occupancy grid {grid_time / done * 1e6:6.1f} us/tick, naive scan {naive_time / done * 1e6:6.1f} us/tick")
+
+
+def main(argv=None):
+    """Command line entry point for the arena."""
+    parser = argparse.ArgumentParser(description="Several snakes in one arena")
+    parser.add_argument("--snakes", type=int, default=4, help=f"{MIN_SNAKES} to {MAX_SNAKES}")
+    parser.add_argument("--no-human", action="store_true", help="Only bots play")
+    parser.add_argument("--speed", type=float, default=INITIAL_SPEED, help="Ticks per second")
+    parser.add_argument("--check", action="store_true", help="Verify collisions against a naive scan")
+    parser.add_argument("--benchmark", action="store_true", help="Measure update speed")
+    parser.add_argument("--seeds", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    if args.check or args.benchmark:
+        if args.check:
+            print(f"Occupancy grid agrees with a naive scan on {check(range(args.seeds))} ticks")
+        if args.benchmark:
+            benchmark()
+        return
+    if not MIN_SNAKES <= args.snakes <= MAX_SNAKES:
+        parser.error(f"--snakes must be between {MIN_SNAKES} and {MAX_SNAKES}")
+    play(args.snakes, not args.no_human, args.speed)
+
+
+if __name__ == "__main__":
+    main()
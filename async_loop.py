@@ -0,0 +1,189 @@
+"""
+Asyncio game loop for the Snake Game.
+
+``AsyncGameLoop`` runs the game as a coroutine that ticks against the event
+loop's monotonic clock and sleeps with ``asyncio.sleep`` in between, so
+other coroutines get the rest of each frame. Direction sources are async
+iterators of ``Direction`` values; each one is consumed by its own task and
+steers the snake as values arrive, alongside the keyboard:
+
+- ``tcp_controller`` accepts network controllers sending one direction
+  name (UP, DOWN, LEFT, RIGHT) per line.
+- ``bot_source`` asks a bot for a move every tick. The bot runs in an
+  executor (a process pool by default on the command line), given the
+  state in the ``savegame`` format, so slow decisions never stall a frame.
+  Decisions that arrive after the snake has already moved on are dropped.
+- ``replay_source`` feeds a recorded list of directions, one per tick.
+
+Usage:
+    python async_loop.py [--listen 127.0.0.1:5555] [--bot bots:GreedyBot] [--threads]
+"""
+
+import argparse
+import asyncio
+import random
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import AsyncIterable, AsyncIterator, Iterable, List, Optional
+
+import pygame
+
+import savegame
+from snake_game import Direction, Game, GameLogic, GameState
+
+
+class AsyncGameLoop:
+    """Runs a Game on an asyncio event loop and feeds it directions from I/O sources."""
+
+    def __init__(self, game: Game):
+        """Create the loop for ``game``."""
+        self.game = game
+        self.sources: List[AsyncIterable[Direction]] = []
+        self._ticked: Optional[asyncio.Event] = None
+
+    def add_source(self, source: AsyncIterable[Direction]):
+        """Steer the snake with the directions produced by ``source`` once the loop runs."""
+        self.sources.append(source)
+
+    def steer(self, direction: Direction):
+        """Turn the snake, as the arrow keys do."""
+        if self.game.state == GameState.PLAYING:
+            self.game.snake.change_direction(direction)
+
+    async def next_tick(self):
+        """Wait until the game has ticked."""
+        await self._ticked.wait()
+
+    async def _feed(self, source: AsyncIterable[Direction]):
+        """Steer with every direction from ``source``."""
+        async for direction in source:
+            self.steer(direction)
+
+    async def run(self):
+        """Run the game until the player quits.
+
+        Ticks are scheduled at ``1 / speed`` intervals of the event loop's
+        clock. A tick that runs late is not made up for, as with
+        ``pygame.time.Clock``. An exception in a source ends the game.
+        """
+        loop = asyncio.get_running_loop()
+        self._ticked = asyncio.Event()
+        tasks = [loop.create_task(self._feed(source)) for source in self.sources]
+        try:
+            next_tick = loop.time()
+            while self.game.frame():
+                # Wake everything waiting for this tick, then start collecting waiters for the next
+                self._ticked.set()
+                self._ticked = asyncio.Event()
+                for task in tasks:
+                    if task.done() and not task.cancelled() and task.exception() is not None:
+                        raise task.exception()
+                next_tick += 1 / self.game.speed
+                now = loop.time()
+                if next_tick < now:
+                    next_tick = now
+                await asyncio.sleep(next_tick - now)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # The busy loop restarts its frame timing from here
+            self.game.clock.tick()
+
+
+def decide(bot, data: bytes) -> Direction:
+    """Return ``bot``'s move for a game serialized with ``savegame.dumps``.
+
+    Module-level so that it can run in a process pool.
+    """
+    game = GameLogic(random.Random(0))
+    savegame.loads(data, game)
+    game.state = GameState.PLAYING
+    return bot.choose_direction(game)
+
+
+async def bot_source(loop: AsyncGameLoop, bot, executor: Optional[Executor] = None) -> AsyncIterator[Direction]:
+    """Yield ``bot``'s move for each tick in which the game is being played.
+
+    ``bot`` must be picklable if ``executor`` is a process pool; None uses
+    the event loop's default thread pool.
+    """
+    event_loop = asyncio.get_running_loop()
+    while True:
+        await loop.next_tick()
+        game = loop.game
+        if game.state != GameState.PLAYING:
+            continue
+        moves = game.moves
+        direction = await event_loop.run_in_executor(executor, decide, bot, savegame.dumps(game, include_rng=False))
+        if game.moves == moves and game.state == GameState.PLAYING:
+            yield direction
+
+
+async def replay_source(loop: AsyncGameLoop, directions: Iterable[Direction]) -> AsyncIterator[Direction]:
+    """Yield ``directions`` one per tick in which the game is being played."""
+    for direction in directions:
+        await loop.next_tick()
+        while loop.game.state != GameState.PLAYING:
+            await loop.next_tick()
+        yield direction
+
+
+async def tcp_controller(host: str, port: int) -> AsyncIterator[Direction]:
+    """Yield directions sent by TCP clients as lines of UP, DOWN, LEFT or RIGHT.
+
+    Any number of clients may connect; unknown lines are ignored.
+    """
+    directions: asyncio.Queue = asyncio.Queue()
+
+    async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            async for line in reader:
+                name = line.decode("ascii", "replace").strip().upper()
+                if name in Direction.__members__:
+                    directions.put_nowait(Direction[name])
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(serve, host, port)
+    try:
+        while True:
+            yield await directions.get()
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def parse_address(text: str):
+    """Parse a ``HOST:PORT`` string."""
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def main(argv=None):
+    """Command line entry point for the asyncio game loop."""
+    parser = argparse.ArgumentParser(description="Play the Snake Game on an asyncio event loop")
+    parser.add_argument("--listen", type=parse_address, metavar="HOST:PORT",
+                        help="Accept directions from network controllers")
+    parser.add_argument("--bot", metavar="MODULE:CLASS", help="Let a bot play, e.g. bots:GreedyBot")
+    parser.add_argument("--threads", action="store_true", help="Run the bot in a thread instead of a process")
+    args = parser.parse_args(argv)
+
+    game = Game()
+    loop = AsyncGameLoop(game)
+    if args.listen:
+        loop.add_source(tcp_controller(*args.listen))
+    executor = None
+    if args.bot:
+        from tournament import load_bot
+        executor = ThreadPoolExecutor(1) if args.threads else ProcessPoolExecutor(1)
+        loop.add_source(bot_source(loop, load_bot(args.bot), executor))
+    try:
+        asyncio.run(loop.run())
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
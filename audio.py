@@ -0,0 +1,245 @@
+"""
+Sound effects for the Snake Game.
+
+The game plays a sound when the snake turns, eats an apple, opens the
+portal and dies. To keep the delay between the event and the sound short:
+
+- The mixer is set up with a small buffer (``pygame.mixer.pre_init`` in
+  snake_game.py, before ``pygame.init``), so a sound starts within about
+  12 ms of being played instead of the default ~50 ms.
+- Every sound is decoded once when the game starts into a ``SoundBank``
+  of mixer-ready buffers. Sounds are read from ``NAME.wav`` or ``NAME.ogg``
+  in the sounds directory when there is one, and otherwise synthesized
+  with NumPy, so the game needs no sound files.
+- ``AudioPlayer`` owns a fixed set of reserved mixer channels. When they
+  are all busy, a new sound takes the channel of the least important
+  sound playing (the oldest of those), or is dropped if everything playing
+  matters more: a turn click never cuts off the death sound.
+- Starting a channel takes the mixer lock, which the audio thread holds
+  while it mixes. The game therefore only puts the name of the sound on a
+  queue, which never blocks, and a background thread starts it.
+
+Usage:
+    python audio.py                  # play every sound in turn
+    python audio.py --benchmark      # cost of a play call on the game thread
+"""
+
+import argparse
+import os
+import queue
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import pygame
+
+from snake_game import GameEvent
+
+SOUND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sounds")
+SOUND_EXTENSIONS = (".wav", ".ogg")
+VOICES = 4  # Mixer channels reserved for sound effects
+
+# Sounds by priority: a sound may take the channel of one with the same or lower priority
+SOUND_PRIORITIES = {"turn": 0, "eat": 1, "portal": 2, "death": 3}
+SOUND_VOLUMES = {"turn": 0.25, "eat": 0.5, "portal": 0.5, "death": 0.7}
+EVENT_SOUNDS = {
+    GameEvent.APPLE_EATEN: "eat",
+    GameEvent.PORTAL_OPEN: "portal",
+    GameEvent.DEATH: "death",
+}
+
+
+def tone(rate: int, duration: float, start: float, end: float, decay: float = 0.0,
+         harmonics: float = 0.0) -> np.ndarray:
+    """Return a sine sweep from ``start`` to ``end`` Hz as floats in [-1, 1].
+
+    ``decay`` is how fast the volume falls, per second; ``harmonics`` mixes
+    in that much of the second and third harmonics for a brighter sound.
+    """
+    t = np.arange(int(rate * duration)) / rate
+    frequency = start * (end / start) ** (t / duration)
+    phase = 2 * np.pi * np.cumsum(frequency) / rate
+    wave = np.sin(phase) + harmonics * (0.5 * np.sin(2 * phase) + 0.25 * np.sin(3 * phase))
+    envelope = np.exp(-decay * t) * np.minimum(1.0, t / 0.003)  # 3 ms attack avoids a click
+    envelope[-int(rate * 0.005):] *= np.linspace(1.0, 0.0, int(rate * 0.005))
+    return wave * envelope / (1.0 + 0.75 * harmonics)
+
+
+def synthesize(name: str, rate: int) -> np.ndarray:
+    """Return the built-in sound ``name`` as floats in [-1, 1] at ``rate`` samples per second."""
+    if name == "turn":
+        return tone(rate, 0.03, 1400, 1200, decay=120, harmonics=0.5)
+    if name == "eat":
+        return tone(rate, 0.09, 520, 1040, decay=25, harmonics=0.3)
+    if name == "portal":
+        notes = [tone(rate, 0.11, f, f, decay=8, harmonics=0.2) for f in (523.3, 659.3, 784.0, 1046.5)]
+        wave = np.concatenate(notes)
+        t = np.arange(len(wave)) / rate
+        return wave * (0.8 + 0.2 * np.sin(2 * np.pi * 12 * t))
+    if name == "death":
+        wave = tone(rate, 0.7, 440, 55, decay=3, harmonics=0.8)
+        noise = np.random.default_rng(0).uniform(-1.0, 1.0, len(wave)) * np.exp(-8 * np.arange(len(wave)) / rate)
+        return 0.8 * wave + 0.2 * noise
+    raise KeyError(name)
+
+
+def make_sound(wave: np.ndarray) -> pygame.mixer.Sound:
+    """Convert floats in [-1, 1] to a Sound in the mixer's sample format."""
+    _, size, channels = pygame.mixer.get_init()
+    bits = abs(size)
+    if bits == 32:
+        samples = wave.astype(np.float32)
+    else:
+        scale = 2 ** (bits - 1) - 1
+        samples = np.round(wave * scale).astype(np.int16 if bits == 16 else np.int8)
+        if size > 0:  # Unsigned formats are offset by half the range
+            unsigned = np.uint16 if bits == 16 else np.uint8
+            samples = (samples.astype(np.int32) + scale + 1).astype(unsigned)
+    if channels > 1:
+        samples = np.repeat(samples[:, None], channels, axis=1)
+    return pygame.sndarray.make_sound(np.ascontiguousarray(samples))
+
+
+class SoundBank:
+    """Every sound effect, decoded once into memory."""
+
+    def __init__(self, directory: Optional[str] = SOUND_DIR):
+        """Load the sounds from ``directory``, synthesizing any that are not there.
+
+        Raises ``pygame.error`` if the mixer cannot be opened (for example
+        when there is no audio device).
+        """
+        if pygame.mixer.get_init() is None:
+            pygame.mixer.init()
+        rate = pygame.mixer.get_init()[0]
+        self.sounds: Dict[str, pygame.mixer.Sound] = {}
+        self.files: Dict[str, str] = {}
+        for name in SOUND_PRIORITIES:
+            path = self._find(directory, name)
+            if path is not None:
+                sound = pygame.mixer.Sound(path)
+                self.files[name] = path
+            else:
+                sound = make_sound(synthesize(name, rate))
+            sound.set_volume(SOUND_VOLUMES[name])
+            self.sounds[name] = sound
+
+    @staticmethod
+    def _find(directory: Optional[str], name: str) -> Optional[str]:
+        """Return the file for sound ``name`` in ``directory``, if there is one."""
+        if directory is None:
+            return None
+        for extension in SOUND_EXTENSIONS:
+            path = os.path.join(directory, name + extension)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def __getitem__(self, name: str) -> pygame.mixer.Sound:
+        return self.sounds[name]
+
+
+class AudioPlayer:
+    """Plays sounds from a SoundBank on reserved channels without blocking the caller."""
+
+    def __init__(self, bank: SoundBank, voices: int = VOICES):
+        """Reserve the first ``voices`` mixer channels and start the playing thread."""
+        self.bank = bank
+        if pygame.mixer.get_num_channels() < voices:
+            pygame.mixer.set_num_channels(voices)
+        pygame.mixer.set_reserved(voices)
+        self.channels = [pygame.mixer.Channel(i) for i in range(voices)]
+        # (priority, start number) of the sound last started on each channel
+        self.voices = [(-1, 0)] * voices
+        self.started = 0
+        self.stolen = 0
+        self.dropped = 0
+        self._requests: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="audio", daemon=True)
+        self._thread.start()
+
+    def play(self, name: str):
+        """Play sound ``name`` as soon as possible; returns at once."""
+        self._requests.put(name)
+
+    def on_game_event(self, event: GameEvent, game):
+        """Game listener playing the sound for ``event``, if it has one."""
+        name = EVENT_SOUNDS.get(event)
+        if name is not None:
+            self._requests.put(name)
+
+    def close(self):
+        """Stop the playing thread once the sounds already asked for have started."""
+        self._requests.put(None)
+        self._thread.join(timeout=1.0)
+
+    def _run(self):
+        while True:
+            name = self._requests.get()
+            if name is None:
+                return
+            try:
+                self._start(name)
+            except pygame.error:  # The mixer was closed under us, e.g. by pygame.quit()
+                self.dropped += 1
+
+    def _start(self, name: str):
+        """Start ``name`` on a free channel, or on the least important busy one."""
+        priority = SOUND_PRIORITIES[name]
+        for index, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                break
+        else:
+            index = min(range(len(self.channels)), key=self.voices.__getitem__)
+            if self.voices[index][0] > priority:
+                self.dropped += 1
+                return
+            self.stolen += 1
+        self.started += 1
+        self.voices[index] = (priority, self.started)
+        self.channels[index].play(self.bank[name])
+
+
+def benchmark(calls: int = 10000):
+    """Print the cost on the calling thread of playing a sound directly and through AudioPlayer."""
+    bank = SoundBank()
+    player = AudioPlayer(bank)
+    channel = pygame.mixer.Channel(0)
+    names = list(SOUND_PRIORITIES)
+    timings = {}
+    start = time.perf_counter()
+    for i in range(calls):
+        channel.play(bank[names[i % len(names)]])
+    timings["Channel.play"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(calls):
+        player.play(names[i % len(names)])
+    timings["AudioPlayer.play"] = time.perf_counter() - start
+    player.close()
+    for label, elapsed in timings.items():
+        print(f"{label:17s} {elapsed / calls * 1e6:7.2f} us/call")
+    print(f"{player.started} started, {player.stolen} stolen, {player.dropped} dropped")
+
+
+def main(argv=None):
+    """Command line entry point for listening to the sounds and measuring them."""
+    parser = argparse.ArgumentParser(description="Snake Game sound effects")
+    parser.add_argument("--sounds", default=SOUND_DIR, help="Directory of NAME.wav or NAME.ogg files to use")
+    parser.add_argument("--benchmark", action="store_true", help="Measure the cost of a play call")
+    args = parser.parse_args(argv)
+    if args.benchmark:
+        benchmark()
+        return
+    bank = SoundBank(args.sounds)
+    player = AudioPlayer(bank)
+    for name in SOUND_PRIORITIES:
+        source = bank.files.get(name, "synthesized")
+        print(f"{name:7s} {bank[name].get_length():5.2f} s  ({source})")
+        player.play(name)
+        time.sleep(bank[name].get_length() + 0.2)
+    player.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""
+Monte-Carlo difficulty balancing for the Snake Game.
+
+Plays large numbers of seeded bot games for each candidate configuration of
+the tuning constants (speeds, apples per level and obstacle density) across
+a process pool and reports survival, death causes and per-level difficulty
+curves.
+
+Results are aggregated as they arrive with streaming statistics (Welford
+mean and variance, merged across processes), so memory use does not grow
+with the number of games. Each configuration stops early once its survival
+time and level 1 completion rate are known to within the requested
+tolerance, leaving the remaining compute to configurations that need it.
+
+The bot is ``SlowReactionBot``, which misses turns more often as the game
+speeds up, so speed settings affect the outcome as they would for people.
+
+Usage:
+    python balance.py [--initial-speed 8,10,12] [--apples-per-level 8,10] [--obstacle-density 0.6,0.7]
+                      [--workers 4] [--max-games 20000] [--tolerance 0.05]
+"""
+
+import argparse
+import itertools
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, NamedTuple
+
+import snake_game
+from bots import SlowReactionBot
+from snake_game import GameEvent, GameLogic, GameState
+
+# Two-sided 95% normal quantile
+Z_95 = 1.96
+
+
+class BalanceConfig(NamedTuple):
+    """Values of the tuning constants in ``snake_game`` for one experiment."""
+
+    initial_speed: float
+    speed_increment: float
+    max_speed: float
+    apples_per_level: int
+    obstacle_density: float
+
+    @classmethod
+    def current(cls) -> "BalanceConfig":
+        """Return the configuration currently set in ``snake_game``."""
+        return cls(snake_game.INITIAL_SPEED, snake_game.SPEED_INCREMENT, snake_game.MAX_SPEED,
+                   snake_game.APPLES_PER_LEVEL, snake_game.OBSTACLE_DENSITY)
+
+    def apply(self) -> "BalanceConfig":
+        """Set these values in ``snake_game`` and return the previous configuration."""
+        previous = BalanceConfig.current()
+        snake_game.INITIAL_SPEED = self.initial_speed
+        snake_game.SPEED_INCREMENT = self.speed_increment
+        snake_game.MAX_SPEED = self.max_speed
+        snake_game.APPLES_PER_LEVEL = self.apples_per_level
+        snake_game.OBSTACLE_DENSITY = self.obstacle_density
+        return previous
+
+    def describe(self) -> str:
+        """Return a one-line description."""
+        return " ".join(f"{name}={value:g}" for name, value in zip(self._fields, self))
+
+
+class RunningStats:
+    """Streaming count, mean and variance (Welford), mergeable across processes."""
+
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self):
+        """Start with no samples."""
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: float):
+        """Add one sample."""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other: "RunningStats"):
+        """Add all samples summarised by ``other`` (Chan et al.)."""
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    @property
+    def variance(self) -> float:
+        """Sample variance."""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def half_width(self) -> float:
+        """Half-width of the 95% confidence interval of the mean."""
+        return Z_95 * math.sqrt(self.variance / self.count) if self.count > 1 else math.inf
+
+
+class LevelStats:
+    """Attempts, completions and completion times of one level."""
+
+    __slots__ = ("attempts", "completions", "ticks", "deaths")
+
+    def __init__(self):
+        """Start with no attempts."""
+        self.attempts = 0
+        self.completions = 0
+        self.ticks = RunningStats()
+        self.deaths: Dict[str, int] = {}
+
+    @property
+    def completion_rate(self) -> float:
+        """Fraction of attempts that completed the level."""
+        return self.completions / self.attempts if self.attempts else 0.0
+
+    def completion_half_width(self) -> float:
+        """Half-width of the 95% Wilson score interval of the completion rate.
+
+        Unlike the normal approximation, it stays wide while every attempt
+        so far has failed (or succeeded).
+        """
+        if self.attempts == 0:
+            return math.inf
+        n = self.attempts
+        rate = self.completion_rate
+        z2 = Z_95 * Z_95
+        return Z_95 / (1 + z2 / n) * math.sqrt(rate * (1 - rate) / n + z2 / (4 * n * n))
+
+    def merge(self, other: "LevelStats"):
+        """Add the attempts summarised by ``other``."""
+        self.attempts += other.attempts
+        self.completions += other.completions
+        self.ticks.merge(other.ticks)
+        for cause, count in other.deaths.items():
+            self.deaths[cause] = self.deaths.get(cause, 0) + count
+
+
+class ConfigStats:
+    """Aggregated results of all games played with one configuration."""
+
+    __slots__ = ("games", "timeouts", "survival", "score", "deaths", "levels")
+
+    def __init__(self):
+        """Start with no games."""
+        self.games = 0
+        self.timeouts = 0
+        self.survival = RunningStats()  # Seconds of play before dying
+        self.score = RunningStats()
+        self.deaths: Dict[str, int] = {}
+        self.levels: Dict[int, LevelStats] = {}
+
+    def level(self, number: int) -> LevelStats:
+        """Return the stats of level ``number``, creating them if needed."""
+        stats = self.levels.get(number)
+        if stats is None:
+            stats = self.levels[number] = LevelStats()
+        return stats
+
+    def merge(self, other: "ConfigStats"):
+        """Add the games summarised by ``other``."""
+        self.games += other.games
+        self.timeouts += other.timeouts
+        self.survival.merge(other.survival)
+        self.score.merge(other.score)
+        for cause, count in other.deaths.items():
+            self.deaths[cause] = self.deaths.get(cause, 0) + count
+        for number, stats in other.levels.items():
+            self.level(number).merge(stats)
+
+    def converged(self, tolerance: float) -> bool:
+        """Return True once survival and level 1 completion are known within ``tolerance``.
+
+        Survival is compared relative to its mean, the completion rate in
+        absolute terms.
+        """
+        first = self.levels.get(1)
+        if first is None or self.survival.count < 2:
+            return False
+        return (self.survival.half_width() <= tolerance * self.survival.mean
+                and first.completion_half_width() <= tolerance)
+
+
+def play_batch(config: BalanceConfig, first_seed: int, games: int, max_ticks: int,
+               noise: float, slip_per_speed: float) -> ConfigStats:
+    """Play ``games`` seeded bot games with ``config`` and return their aggregated stats."""
+    previous = config.apply()
+    try:
+        stats = ConfigStats()
+        for seed in range(first_seed, first_seed + games):
+            _play_game(stats, seed, max_ticks, noise, slip_per_speed)
+        return stats
+    finally:
+        previous.apply()
+
+
+def _play_game(stats: ConfigStats, seed: int, max_ticks: int, noise: float, slip_per_speed: float):
+    """Play one game and add its outcome to ``stats``."""
+    game = GameLogic(random.Random(seed))
+    bot = SlowReactionBot(random.Random(seed ^ 0x5EED), noise, slip_per_speed)
+    level_ticks = 0
+    seconds = 0.0
+
+    def on_event(event, game):
+        nonlocal level_ticks
+        if event == GameEvent.GAME_START or event == GameEvent.LEVEL_START:
+            stats.level(game.level_manager.current_level).attempts += 1
+            level_ticks = 0
+        elif event == GameEvent.LEVEL_COMPLETE:
+            level = stats.level(game.level_manager.current_level)
+            level.completions += 1
+            level.ticks.add(level_ticks)
+
+    game.add_listener(on_event)
+    game.start_playing()
+    for _ in range(max_ticks):
+        if game.state == GameState.PLAYING:
+            game.snake.change_direction(bot.choose_direction(game))
+            seconds += 1.0 / game.speed
+            level_ticks += 1
+        elif game.state != GameState.LEVEL_TRANSITION:
+            break
+        game.update()
+
+    stats.games += 1
+    stats.score.add(game.score)
+    if game.state == GameState.GAME_OVER:
+        stats.survival.add(seconds)
+        cause = game.death_cause.value
+        stats.deaths[cause] = stats.deaths.get(cause, 0) + 1
+        level = stats.level(game.level_manager.current_level)
+        level.deaths[cause] = level.deaths.get(cause, 0) + 1
+    else:
+        # Still alive at the tick limit: censored, so left out of survival
+        stats.timeouts += 1
+
+
+def balance(configs: List[BalanceConfig], workers: int = 1, batch_size: int = 200, min_games: int = 1000,
+            max_games: int = 20000, tolerance: float = 0.05, max_ticks: int = 50000, noise: float = 0.05,
+            slip_per_speed: float = 0.004, seed: int = 0, progress=None) -> Dict[BalanceConfig, ConfigStats]:
+    """Play bot games for every configuration until converged or ``max_games`` is reached.
+
+    Every configuration plays the same seeds in the same order, so they are
+    compared on identical games. ``progress(config, stats)`` is called after
+    each merged batch.
+    """
+    results = {config: ConfigStats() for config in configs}
+    submitted = {config: 0 for config in configs}
+    active = list(configs)
+    pending = {}
+
+    with ProcessPoolExecutor(workers) as pool:
+        def submit_next():
+            # Round-robin over configurations still short of their game budget
+            for _ in range(len(active)):
+                config = active.pop(0)
+                active.append(config)
+                if submitted[config] < max_games:
+                    games = min(batch_size, max_games - submitted[config])
+                    future = pool.submit(play_batch, config, seed + submitted[config], games, max_ticks,
+                                         noise, slip_per_speed)
+                    pending[future] = config
+                    submitted[config] += games
+                    return True
+            return False
+
+        # Keep every worker busy with one batch queued behind it
+        while len(pending) < 2 * workers and submit_next():
+            pass
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                config = pending.pop(future)
+                stats = results[config]
+                stats.merge(future.result())
+                if progress is not None:
+                    progress(config, stats)
+                if config in active and stats.games >= min_games and stats.converged(tolerance):
+                    active.remove(config)
+            while len(pending) < 2 * workers and submit_next():
+                pass
+    return results
+
+
+def format_report(config: BalanceConfig, stats: ConfigStats, tolerance: float) -> str:
+    """Return a text report of one configuration's results."""
+    lines = [config.describe()]
+    status = "converged" if stats.converged(tolerance) else "game limit reached"
+    survival = stats.survival
+    lines.append(f"  games {stats.games} ({status}), survival {survival.mean:.1f} ± {survival.half_width():.1f} s, "
+                 f"score {stats.score.mean:.0f} ± {stats.score.half_width():.0f}, "
+                 f"still alive at tick limit {stats.timeouts}")
+    deaths = sum(stats.deaths.values())
+    if deaths:
+        lines.append("  deaths: " + ", ".join(f"{cause} {count / deaths:.0%}"
+                                               for cause, count in sorted(stats.deaths.items())))
+    lines.append("  level  attempts  completed          ticks to complete  deaths")
+    for number in sorted(stats.levels):
+        level = stats.levels[number]
+        ticks = (f"{level.ticks.mean:7.0f} ± {level.ticks.half_width():5.0f}"
+                 if level.ticks.count > 1 else f"{'-':>15s}")
+        causes = ", ".join(f"{cause} {count}" for cause, count in sorted(level.deaths.items()))
+        lines.append(f"  {number:5d}  {level.attempts:8d}  {level.completion_rate:6.1%} ± "
+                     f"{level.completion_half_width():5.1%}  {ticks}  {causes}")
+    return "\n".join(lines)
+
+
+def parse_values(kind):
+    """Return an argparse type that parses a comma-separated list of ``kind``."""
+    def parse(text: str):
+        return [kind(value) for value in text.split(",")]
+    return parse
+
+
+def main(argv=None):
+    """Command line entry point for the balancer."""
+    current = BalanceConfig.current()
+    parser = argparse.ArgumentParser(description="Monte-Carlo difficulty balancing with bot games")
+    parser.add_argument("--initial-speed", type=parse_values(float), default=[current.initial_speed])
+    parser.add_argument("--speed-increment", type=parse_values(float), default=[current.speed_increment])
+    parser.add_argument("--max-speed", type=parse_values(float), default=[current.max_speed])
+    parser.add_argument("--apples-per-level", type=parse_values(int), default=[current.apples_per_level])
+    parser.add_argument("--obstacle-density", type=parse_values(float), default=[current.obstacle_density])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=200, help="Games per task")
+    parser.add_argument("--min-games", type=int, default=1000)
+    parser.add_argument("--max-games", type=int, default=20000)
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="Target 95%% CI half-width: relative for survival, absolute for completion")
+    parser.add_argument("--max-ticks", type=int, default=50000, help="Tick limit per game")
+    parser.add_argument("--slip-per-speed", type=float, default=0.004,
+                        help="Chance per unit of speed that the bot misses a turn")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    configs = [BalanceConfig(*values) for values in itertools.product(
+        args.initial_speed, args.speed_increment, args.max_speed, args.apples_per_level, args.obstacle_density)]
+
+    def progress(config, stats):
+        print(f"\r{config.describe()}: {stats.games} games ", end="", flush=True)
+
+    start = time.perf_counter()
+    results = balance(configs, args.workers, args.batch_size, args.min_games, args.max_games, args.tolerance,
+                      args.max_ticks, slip_per_speed=args.slip_per_speed, seed=args.seed,
+                      progress=progress if sys.stdout.isatty() else None)
+    elapsed = time.perf_counter() - start
+    total = sum(stats.games for stats in results.values())
+    if sys.stdout.isatty():
+        print("\r\033[K", end="")
+    print(f"{total} games in {elapsed:.1f}s ({total / elapsed:.0f} games/s)")
+    for config in configs:
+        print()
+        print(format_report(config, results[config], args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
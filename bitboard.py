@@ -0,0 +1,483 @@
+"""
+Bitboard game engine for the Snake Game.
+
+``BitboardGame`` is a drop-in ``GameLogic`` whose board lives in Python ints
+used as bitboards: one bit per cell for the snake's body, the level's
+obstacles (built from ``LevelManager``), the walls and the portal opening.
+Collision tests, free-cell counts and neighbourhood queries are single
+bitwise operations instead of list scans.
+
+Bit ``(GRID_HEIGHT - y) * STRIDE + (x + 1)`` holds cell (x, y). The grid is
+padded by one wall column on each side, so horizontal shifts never wrap
+from one row into the next, and rows above the arena take the higher bits,
+so the portal shaft needs no size limit.
+
+Given the same seeded ``random.Random`` and the same directions, a
+BitboardGame consumes random numbers exactly like ``GameLogic``, reports the
+same events and ends up in the same state. ``food_placement="uniform"``
+instead picks the food cell in one draw from the free cells.
+
+Usage:
+    python bitboard.py --check [--seeds 20] [--steps 5000]
+    python bitboard.py --benchmark [--steps 100000]
+"""
+
+import argparse
+import random
+import time
+from collections import deque
+from typing import List, Optional, Tuple
+
+from bots import GreedyBot
+from compact import state_of
+from snake_game import (GRID_WIDTH, GRID_HEIGHT, MAX_SPEED, SPEED_INCREMENT, APPLES_PER_LEVEL, PORTAL_LEFT,
+                        PORTAL_RIGHT, DeathCause, Direction, GameEvent, GameLogic, GameState)
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(value: int) -> int:
+        """Return the number of set bits in ``value``."""
+        return bin(value).count("1")
+
+STRIDE = GRID_WIDTH + 2
+SHAFT_START = (GRID_HEIGHT + 1) * STRIDE  # First bit with y < 0
+IN_PLAY = (1 << SHAFT_START) - 1  # Every cell with y >= 0, including the bottom wall row
+
+# Bit shift of one step in each direction
+SHIFTS = {Direction.UP: STRIDE, Direction.DOWN: -STRIDE, Direction.LEFT: -1, Direction.RIGHT: 1}
+
+FOOD_PLACEMENTS = ("rejection", "uniform")
+
+
+def bit_index(x: int, y: int) -> int:
+    """Return the bit number of grid position (x, y)."""
+    return (GRID_HEIGHT - y) * STRIDE + x + 1
+
+
+def position(index: int) -> Tuple[int, int]:
+    """Return the grid position (x, y) of a bit number."""
+    row, column = divmod(index, STRIDE)
+    return column - 1, GRID_HEIGHT - row
+
+
+def mask_of(positions) -> int:
+    """Return a bitboard with the given (x, y) positions set."""
+    mask = 0
+    for x, y in positions:
+        mask |= 1 << bit_index(x, y)
+    return mask
+
+
+def positions_of(mask: int) -> List[Tuple[int, int]]:
+    """Return the (x, y) positions set in a bitboard, lowest bit first."""
+    result = []
+    while mask:
+        low = mask & -mask
+        result.append(position(low.bit_length() - 1))
+        mask ^= low
+    return result
+
+
+def neighbours(mask: int) -> int:
+    """Return the cells orthogonally adjacent to any cell of ``mask``.
+
+    The padding columns stop arena cells from reaching across rows, so
+    ``neighbours(mask) & ARENA`` only contains real neighbours.
+    """
+    return (mask << STRIDE) | (mask >> STRIDE) | (mask << 1) | (mask >> 1)
+
+
+def nth_set_bit(mask: int, n: int) -> int:
+    """Return the bit number of the ``n``-th (from 0) set bit of ``mask``."""
+    base = 0
+    while True:
+        chunk = mask & 0xFFFFFFFFFFFFFFFF
+        count = popcount(chunk)
+        if n < count:
+            break
+        n -= count
+        mask >>= 64
+        base += 64
+    for _ in range(n):
+        chunk &= chunk - 1
+    return base + (chunk & -chunk).bit_length() - 1
+
+
+ARENA = mask_of((x, y) for y in range(GRID_HEIGHT) for x in range(GRID_WIDTH))
+WALLS = mask_of((x, y) for y in range(-1, GRID_HEIGHT + 1) for x in range(-1, GRID_WIDTH + 1)) & ~ARENA
+PORTAL = mask_of((x, -1) for x in range(PORTAL_LEFT, PORTAL_RIGHT + 1))
+
+
+def obstacle_bits(level_manager) -> int:
+    """Return a bitboard of a LevelManager's current obstacles."""
+    return mask_of(cell for obstacle in level_manager.obstacles for cell in obstacle.positions)
+
+
+class BitSnake:
+    """Snake whose body is a deque of bit numbers plus a bitboard of the same cells."""
+
+    __slots__ = ("cells", "bits", "direction", "grow_pending", "self_hit")
+
+    def __init__(self):
+        """Initialize the snake at the center of the screen."""
+        self.reset()
+
+    def reset(self, row: int = GRID_HEIGHT // 2):
+        """Reset snake to initial state, heading right from the centre of ``row``."""
+        center_x = GRID_WIDTH // 2
+        self.body = [(center_x, row), (center_x - 1, row), (center_x - 2, row)]
+        self.direction = Direction.RIGHT
+        self.grow_pending = 0
+
+    @property
+    def body(self) -> List[Tuple[int, int]]:
+        """Return the body as (x, y) positions, head first, like ``Snake.body``."""
+        return [position(index) for index in self.cells]
+
+    @body.setter
+    def body(self, positions: List[Tuple[int, int]]):
+        """Replace the body with (x, y) positions, head first."""
+        self.cells = deque(bit_index(x, y) for x, y in positions)
+        self.bits = mask_of(positions)
+        self.self_hit = False
+
+    def fork(self) -> "BitSnake":
+        """Return an independent copy (the bitboard is immutable, only the deque is copied)."""
+        clone = BitSnake.__new__(BitSnake)
+        clone.cells = deque(self.cells)
+        clone.bits = self.bits
+        clone.direction = self.direction
+        clone.grow_pending = self.grow_pending
+        clone.self_hit = self.self_hit
+        return clone
+
+    def move(self):
+        """Move the snake in the current direction."""
+        cells = self.cells
+        head = cells[0] + SHIFTS[self.direction]
+        if self.grow_pending > 0:
+            self.grow_pending -= 1
+        else:
+            self.bits ^= 1 << cells.pop()
+        # With the tail gone, an occupied bit means the head ran into body[1:]
+        head_bit = 1 << head
+        self.self_hit = bool(self.bits & head_bit)
+        self.bits |= head_bit
+        cells.appendleft(head)
+
+    def change_direction(self, new_direction: Direction):
+        """Change snake direction if it's not opposite to current direction."""
+        current_dx, current_dy = self.direction.value
+        new_dx, new_dy = new_direction.value
+        if (current_dx, current_dy) != (-new_dx, -new_dy):
+            self.direction = new_direction
+
+    def grow(self):
+        """Make the snake grow by one segment."""
+        self.grow_pending += 1
+
+    def check_wall_collision(self) -> bool:
+        """Check if snake has hit the walls (accounting for frame)."""
+        head = self.cells[0]
+        return head >= SHAFT_START or bool(WALLS >> head & 1)
+
+    def check_self_collision(self) -> bool:
+        """Check if the last move ran the head into the body."""
+        return self.self_hit
+
+
+class BitboardGame(GameLogic):
+    """GameLogic with the board held as bitboards."""
+
+    snake_class = BitSnake
+
+    def __init__(self, rng=None, food_placement: str = "rejection"):
+        """Initialize the game state.
+
+        ``rng`` works as for ``GameLogic``. ``food_placement`` is
+        ``"rejection"`` to draw food positions exactly like GameLogic, or
+        ``"uniform"`` to pick one of the free cells in a single draw.
+        """
+        if food_placement not in FOOD_PLACEMENTS:
+            raise ValueError(f"Unknown food placement: {food_placement}")
+        self.food_placement = food_placement
+        self._food_key = None
+        self._food_cell = -1
+        self._obstacle_key = None
+        self._obstacle_bits = 0
+        self._pocket_bits = 0
+        super().__init__(rng)
+
+    @property
+    def obstacle_bits(self) -> int:
+        """Bitboard of the current level's obstacles."""
+        obstacles = self.level_manager.obstacles
+        if obstacles is not self._obstacle_key:
+            self._obstacle_key = obstacles
+            self._obstacle_bits = obstacle_bits(self.level_manager)
+            self._pocket_bits = mask_of(self.level_map.pockets())
+        return self._obstacle_bits
+
+    @property
+    def pocket_bits(self) -> int:
+        """Bitboard of the obstacle-free cells the snake cannot reach on this level."""
+        self.obstacle_bits  # Brings the cached level bitboards up to date
+        return self._pocket_bits
+
+    @property
+    def food_cell(self) -> int:
+        """Bit index of the food, kept in step with ``food.position``."""
+        food = self.food.position
+        if food is not self._food_key:
+            self._food_key = food
+            self._food_cell = bit_index(*food)
+        return self._food_cell
+
+    def free_bits(self) -> int:
+        """Return a bitboard of the arena cells free of the snake and obstacles."""
+        return ARENA & ~(self.snake.bits | self.obstacle_bits)
+
+    def free_cell_count(self) -> int:
+        """Return the number of arena cells free of the snake and obstacles."""
+        return popcount(self.free_bits())
+
+    def blocked_bits(self) -> int:
+        """Return a bitboard of the cells the head must not enter (the open portal excluded)."""
+        blocked = WALLS | self.obstacle_bits | self.snake.bits
+        if self.portal_open:
+            blocked &= ~PORTAL
+        return blocked
+
+    def free_neighbours(self, cell: Tuple[int, int]) -> int:
+        """Return how many arena cells next to ``cell`` are free."""
+        return popcount(neighbours(1 << bit_index(*cell)) & self.free_bits())
+
+    def respawn_food_safely(self):
+        """Respawn food in a location the snake can reach, away from snake and obstacles."""
+        taken = self.snake.bits | self.obstacle_bits | self.pocket_bits
+        if self.food_placement == "uniform":
+            free = ARENA & ~taken
+            count = popcount(free)
+            if count:
+                self.food.position = position(nth_set_bit(free, self.rng.randrange(count)))
+            return
+
+        while True:
+            x, y = self.food.generate_position()
+            cell = bit_index(x, y)
+            if not taken >> cell & 1:
+                self.food.position = (x, y)
+                return
+
+    def check_portal_collision(self) -> bool:
+        """Check if snake head is at the portal opening."""
+        if not self.portal_open:
+            return False
+        head = self.snake.cells[0]
+        return head >= SHAFT_START and PORTAL_LEFT <= head % STRIDE - 1 <= PORTAL_RIGHT
+
+    def snake_fully_through_portal(self) -> bool:
+        """Check if entire snake has passed through the portal."""
+        return self.portal_open and not self.snake.bits & IN_PLAY
+
+    def advance(self):
+        """Update game logic, following ``GameLogic.advance``."""
+        if self.state != GameState.PLAYING:
+            # Level transitions only call back into the snake, food and level manager
+            GameLogic.advance(self)
+            return
+
+        if self.apples_eaten >= APPLES_PER_LEVEL and not self.portal_open:
+            self.portal_open = True
+            self.notify(GameEvent.PORTAL_OPEN)
+
+        snake = self.snake
+        snake.move()
+        self.moves += 1
+
+        if self.portal_open and not snake.bits & IN_PLAY:
+            self.state = GameState.LEVEL_TRANSITION
+            self.transition_timer = 0
+            self.notify(GameEvent.LEVEL_COMPLETE)
+            return
+
+        head = snake.cells[0]
+        if head == self.food_cell:
+            snake.grow_pending += 1
+            self.score += 10
+            self.apples_eaten += 1
+            self.notify(GameEvent.APPLE_EATEN)
+            self.respawn_food_safely()
+
+            new_speed = min(MAX_SPEED, self.speed + SPEED_INCREMENT)
+            if new_speed != self.speed:
+                self.speed = new_speed
+                self.notify(GameEvent.SPEED_CHANGE)
+
+        if head >= SHAFT_START:
+            # Above the arena only the open portal's columns are allowed
+            if not (self.portal_open and PORTAL_LEFT <= head % STRIDE - 1 <= PORTAL_RIGHT):
+                self.end_game(DeathCause.WALL)
+                return
+        elif WALLS >> head & 1:
+            self.end_game(DeathCause.WALL)
+            return
+
+        if snake.self_hit:
+            self.end_game(DeathCause.SELF)
+            return
+
+        if self.obstacle_bits >> head & 1:
+            self.end_game(DeathCause.OBSTACLE)
+            return
+
+
+def record_actions(seed: int, steps: int, noise: float = 0.1) -> List[Optional[Direction]]:
+    """Play ``steps`` ticks of bot games on GameLogic and return the directions given.
+
+    ``None`` marks a restart after game over. Replaying the list on any
+    rule-identical engine seeded with ``seed`` plays the same games.
+    """
+    game = GameLogic(random.Random(seed))
+    bot = GreedyBot(random.Random(seed + 1), noise)
+    game.start_playing()
+    actions = []
+    for _ in range(steps):
+        if game.state == GameState.GAME_OVER:
+            game.reset_game()
+            game.start_playing()
+            actions.append(None)
+            continue
+        direction = bot.choose_direction(game) if game.state == GameState.PLAYING else game.snake.direction
+        game.snake.change_direction(direction)
+        game.update()
+        actions.append(direction)
+    return actions
+
+
+def replay(engine, seed: int, actions: List[Optional[Direction]]):
+    """Replay recorded actions on a new ``engine(rng)`` and return the game."""
+    game = engine(random.Random(seed))
+    game.start_playing()
+    for direction in actions:
+        if direction is None:
+            game.reset_game()
+            game.start_playing()
+        else:
+            game.snake.change_direction(direction)
+            game.update()
+    return game
+
+
+def differential_test(seeds, steps: int, noise: float = 0.1) -> Tuple[int, int]:
+    """Run GameLogic and BitboardGame side by side on the same seeded inputs.
+
+    Raises AssertionError at the first tick where their state or reported
+    events differ. Returns the number of ticks and games played.
+    """
+    ticks = games = 0
+    for seed in seeds:
+        reference = GameLogic(random.Random(seed))
+        candidate = BitboardGame(random.Random(seed))
+        events = ([], [])
+        reference.add_listener(lambda event, game: events[0].append(event))
+        candidate.add_listener(lambda event, game: events[1].append(event))
+        bot = GreedyBot(random.Random(seed + 1), noise)
+        reference.start_playing()
+        candidate.start_playing()
+        games += 1
+
+        for step in range(steps):
+            if reference.state == GameState.GAME_OVER:
+                reference.reset_game()
+                candidate.reset_game()
+                reference.start_playing()
+                candidate.start_playing()
+                games += 1
+            if reference.state == GameState.PLAYING:
+                direction = bot.choose_direction(reference)
+                reference.snake.change_direction(direction)
+                candidate.snake.change_direction(direction)
+            reference.update()
+            candidate.update()
+            ticks += 1
+
+            expected, actual = state_of(reference), state_of(candidate)
+            if expected != actual or events[0] != events[1]:
+                raise AssertionError(f"seed {seed}, tick {step}: engines differ\n"
+                                     f"  GameLogic:    {expected} {events[0]}\n"
+                                     f"  BitboardGame: {actual} {events[1]}")
+            if popcount(candidate.snake.bits) != len(candidate.snake.cells) and not candidate.snake.self_hit:
+                raise AssertionError(f"seed {seed}, tick {step}: body bitboard out of sync")
+            del events[0][:], events[1][:]
+    return ticks, games
+
+
+def crowded(engine, length: int):
+    """Return a game whose snake snakes back and forth over ``length`` cells of the arena."""
+    game = engine(random.Random(0))
+    path = [(x if y % 2 == 0 else GRID_WIDTH - 1 - x, y) for y in range(GRID_HEIGHT) for x in range(GRID_WIDTH)]
+    game.snake.body = deque(path[:length][::-1])
+    return game
+
+
+def benchmark(steps: int, seed: int = 0):
+    """Print throughput of both engines on the same recorded games and on a crowded board."""
+    actions = record_actions(seed, steps)
+    engines = (("GameLogic", GameLogic), ("BitboardGame", BitboardGame),
+               ("BitboardGame uniform", lambda rng: BitboardGame(rng, "uniform")))
+    print(f"Replaying {len(actions)} recorded ticks:")
+    for name, engine in engines[:2]:
+        start = time.perf_counter()
+        replay(engine, seed, actions)
+        elapsed = time.perf_counter() - start
+        print(f"  {name:22s} {len(actions) / elapsed:10.0f} ticks/s")
+
+    length = GRID_WIDTH * GRID_HEIGHT * 9 // 10
+    repeats = 200
+    print(f"Food placement with a {length}-segment snake:")
+    for name, engine in engines:
+        game = crowded(engine, length)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            game.respawn_food_safely()
+        elapsed = time.perf_counter() - start
+        print(f"  {name:22s} {elapsed / repeats * 1e6:10.1f} us/placement")
+
+    # BitSnake.check_self_collision only reads the result of the test made in move,
+    # so time that test itself against Snake's scan of the body
+    snake = crowded(GameLogic, length).snake
+    bit_snake = crowded(BitboardGame, length).snake
+    tests = (("GameLogic", snake.check_self_collision),
+             ("BitboardGame", lambda: bool(bit_snake.bits & 1 << bit_snake.cells[0])))
+    print(f"Self-collision test with a {length}-segment snake:")
+    for name, test in tests:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            test()
+        elapsed = time.perf_counter() - start
+        print(f"  {name:22s} {elapsed / repeats * 1e6:10.2f} us/check")
+
+
+def main(argv=None):
+    """Command line entry point for the differential check and benchmark."""
+    parser = argparse.ArgumentParser(description="Bitboard engine checks and benchmark")
+    parser.add_argument("--check", action="store_true", help="Compare against GameLogic tick by tick")
+    parser.add_argument("--benchmark", action="store_true", help="Compare throughput with GameLogic")
+    parser.add_argument("--seeds", type=int, default=20)
+    parser.add_argument("--steps", type=int, default=None, help="Ticks per seed (check) or in total (benchmark)")
+    args = parser.parse_args(argv)
+
+    if not (args.check or args.benchmark):
+        parser.print_help()
+        return
+    if args.check:
+        ticks, games = differential_test(range(args.seeds), args.steps or 5000)
+        print(f"Engines agree on {ticks} ticks over {games} games")
+    if args.benchmark:
+        benchmark(args.steps or 100000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Simple computer players for the Snake Game.
+
+Bots look at a GameLogic and return the Direction to steer in next. They are
+used to generate games for datasets, benchmarks and balancing tools.
+"""
+
+import random
+from itertools import islice
+from typing import Optional, Set, Tuple
+
+from snake_game import GRID_WIDTH, GRID_HEIGHT, PORTAL_LEFT, PORTAL_RIGHT, Direction, GameLogic
+
+DIRECTIONS = (Direction.UP, Direction.DOWN, Direction.LEFT, Direction.RIGHT)
+
+
+def is_opposite(a: Direction, b: Direction) -> bool:
+    """Return True if ``b`` would reverse the snake moving in ``a``."""
+    return a.value[0] == -b.value[0] and a.value[1] == -b.value[1]
+
+
+class RandomBot:
+    """Picks any direction that does not reverse the snake."""
+
+    def __init__(self, rng: Optional[random.Random] = None):
+        """Create the bot with an optional random number generator."""
+        self.rng = rng if rng is not None else random.Random()
+
+    def choose_direction(self, game: GameLogic) -> Direction:
+        """Return a random non-reversing direction."""
+        current = game.snake.direction
+        return self.rng.choice([d for d in DIRECTIONS if not is_opposite(current, d)])
+
+
+class GreedyBot:
+    """Heads for the food (or the open portal) while avoiding immediate collisions.
+
+    ``noise`` is the probability of picking a random safe move instead of the
+    greedy one, which makes the bot play more like a person.
+    """
+
+    def __init__(self, rng: Optional[random.Random] = None, noise: float = 0.0):
+        """Create the bot with an optional random number generator."""
+        self.rng = rng if rng is not None else random.Random()
+        self.noise = noise
+        self._obstacle_key = None
+        self._obstacle_cells: Set[Tuple[int, int]] = set()
+
+    def choose_direction(self, game: GameLogic) -> Direction:
+        """Return the direction to steer in this tick."""
+        snake = game.snake
+        head_x, head_y = snake.body[0]
+        blocked = self._blocked_cells(game)
+
+        if game.portal_open:
+            if head_y < 0:
+                return Direction.UP
+            target = (GRID_WIDTH // 2, -1)
+        else:
+            target = game.food.position
+
+        candidates = []
+        for direction in DIRECTIONS:
+            if is_opposite(snake.direction, direction):
+                continue
+            dx, dy = direction.value
+            cell = (head_x + dx, head_y + dy)
+            if not self._is_safe(cell, blocked, game.portal_open):
+                continue
+            # Prefer moves that keep some room around the new head
+            room = sum(self._is_safe((cell[0] + ex, cell[1] + ey), blocked, game.portal_open)
+                       for ex, ey in ((0, -1), (0, 1), (-1, 0), (1, 0)))
+            distance = abs(cell[0] - target[0]) + abs(cell[1] - target[1])
+            candidates.append((room == 0, distance, self.rng.random(), direction))
+
+        if not candidates:
+            return snake.direction
+        if self.noise and self.rng.random() < self.noise:
+            return self.rng.choice(candidates)[3]
+        return min(candidates)[3]
+
+    def _blocked_cells(self, game: GameLogic) -> Set[Tuple[int, int]]:
+        """Return the cells the head must not move into."""
+        obstacles = game.level_manager.obstacles
+        if obstacles is not self._obstacle_key:
+            self._obstacle_key = obstacles
+            self._obstacle_cells = {cell for obstacle in obstacles for cell in obstacle.positions}
+
+        body = game.snake.body
+        # The tail moves out of the way unless the snake is growing
+        body_cells = body if game.snake.grow_pending else islice(body, len(body) - 1)
+        return self._obstacle_cells.union(body_cells)
+
+    @staticmethod
+    def _is_safe(cell: Tuple[int, int], blocked: Set[Tuple[int, int]], portal_open: bool) -> bool:
+        """Return True if the head can move into ``cell``."""
+        x, y = cell
+        if y < 0:
+            return portal_open and PORTAL_LEFT <= x <= PORTAL_RIGHT and cell not in blocked
+        if x < 0 or x >= GRID_WIDTH or y >= GRID_HEIGHT:
+            return False
+        return cell not in blocked
+
+
+class SlowReactionBot:
+    """GreedyBot that sometimes reacts a tick too late, more often at high speeds.
+
+    Each wanted turn is missed with probability ``slip_per_speed * game.speed``,
+    a rough model of a human player struggling as the game speeds up.
+    """
+
+    def __init__(self, rng: Optional[random.Random] = None, noise: float = 0.05, slip_per_speed: float = 0.004):
+        """Create the bot with an optional random number generator."""
+        self.rng = rng if rng is not None else random.Random()
+        self.slip_per_speed = slip_per_speed
+        self._bot = GreedyBot(self.rng, noise)
+
+    def choose_direction(self, game: GameLogic) -> Direction:
+        """Return the direction to steer in this tick."""
+        direction = self._bot.choose_direction(game)
+        if direction != game.snake.direction and self.rng.random() < self.slip_per_speed * game.speed:
+            return game.snake.direction
+        return direction
@@ -0,0 +1,399 @@
+"""
+Compact game representation for large-scale simulation.
+
+``CompactGame`` follows the same rules as ``GameLogic.update`` but stores a
+game in a few hundred bytes instead of several kilobytes:
+
+- every cell is a single int, ``(y + EXIT_ROWS) * STRIDE + (x + 1)``, on a
+  grid padded by one cell of wall on each side and with room above the
+  arena for the portal shaft
+- directions are indices into precomputed int offsets
+- the body is an ``array('H')`` ring buffer, so a move never allocates
+- occupancy and obstacles are bitsets over the arena; obstacle bitsets for
+  the fixed levels are shared by every game
+
+Given the same seeded ``random.Random`` and the same directions, a
+CompactGame consumes random numbers exactly like ``GameLogic`` and ends up
+in the same state.
+
+Usage:
+    python compact.py --benchmark [--games 5000]
+"""
+
+import argparse
+import gc
+import random
+import tracemalloc
+from array import array
+from collections import deque
+from typing import Dict, List, Tuple
+
+from snake_game import (GRID_WIDTH, GRID_HEIGHT, INITIAL_SPEED, SPEED_INCREMENT, MAX_SPEED, APPLES_PER_LEVEL,
+                        LEVEL_TRANSITION_TICKS, PORTAL_LEFT, PORTAL_RIGHT, DeathCause, Direction, GameLogic,
+                        GameState, LevelManager, level_map, spawn_row)
+
+# Cell encoding
+STRIDE = GRID_WIDTH + 2
+EXIT_ROWS = 65536 // STRIDE - GRID_HEIGHT - 1  # Portal shaft rows that still fit in an unsigned short
+ARENA_BASE = (EXIT_ROWS - 1) * STRIDE  # First cell of the top wall row
+ARENA_CELLS = (GRID_HEIGHT + 2) * STRIDE  # Arena plus its wall ring
+TOP_ROW = EXIT_ROWS * STRIDE  # First cell with y == 0
+BITSET_BYTES = (ARENA_CELLS + 7) // 8
+
+# Direction indices and their cell offsets
+DIRECTIONS = (Direction.UP, Direction.DOWN, Direction.LEFT, Direction.RIGHT)
+DIRECTION_INDEX = {direction: index for index, direction in enumerate(DIRECTIONS)}
+UP, DOWN, LEFT, RIGHT = range(4)
+DELTAS = (-STRIDE, STRIDE, -1, 1)
+OPPOSITE = (DOWN, UP, RIGHT, LEFT)
+
+
+def encode(x: int, y: int) -> int:
+    """Return the cell number of grid position (x, y)."""
+    return (y + EXIT_ROWS) * STRIDE + x + 1
+
+
+def decode(cell: int) -> Tuple[int, int]:
+    """Return the grid position (x, y) of a cell number."""
+    row, column = divmod(cell, STRIDE)
+    return column - 1, row - EXIT_ROWS
+
+
+def _build_wall_mask() -> bytearray:
+    """Mark the wall ring around the arena (one byte per cell, indexed from ARENA_BASE)."""
+    mask = bytearray(ARENA_CELLS)
+    for cell in range(ARENA_CELLS):
+        x, y = decode(cell + ARENA_BASE)
+        if x < 0 or x >= GRID_WIDTH or y < 0 or y >= GRID_HEIGHT:
+            mask[cell] = 1
+    return mask
+
+
+WALLS = _build_wall_mask()
+
+# Obstacle bitsets of the levels whose layout does not depend on the random generator
+FIXED_LEVELS = 5
+_level_masks: Dict[int, Tuple[bytearray, bytearray]] = {}
+
+
+def _bitset(cells) -> bytearray:
+    """Return a bitset of the arena with ``cells`` set."""
+    mask = bytearray(BITSET_BYTES)
+    for x, y in cells:
+        index = encode(x, y) - ARENA_BASE
+        mask[index >> 3] |= 1 << (index & 7)
+    return mask
+
+
+def level_masks(level: int, rng) -> Tuple[bytearray, bytearray]:
+    """Return the obstacle bitset for ``level``, generated exactly like LevelManager, and
+    the bitset of cells food must not go on (obstacles and pockets the snake cannot reach)."""
+    if level <= FIXED_LEVELS and level in _level_masks:
+        return _level_masks[level]
+
+    manager = LevelManager(rng)
+    if level != 1:
+        manager.current_level = level
+        manager.generate_obstacles()
+    cells = [cell for obstacle in manager.obstacles for cell in obstacle.positions]
+    mask = _bitset(cells)
+    pockets = level_map(cells).pockets()
+    masks = (mask, _bitset(cells + pockets) if pockets else mask)
+
+    if level <= FIXED_LEVELS:
+        _level_masks[level] = masks
+    return masks
+
+
+def obstacle_mask(level: int, rng) -> bytearray:
+    """Return the obstacle bitset for ``level``, generated exactly like LevelManager."""
+    return level_masks(level, rng)[0]
+
+
+class CompactGame:
+    """Memory-compact, rule-identical counterpart of ``GameLogic``."""
+
+    __slots__ = ("rng", "state", "score", "apples_eaten", "speed", "level", "portal_open", "transition_timer",
+                 "moves", "death_cause", "direction", "grow_pending", "food", "obstacles", "food_blocked", "occupied",
+                 "_ring", "_head", "_length", "_in_arena")
+
+    def __init__(self, rng=None):
+        """Initialize the game; ``rng`` works as for ``GameLogic``."""
+        self.rng = rng if rng is not None else random
+        self.reset_game()
+
+    def reset_game(self):
+        """Reset the game to its initial state (consuming random numbers like GameLogic)."""
+        self._ring = array("H", bytes(2 * 8))
+        self.occupied = bytearray(BITSET_BYTES)
+        self._head = 0
+        self._length = 0
+        self._reset_snake()
+
+        # GameLogic creates Food (one position draw) before LevelManager
+        self.food = self._random_cell()
+        self.level = 1
+        self.obstacles, self.food_blocked = level_masks(1, self.rng)
+        self.moves = 0
+        self.score = 0
+        self.apples_eaten = 0
+        self.speed = INITIAL_SPEED
+        self.state = GameState.MENU
+        self.portal_open = False
+        self.transition_timer = 0
+        self.death_cause = None
+        self.respawn_food()
+
+    def start_playing(self):
+        """Start the game."""
+        self.state = GameState.PLAYING
+
+    # Snake body
+
+    @property
+    def head(self) -> int:
+        """Cell of the snake's head."""
+        return self._ring[self._head]
+
+    @property
+    def length(self) -> int:
+        """Number of body segments."""
+        return self._length
+
+    def body_cells(self) -> List[int]:
+        """Return the body cells, head first."""
+        ring = self._ring
+        capacity = len(ring)
+        return [ring[(self._head + i) % capacity] for i in range(self._length)]
+
+    @property
+    def body(self) -> List[Tuple[int, int]]:
+        """Return the body as (x, y) positions, head first, like ``Snake.body``."""
+        return [decode(cell) for cell in self.body_cells()]
+
+    @property
+    def food_position(self) -> Tuple[int, int]:
+        """Return the food as an (x, y) position."""
+        return decode(self.food)
+
+    def change_direction(self, direction: Direction):
+        """Change direction unless it would reverse the snake."""
+        self.change_direction_index(DIRECTION_INDEX[direction])
+
+    def change_direction_index(self, index: int):
+        """Change direction by index into DIRECTIONS unless it would reverse the snake."""
+        if index != OPPOSITE[self.direction]:
+            self.direction = index
+
+    def _reset_snake(self, row: int = GRID_HEIGHT // 2):
+        """Place a three-segment snake in the centre of ``row`` heading right."""
+        while self._length:
+            self._pop_tail()
+
+        center_x = GRID_WIDTH // 2
+        self._head = 0
+        self._in_arena = 0
+        for i in range(3):
+            self._push_head(encode(center_x - 2 + i, row))
+        self.direction = RIGHT
+        self.grow_pending = 0
+
+    def set_body(self, positions: List[Tuple[int, int]]):
+        """Replace the snake's body with (x, y) positions, head first."""
+        while self._length:
+            self._pop_tail()
+        self._head = 0
+        self._in_arena = 0
+        for x, y in reversed(positions):
+            self._push_head(encode(x, y))
+
+    def _push_head(self, cell: int):
+        """Add a new head segment, growing the ring buffer when it is full."""
+        ring = self._ring
+        capacity = len(ring)
+        if self._length == capacity:
+            ordered = array("H", (ring[(self._head + i) % capacity] for i in range(capacity)))
+            ordered.extend(array("H", bytes(2 * capacity)))
+            self._ring = ring = ordered
+            self._head = 0
+            capacity *= 2
+        self._head = (self._head - 1) % capacity
+        ring[self._head] = cell
+        self._length += 1
+        index = cell - ARENA_BASE
+        if 0 <= index < ARENA_CELLS:
+            self.occupied[index >> 3] |= 1 << (index & 7)
+        if cell >= TOP_ROW:
+            self._in_arena += 1
+
+    def _pop_tail(self):
+        """Remove the last body segment."""
+        ring = self._ring
+        cell = ring[(self._head + self._length - 1) % len(ring)]
+        self._length -= 1
+        index = cell - ARENA_BASE
+        if 0 <= index < ARENA_CELLS:
+            self.occupied[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+        if cell >= TOP_ROW:
+            self._in_arena -= 1
+
+    def _is_obstacle(self, position: Tuple[int, int]) -> bool:
+        """Return True if an obstacle covers grid position (x, y)."""
+        index = encode(*position) - ARENA_BASE
+        return bool(self.obstacles[index >> 3] & (1 << (index & 7)))
+
+    # Food
+
+    def _random_cell(self) -> int:
+        """Draw a food position the way Food.generate_position does."""
+        x = self.rng.randint(0, GRID_WIDTH - 1)
+        y = self.rng.randint(0, GRID_HEIGHT - 1)
+        return encode(x, y)
+
+    def respawn_food(self):
+        """Move the food to a random cell free of the snake and obstacles that the snake can reach."""
+        while True:
+            index = self._random_cell() - ARENA_BASE
+            bit = 1 << (index & 7)
+            if not (self.occupied[index >> 3] & bit or self.food_blocked[index >> 3] & bit):
+                self.food = index + ARENA_BASE
+                return
+
+    # Rules
+
+    def update(self):
+        """Advance the game by one tick, following ``GameLogic.update``."""
+        if self.state == GameState.LEVEL_TRANSITION:
+            self.transition_timer += 1
+            if self.transition_timer > LEVEL_TRANSITION_TICKS:
+                self.level += 1
+                self.obstacles, self.food_blocked = level_masks(self.level, self.rng)
+                self.portal_open = False
+                self.apples_eaten = 0
+                self._reset_snake(spawn_row(self._is_obstacle))
+                self.respawn_food()
+                self.state = GameState.PLAYING
+                self.transition_timer = 0
+            return
+
+        if self.state != GameState.PLAYING:
+            return
+
+        if self.apples_eaten >= APPLES_PER_LEVEL and not self.portal_open:
+            self.portal_open = True
+
+        # Drop the tail first so that "already occupied" means "in body[1:]"
+        head = self._ring[self._head] + DELTAS[self.direction]
+        if self.grow_pending > 0:
+            self.grow_pending -= 1
+        else:
+            self._pop_tail()
+        index = head - ARENA_BASE
+        in_arena_grid = 0 <= index < ARENA_CELLS
+        if in_arena_grid:
+            bit = 1 << (index & 7)
+            hit_self = self.occupied[index >> 3] & bit
+        else:
+            hit_self = head in self.body_cells()
+        self._push_head(head)
+        self.moves += 1
+
+        if self.portal_open and self._in_arena == 0:
+            self.state = GameState.LEVEL_TRANSITION
+            self.transition_timer = 0
+            return
+
+        if head == self.food:
+            self.grow_pending += 1
+            self.score += 10
+            self.apples_eaten += 1
+            self.respawn_food()
+            self.speed = min(MAX_SPEED, self.speed + SPEED_INCREMENT)
+
+        if head < TOP_ROW:
+            # Above the arena: only the open portal's columns are allowed
+            x = head % STRIDE - 1
+            if not (self.portal_open and PORTAL_LEFT <= x <= PORTAL_RIGHT):
+                self.end_game(DeathCause.WALL)
+                return
+        elif WALLS[index]:
+            self.end_game(DeathCause.WALL)
+            return
+
+        if hit_self:
+            self.end_game(DeathCause.SELF)
+            return
+
+        if in_arena_grid and self.obstacles[index >> 3] & bit:
+            self.end_game(DeathCause.OBSTACLE)
+            return
+
+    def end_game(self, cause: DeathCause):
+        """End the game because the snake died."""
+        self.state = GameState.GAME_OVER
+        self.death_cause = cause
+
+
+def state_of(game) -> tuple:
+    """Return a comparable snapshot of a GameLogic or an engine with CompactGame's attributes."""
+    if not isinstance(game, GameLogic):
+        return (game.body, DIRECTIONS[game.direction], game.grow_pending, game.food_position, game.level,
+                game.score, game.apples_eaten, game.speed, game.state, game.portal_open, game.death_cause)
+    return (list(game.snake.body), game.snake.direction, game.snake.grow_pending, game.food.position,
+            game.level_manager.current_level, game.score, game.apples_eaten, game.speed, game.state,
+            game.portal_open, game.death_cause)
+
+
+def measure_memory(factory, count: int) -> float:
+    """Return the average number of bytes allocated per object created by ``factory``."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = [factory() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del games
+    return (after - before) / count
+
+
+def main(argv=None):
+    """Command line entry point for the memory benchmark."""
+    parser = argparse.ArgumentParser(description="Compact game representation benchmark")
+    parser.add_argument("--benchmark", action="store_true", help="Compare memory per game")
+    parser.add_argument("--games", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    if not args.benchmark:
+        parser.print_help()
+        return
+
+    # A boustrophedon path through the empty level 1 arena
+    long_body = [(x if y % 2 == 0 else GRID_WIDTH - 1 - x, y) for y in range(5) for x in range(GRID_WIDTH)]
+
+    def scenario(factory, level, body=None):
+        def make():
+            game = factory()
+            if isinstance(game, CompactGame):
+                game.level = level
+                game.obstacles, game.food_blocked = level_masks(level, game.rng)
+                if body:
+                    game.set_body(body)
+            else:
+                game.level_manager.current_level = level
+                game.level_manager.generate_obstacles()
+                if body:
+                    game.snake.body = deque(body)
+            return game
+        return make
+
+    # A fresh Random per game costs about 2.5 KB, so both use the shared module generator
+    scenarios = (("level 1", 1, None), ("level 5", 5, None), (f"length {len(long_body)}", 1, long_body))
+    for label, level, body in scenarios:
+        standard = measure_memory(scenario(GameLogic, level, body), args.games)
+        compact = measure_memory(scenario(CompactGame, level, body), args.games)
+        print(f"{label}: GameLogic {standard:8.0f} B/game, CompactGame {compact:8.0f} B/game "
+              f"({standard / compact:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+"""
+Human-play datasets for imitation learning.
+
+``DatasetRecorder`` attaches to a game and records one row per tick played:
+
+    board      the arena and its wall ring as ``snake_env`` cell codes, two
+               cells per byte (the portal opening shows in the top wall)
+    direction  the heading the snake moved in on the previous tick
+    action     the heading chosen for this tick (index into ``ACTIONS``)
+    reward     points scored by this tick
+    events     bit ``1 << (event.value - 1)`` set for each GameEvent it caused
+    episode    game number, counted across recording sessions
+    tick       move number within the game
+    level      level being played
+
+A tick listener keeps the board from before each tick (kept up to date
+incrementally by a ``BoardEncoder``); once the tick is played it only
+hands the row to a writer thread, which packs it into
+the current shard. A shard is one preallocated ``.npy`` memmap per column,
+``rows_per_shard`` rows long; when it is full it is flushed and a new one is
+started. ``manifest.json`` lists the shards and their valid row counts and
+is rewritten atomically after every shard, so an interrupted session loses
+at most the shard being written. Recording into an existing dataset appends
+to it.
+
+``PlayDataset`` reads a dataset through memory maps, so it never loads more
+than the rows asked for: ``stream()`` yields fixed-size batches in order and
+``sample()`` draws random rows from all shards, reading each shard's rows in
+file order.
+
+Usage:
+    python snake_game.py --dataset DIR   # record human play
+    python dataset.py DIR                # summarise a dataset
+    python dataset.py --check            # record a bot game and verify reading it back
+"""
+
+import argparse
+import json
+import os
+import queue
+import random
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from snake_env import ACTIONS, PAD, BoardEncoder
+from snake_game import GRID_HEIGHT, GRID_WIDTH, GameEvent, GameState
+
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+# The arena and its one-cell wall ring, two 4-bit cell codes per byte
+BOARD_SHAPE = (GRID_HEIGHT + 2, GRID_WIDTH + 2)
+PACKED_SHAPE = (BOARD_SHAPE[0], (BOARD_SHAPE[1] + 1) // 2)
+COLUMNS = {
+    "board": ("uint8", PACKED_SHAPE),
+    "direction": ("int8", ()),
+    "action": ("int8", ()),
+    "reward": ("int16", ()),
+    "events": ("uint8", ()),
+    "episode": ("uint32", ()),
+    "tick": ("uint32", ()),
+    "level": ("uint8", ()),
+}
+ACTION_INDEX = {direction: i for i, direction in enumerate(ACTIONS)}
+SHARDS_OPEN = 16  # Shards a PlayDataset keeps mapped at once
+
+
+def pack_boards(boards: np.ndarray) -> np.ndarray:
+    """Pack cell codes of shape (..., height, width) two to a byte."""
+    if boards.shape[-1] % 2:
+        boards = np.concatenate([boards, np.zeros(boards.shape[:-1] + (1,), dtype=boards.dtype)], axis=-1)
+    return (boards[..., 0::2] << 4) | boards[..., 1::2]
+
+
+def unpack_boards(packed: np.ndarray) -> np.ndarray:
+    """Return the cell codes, of shape (..., ``BOARD_SHAPE``), of packed boards."""
+    boards = np.empty(packed.shape[:-1] + (packed.shape[-1] * 2,), dtype=np.uint8)
+    boards[..., 0::2] = packed >> 4
+    boards[..., 1::2] = packed & 0x0F
+    return boards[..., :BOARD_SHAPE[1]]
+
+
+def event_mask(events: Sequence[GameEvent]) -> int:
+    """Return the ``events`` column value for ``events``."""
+    mask = 0
+    for event in events:
+        mask |= 1 << (event.value - 1)
+    return mask
+
+
+def write_manifest(directory: str, manifest: dict):
+    """Write ``manifest`` to ``directory`` atomically."""
+    path = os.path.join(directory, MANIFEST_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def read_manifest(directory: str) -> dict:
+    """Return the manifest of a dataset; raises ValueError if it is not one this module wrote."""
+    with open(os.path.join(directory, MANIFEST_NAME), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported dataset version: {manifest.get('version')}")
+    if manifest["board_shape"] != list(BOARD_SHAPE):
+        raise ValueError(f"Dataset boards are {manifest['board_shape']}, not {list(BOARD_SHAPE)}")
+    return manifest
+
+
+class DatasetRecorder:
+    """Records every tick of a game into column shards on a background thread."""
+
+    def __init__(self, directory: str, rows_per_shard: int = 65536):
+        """Prepare ``directory``, continuing the dataset already there if any."""
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        if os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+            self.manifest = read_manifest(directory)
+        else:
+            self.manifest = {
+                "version": FORMAT_VERSION,
+                "board_shape": list(BOARD_SHAPE),
+                "columns": {name: {"dtype": dtype, "shape": list(shape)} for name, (dtype, shape) in COLUMNS.items()},
+                "actions": [direction.name for direction in ACTIONS],
+                "events": [event.name for event in GameEvent],
+                "rows_per_shard": rows_per_shard,
+                "rows": 0,
+                "episodes": 0,
+                "shards": [],
+            }
+        self.rows_per_shard = self.manifest["rows_per_shard"]
+        self.recorded = 0
+        self.error: Optional[OSError] = None
+        self.game = None
+        self._encoder = None
+        self._episode = self.manifest["episodes"]
+        self._heading = None
+        # The board, move count and score from before the next tick
+        self._board = None
+        self._moves = 0
+        self._score = 0
+        self._events: List[GameEvent] = []
+        self._rows: "queue.Queue" = queue.Queue()
+        self._shard: Optional[Dict[str, np.ndarray]] = None
+        self._count = 0
+        self._writer = threading.Thread(target=self._write_loop, name="dataset-writer", daemon=True)
+        self._writer.start()
+
+    def attach(self, game):
+        """Start recording the ticks ``game`` plays."""
+        self.game = game
+        self._encoder = BoardEncoder(game, channels=False)
+        self._heading = None
+        if game.state != GameState.MENU:
+            # A resumed game counts as a new one
+            self._episode += 1
+        game.add_listener(self.on_game_event)
+        game.add_tick_listener(self.on_tick)
+        self._start_tick()
+
+    def on_game_event(self, event: GameEvent, game):
+        """Game listener: collect the events of the tick being recorded, and count games."""
+        self._events.append(event)
+        if event == GameEvent.GAME_START:
+            self._episode += 1
+        if event in (GameEvent.GAME_START, GameEvent.LEVEL_START):
+            self._heading = None
+            self._start_tick()
+
+    def on_tick(self, game):
+        """Tick listener: record the tick just played, if the snake moved."""
+        if game.moves != self._moves + 1:
+            # Not a tick of play, or the game was reset to the menu
+            return
+        # The direction is not changed by a tick, so it is the one the tick was played in
+        action = ACTION_INDEX[game.snake.direction]
+        direction = action if self._heading is None else ACTION_INDEX[self._heading]
+        self._rows.put((self._board, direction, action, game.score - self._score, event_mask(self._events),
+                        max(self._episode - 1, 0), self._moves, game.level_manager.current_level))
+        self.recorded += 1
+        self._heading = game.snake.direction
+        self._start_tick()
+
+    def _start_tick(self):
+        """Keep the board, move count and score the next row starts from."""
+        game = self.game
+        self._moves = game.moves
+        self._score = game.score
+        self._events = []
+        if game.state in (GameState.PLAYING, GameState.PAUSED):
+            self._encoder.sync()
+            self._board = self._encoder.padded_labels[PAD - 1:PAD + GRID_HEIGHT + 1,
+                                                      PAD - 1:PAD + GRID_WIDTH + 1].copy()
+
+    def close(self) -> str:
+        """Stop recording, finish writing and return a summary."""
+        game = self.game
+        if game is not None:
+            if self.on_tick in game.tick_listeners:
+                game.tick_listeners.remove(self.on_tick)
+            if self.on_game_event in game.listeners:
+                game.listeners.remove(self.on_game_event)
+            self.game = None
+        self._rows.put(None)
+        self._writer.join()
+        if self.error is not None:
+            return f"Dataset recording failed: {self.error}"
+        return f"Recorded {self.recorded} ticks to {self.directory} ({self.manifest['rows']} rows in total)"
+
+    def _write_loop(self):
+        """Writer thread: pack rows into shards until closed."""
+        while True:
+            row = self._rows.get()
+            if row is None:
+                break
+            if self.error is not None:
+                continue
+            try:
+                self._write(row)
+            except OSError as e:
+                self.error = e
+        try:
+            if self._shard is not None:
+                self._close_shard()
+            # Episodes started in this session, including any still open
+            self.manifest["episodes"] = max(self.manifest["episodes"], self._episode)
+            write_manifest(self.directory, self.manifest)
+        except OSError as e:
+            self.error = self.error or e
+
+    def _write(self, row):
+        """Store one row in the current shard."""
+        if self._shard is None:
+            self._open_shard()
+        board, *values = row
+        shard = self._shard
+        shard["board"][self._count] = pack_boards(board)
+        for name, value in zip(list(COLUMNS)[1:], values):
+            shard[name][self._count] = value
+        self._count += 1
+        if self._count == self.rows_per_shard:
+            self._close_shard()
+            self.manifest["episodes"] = max(self.manifest["episodes"], self._episode)
+            write_manifest(self.directory, self.manifest)
+
+    def _open_shard(self):
+        """Preallocate the column files of a new shard."""
+        name = f"shard-{len(self.manifest['shards']):06d}"
+        self._shard = {column: np.lib.format.open_memmap(os.path.join(self.directory, f"{name}.{column}.npy"),
+                                                         mode="w+", dtype=dtype,
+                                                         shape=(self.rows_per_shard,) + shape)
+                       for column, (dtype, shape) in COLUMNS.items()}
+        self._shard_name = name
+        self._count = 0
+
+    def _close_shard(self):
+        """Flush the current shard and add it to the manifest."""
+        for array in self._shard.values():
+            array.flush()
+        # Shards are preallocated, so the manifest records how many rows are valid
+        self.manifest["shards"].append({"name": self._shard_name, "rows": self._count})
+        self.manifest["rows"] += self._count
+        self._shard = None
+        self._count = 0
+
+
+class PlayDataset:
+    """Read access to a recorded dataset through memory maps."""
+
+    def __init__(self, directory: str):
+        """Open the dataset in ``directory``."""
+        self.directory = directory
+        self.manifest = read_manifest(directory)
+        self.shards = [shard for shard in self.manifest["shards"] if shard["rows"]]
+        self.offsets = np.cumsum([0] + [shard["rows"] for shard in self.shards])
+        self._open: "OrderedDict[int, Dict[str, np.ndarray]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def shard(self, index: int, columns: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """Return the valid rows of shard ``index`` as memory-mapped arrays, one per column."""
+        arrays = self._open.get(index)
+        if arrays is None:
+            arrays = {}
+            self._open[index] = arrays
+            if len(self._open) > SHARDS_OPEN:
+                self._open.popitem(last=False)
+        else:
+            self._open.move_to_end(index)
+        shard = self.shards[index]
+        for column in columns or COLUMNS:
+            if column not in arrays:
+                path = os.path.join(self.directory, f"{shard['name']}.{column}.npy")
+                arrays[column] = np.load(path, mmap_mode="r")[:shard["rows"]]
+        return {column: arrays[column] for column in columns or COLUMNS}
+
+    def stream(self, batch_size: int = 1024, columns: Optional[Sequence[str]] = None,
+               shard_order: Optional[Sequence[int]] = None) -> Iterator[Dict[str, np.ndarray]]:
+        """Yield batches of ``batch_size`` rows (the last may be shorter), shard by shard.
+
+        ``shard_order`` lists the shards to read, e.g. shuffled for an epoch.
+        """
+        columns = list(columns or COLUMNS)
+        pending: List[Dict[str, np.ndarray]] = []
+        pending_rows = 0
+        for index in (range(len(self.shards)) if shard_order is None else shard_order):
+            arrays = self.shard(index, columns)
+            rows = self.shards[index]["rows"]
+            start = 0
+            while start < rows:
+                take = min(batch_size - pending_rows, rows - start)
+                pending.append({column: arrays[column][start:start + take] for column in columns})
+                pending_rows += take
+                start += take
+                if pending_rows == batch_size:
+                    yield self._join(pending, columns)
+                    pending = []
+                    pending_rows = 0
+        if pending:
+            yield self._join(pending, columns)
+
+    @staticmethod
+    def _join(parts: List[Dict[str, np.ndarray]], columns: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Copy batch parts out of the memory maps into one array per column."""
+        return {column: np.concatenate([part[column] for part in parts]) for column in columns}
+
+    def sample(self, batch_size: int, rng: Optional[np.random.Generator] = None,
+               columns: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """Return ``batch_size`` rows drawn uniformly at random (with replacement) from all shards."""
+        if not len(self):
+            raise ValueError("The dataset is empty")
+        rng = rng if rng is not None else np.random.default_rng()
+        columns = list(columns or COLUMNS)
+        rows = np.sort(rng.integers(0, len(self), batch_size))
+        shards = np.searchsorted(self.offsets, rows, side="right") - 1
+        batch = {column: np.empty((batch_size,) + tuple(COLUMNS[column][1]), dtype=COLUMNS[column][0])
+                 for column in columns}
+        bounds = np.flatnonzero(np.diff(shards)) + 1
+        for start, end in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [batch_size]])):
+            index = int(shards[start])
+            arrays = self.shard(index, columns)
+            local = rows[start:end] - self.offsets[index]
+            for column in columns:
+                batch[column][start:end] = arrays[column][local]
+        # Rows were read in file order; shuffle them back
+        order = rng.permutation(batch_size)
+        return {column: values[order] for column, values in batch.items()}
+
+
+def summary(directory: str) -> str:
+    """Return a description of the dataset in ``directory``."""
+    data = PlayDataset(directory)
+    lines = [f"{len(data)} rows in {len(data.shards)} shards, {data.manifest['episodes']} games"]
+    if len(data):
+        counts = np.zeros(len(ACTIONS), dtype=np.int64)
+        turns = 0
+        points = 0
+        for batch in data.stream(65536, ["direction", "action", "reward"]):
+            counts += np.bincount(batch["action"], minlength=len(ACTIONS))
+            turns += int(np.count_nonzero(batch["action"] != batch["direction"]))
+            points += int(batch["reward"].sum())
+        lines.append("actions: " + ", ".join(f"{direction.name} {count}" for direction, count in zip(ACTIONS, counts)))
+        lines.append(f"{turns} turns, {points} points scored")
+    return "\n".join(lines)
+
+
+def check(ticks: int = 20000):
+    """Record a bot playing over two sessions and verify that reading back gives the same rows."""
+    from bots import GreedyBot
+    from snake_game import GameLogic
+
+    directory = tempfile.mkdtemp(prefix="snake-dataset-")
+    try:
+        expected = []
+        elapsed = 0.0
+        episodes = 0
+        for session in range(2):
+            game = GameLogic(random.Random(session))
+            recorder = DatasetRecorder(directory, rows_per_shard=1000)
+            recorder.attach(game)
+            bot = GreedyBot(random.Random(session), noise=0.05)
+            game.start_playing()
+            for _ in range(ticks // 2):
+                if game.state == GameState.GAME_OVER:
+                    game.reset_game()
+                    game.start_playing()
+                if game.state == GameState.PLAYING:
+                    game.snake.change_direction(bot.choose_direction(game))
+                    encoder = BoardEncoder(game, channels=False)
+                    board = encoder.padded_labels[PAD - 1:PAD + GRID_HEIGHT + 1, PAD - 1:PAD + GRID_WIDTH + 1].copy()
+                    expected.append((board, ACTION_INDEX[game.snake.direction], game.score))
+                start = time.perf_counter()
+                game.update()
+                elapsed += time.perf_counter() - start
+            print(recorder.close())
+            assert recorder.error is None, recorder.error
+            episodes = recorder.manifest["episodes"]
+
+        data = PlayDataset(directory)
+        assert len(data) == len(expected), (len(data), len(expected))
+        assert data.manifest["episodes"] == episodes
+        row = 0
+        for batch in data.stream(777):
+            boards = unpack_boards(batch["board"])
+            for i in range(len(boards)):
+                board, action, _ = expected[row]
+                assert np.array_equal(boards[i], board), f"board of row {row} differs"
+                assert batch["action"][i] == action, f"action of row {row} differs"
+                row += 1
+        assert row == len(expected)
+
+        columns = next(data.stream(len(data), ["reward", "episode", "tick"]))
+        scores = np.array([score for _, _, score in expected])
+        # Within a game, each reward shows up in the score of the next row
+        following = (np.diff(columns["episode"]) == 0) & (np.diff(columns["tick"].astype(np.int64)) == 1)
+        assert np.array_equal(columns["reward"][:-1][following], np.diff(scores)[following]), "rewards differ"
+
+        sample = data.sample(5000, np.random.default_rng(0), ["board", "action", "episode", "tick"])
+        rows = {(int(episode), int(tick)): i for i, (episode, tick) in
+                enumerate(zip(columns["episode"], columns["tick"]))}
+        assert len(rows) == len(data), "episode and tick do not identify rows"
+        for i in range(len(sample["tick"])):
+            row = rows[(int(sample["episode"][i]), int(sample["tick"][i]))]
+            assert np.array_equal(unpack_boards(sample["board"][i]), expected[row][0])
+            assert sample["action"][i] == expected[row][1]
+        print(f"{len(data)} rows in {len(data.shards)} shards read back correctly, "
+              f"{episodes} games; update with recording {elapsed / ticks * 1e6:.1f} us/tick")
+    finally:
+        shutil.rmtree(directory)
+
+
+def main(argv=None):
+    """Command line entry point for dataset tools."""
+    parser = argparse.ArgumentParser(description="Human-play datasets")
+    parser.add_argument("directory", nargs="?", help="Dataset to summarise")
+    parser.add_argument("--check", action="store_true", help="Record a bot game and verify reading it back")
+    parser.add_argument("--ticks", type=int, default=20000)
+    args = parser.parse_args(argv)
+    if args.check:
+        check(args.ticks)
+    elif args.directory:
+        try:
+            print(summary(args.directory))
+        except (OSError, ValueError, KeyError) as e:
+            parser.error(f"Cannot read {args.directory}: {e}")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
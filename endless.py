@@ -0,0 +1,329 @@
+"""
+Endless mode for the Snake Game.
+
+The snake roams an unbounded world instead of a walled 40x30 arena. The
+world is divided into square chunks whose obstacles are generated from
+(seed, chunk x, chunk y) alone, so a chunk always comes out the same no
+matter when, or how often, it is generated.
+
+Chunks are kept in an LRU cache of fixed size. Every tick the chunks
+around the head are touched, which keeps them in the cache, and missing
+ones are generated a few per tick, nearest to the point ahead of the head
+first, so they are ready long before the snake gets there. Chunks the
+snake has left behind drop out of the cache and are simply generated again
+if it comes back, so memory stays bounded however far it travels.
+
+Usage:
+    python endless.py [--seed 0]        # play
+    python endless.py --check           # verify determinism, bounded cache and generation ahead of time
+"""
+
+import argparse
+import random
+import time
+from collections import OrderedDict, deque
+from typing import FrozenSet, Iterable, List, Tuple
+
+import pygame
+
+from bots import is_opposite
+from snake_game import (BLACK, BLUE, CELL_RECTS, GRID_HEIGHT, GRID_WIDTH, INITIAL_SPEED, KEY_DIRECTIONS, MAX_SPEED,
+                        OBSTACLE_DENSITY, SPEED_INCREMENT, WHITE, WINDOW_HEIGHT, WINDOW_WIDTH, DeathCause, Direction,
+                        Food, Snake, play_mode)
+
+CHUNK_SIZE = 16  # Cells along each side of a chunk
+GENERATE_RADIUS = 2  # Chunks around the head's chunk kept ready
+CHUNK_CACHE_SIZE = 64  # Must exceed (2 * GENERATE_RADIUS + 1) ** 2
+CHUNKS_PER_TICK = 2  # Generation budget per tick
+LOOKAHEAD = CHUNK_SIZE  # Cells ahead of the head that generation is ordered around
+SPAWN_CLEAR = 5  # Cells around the origin kept free of obstacles
+FOOD_RADIUS = 12  # Apples appear at most this many cells from the head
+FOOD_RANGE = 2 * FOOD_RADIUS  # Apples left further behind than this move back near the head
+
+Chunk = Tuple[int, int]
+Cell = Tuple[int, int]
+
+
+def chunk_of(cell: Cell) -> Chunk:
+    """Return the coordinates of the chunk holding ``cell``."""
+    return cell[0] // CHUNK_SIZE, cell[1] // CHUNK_SIZE
+
+
+def generate_chunk(seed: int, chunk: Chunk) -> FrozenSet[Cell]:
+    """Return the obstacle cells of ``chunk`` in the world of ``seed``.
+
+    Clusters are built like those of the random levels, clipped to the chunk.
+    """
+    chunk_x, chunk_y = chunk
+    rng = random.Random(f"{seed}:{chunk_x}:{chunk_y}")
+    left, top = chunk_x * CHUNK_SIZE, chunk_y * CHUNK_SIZE
+    obstacles = set()
+    for _ in range(rng.randint(0, 3)):
+        center_x = left + rng.randrange(CHUNK_SIZE)
+        center_y = top + rng.randrange(CHUNK_SIZE)
+        cluster_size = rng.randint(2, 6)
+        for i in range(cluster_size):
+            for j in range(cluster_size):
+                if rng.random() < OBSTACLE_DENSITY:
+                    x, y = center_x + i - cluster_size // 2, center_y + j - cluster_size // 2
+                    if (left <= x < left + CHUNK_SIZE and top <= y < top + CHUNK_SIZE
+                            and max(abs(x), abs(y)) > SPAWN_CLEAR):
+                        obstacles.add((x, y))
+    return frozenset(obstacles)
+
+
+class ChunkCache:
+    """LRU cache of generated chunks."""
+
+    def __init__(self, seed: int, capacity: int = CHUNK_CACHE_SIZE):
+        """Create an empty cache for the world of ``seed``."""
+        self.seed = seed
+        self.capacity = capacity
+        self.generated = 0
+        # Chunks needed before they were prefetched; each one may cause a hitch
+        self.misses = 0
+        self._chunks: "OrderedDict[Chunk, FrozenSet[Cell]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def __contains__(self, chunk: Chunk) -> bool:
+        return chunk in self._chunks
+
+    def get(self, chunk: Chunk) -> FrozenSet[Cell]:
+        """Return the obstacles of ``chunk``, generating it now if it is not cached."""
+        obstacles = self._chunks.get(chunk)
+        if obstacles is None:
+            self.misses += 1
+            return self._generate(chunk)
+        return obstacles
+
+    def prefetch(self, chunks: Iterable[Chunk], budget: int) -> int:
+        """Mark ``chunks`` as recently used and generate up to ``budget`` missing ones, in the given order.
+
+        Returns the number generated.
+        """
+        missing = []
+        for chunk in chunks:
+            if chunk in self._chunks:
+                self._chunks.move_to_end(chunk)
+            else:
+                missing.append(chunk)
+        for chunk in missing[:budget]:
+            self._generate(chunk)
+        return min(len(missing), budget)
+
+    def _generate(self, chunk: Chunk) -> FrozenSet[Cell]:
+        """Generate ``chunk``, evicting the least recently used chunks beyond capacity."""
+        obstacles = generate_chunk(self.seed, chunk)
+        self.generated += 1
+        self._chunks[chunk] = obstacles
+        while len(self._chunks) > self.capacity:
+            self._chunks.popitem(last=False)
+        return obstacles
+
+    def cached(self) -> List[Chunk]:
+        """Return the cached chunks, least recently used first."""
+        return list(self._chunks)
+
+
+class EndlessGame:
+    """Game rules for endless mode, without rendering."""
+
+    def __init__(self, seed: int = 0):
+        """Create a game in the world of ``seed``, which also seeds the food."""
+        self.seed = seed
+        self.chunks = ChunkCache(seed)
+        self.rng = random.Random(seed)
+        self.reset()
+
+    def reset(self):
+        """Start again at the origin."""
+        self.snake = Snake()
+        self.snake.body = deque([(0, 0), (-1, 0), (-2, 0)])
+        self.body_cells = set(self.snake.body)
+        self.food = Food(self.rng)
+        self.score = 0
+        self.speed = INITIAL_SPEED
+        self.death_cause = None
+        self.moves = 0
+        # The first chunks are needed straight away
+        nearby = self.nearby_chunks()
+        self.chunks.prefetch(nearby, len(nearby))
+        self.respawn_food()
+
+    @property
+    def over(self) -> bool:
+        """True once the snake has crashed."""
+        return self.death_cause is not None
+
+    def is_obstacle(self, cell: Cell) -> bool:
+        """Return True if ``cell`` holds an obstacle."""
+        return cell in self.chunks.get(chunk_of(cell))
+
+    def nearby_chunks(self) -> List[Chunk]:
+        """Return the chunks to keep ready, nearest to the point ahead of the head first."""
+        head_x, head_y = self.snake.body[0]
+        dx, dy = self.snake.direction.value
+        ahead_x, ahead_y = head_x + dx * LOOKAHEAD, head_y + dy * LOOKAHEAD
+        center_x, center_y = chunk_of((head_x, head_y))
+        chunks = [(center_x + i, center_y + j)
+                  for i in range(-GENERATE_RADIUS, GENERATE_RADIUS + 1)
+                  for j in range(-GENERATE_RADIUS, GENERATE_RADIUS + 1)]
+        half = CHUNK_SIZE // 2
+        chunks.sort(key=lambda c: abs(c[0] * CHUNK_SIZE + half - ahead_x) + abs(c[1] * CHUNK_SIZE + half - ahead_y))
+        return chunks
+
+    def respawn_food(self):
+        """Put the apple on a free cell near the head."""
+        head_x, head_y = self.snake.body[0]
+        while True:
+            x = head_x + self.rng.randint(-FOOD_RADIUS, FOOD_RADIUS)
+            y = head_y + self.rng.randint(-FOOD_RADIUS, FOOD_RADIUS)
+            if (x, y) not in self.body_cells and not self.is_obstacle((x, y)):
+                self.food.position = (x, y)
+                return
+
+    def update(self):
+        """Advance the game by one tick."""
+        if self.over:
+            return
+        # Stays ahead of the snake: a chunk only comes within reach after many ticks in range
+        self.chunks.prefetch(self.nearby_chunks(), CHUNKS_PER_TICK)
+
+        snake = self.snake
+        if not snake.grow_pending:
+            self.body_cells.discard(snake.body[-1])
+        snake.move()
+        self.moves += 1
+        head = snake.body[0]
+        if self.is_obstacle(head):
+            self.death_cause = DeathCause.OBSTACLE
+            return
+        if head in self.body_cells:
+            self.death_cause = DeathCause.SELF
+            return
+        self.body_cells.add(head)
+
+        food_x, food_y = self.food.position
+        if head == self.food.position:
+            snake.grow()
+            self.score += 10
+            self.speed = min(self.speed + SPEED_INCREMENT, MAX_SPEED)
+            self.respawn_food()
+        elif max(abs(food_x - head[0]), abs(food_y - head[1])) > FOOD_RANGE:
+            self.respawn_food()
+
+
+def draw_endless(screen: pygame.Surface, game: EndlessGame, font: pygame.font.Font):
+    """Draw the part of the world around the head, which stays in the middle of the screen."""
+    screen.fill(BLACK)
+    head_x, head_y = game.snake.body[0]
+    origin_x, origin_y = head_x - GRID_WIDTH // 2, head_y - GRID_HEIGHT // 2
+    first_x, first_y = chunk_of((origin_x, origin_y))
+    last_x, last_y = chunk_of((origin_x + GRID_WIDTH - 1, origin_y + GRID_HEIGHT - 1))
+    for chunk_x in range(first_x, last_x + 1):
+        for chunk_y in range(first_y, last_y + 1):
+            for x, y in game.chunks.get((chunk_x, chunk_y)):
+                rect = CELL_RECTS.get((x - origin_x, y - origin_y))
+                if rect is not None:
+                    pygame.draw.rect(screen, BLUE, rect)
+                    pygame.draw.rect(screen, WHITE, rect, 1)
+
+    # Draw copies in screen coordinates with the usual artwork
+    view = Snake()
+    view.body = deque((x - origin_x, y - origin_y) for x, y in game.snake.body)
+    view.draw(screen)
+    food_x, food_y = game.food.position
+    apple = (food_x - origin_x, food_y - origin_y)
+    if 0 <= apple[0] < GRID_WIDTH and 0 <= apple[1] < GRID_HEIGHT:
+        Food.draw_at(screen, apple)
+
+    screen.blit(font.render(f"Score: {game.score}", True, WHITE), (10, 10))
+    info = f"({head_x}, {head_y})  chunks cached: {len(game.chunks)}"
+    screen.blit(font.render(info, True, WHITE), (WINDOW_WIDTH - 10 - font.size(info)[0], 10))
+    if game.over:
+        message = font.render(f"Game over: {game.score}   R: play again  ESC: quit", True, WHITE)
+        screen.blit(message, message.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)))
+
+
+def play(seed: int):
+    """Play endless mode in a window."""
+    game = EndlessGame(seed)
+
+    def frame(screen, font, keys):
+        for key in keys:
+            if key == pygame.K_r and game.over:
+                game.reset()
+            elif key in KEY_DIRECTIONS:
+                game.snake.change_direction(KEY_DIRECTIONS[key])
+        game.update()
+        draw_endless(screen, game, font)
+        return game.speed
+
+    play_mode("Snake Game - Endless", 28, frame)
+
+
+def wander(game: EndlessGame, rng: random.Random):
+    """Steer mostly straight on, turning now and then and away from anything in the way."""
+    snake = game.snake
+    head_x, head_y = snake.body[0]
+    options = [snake.direction] if rng.random() > 0.05 else []
+    options += rng.sample(list(Direction), 4)
+    for direction in options:
+        if is_opposite(snake.direction, direction):
+            continue
+        dx, dy = direction.value
+        cell = (head_x + dx, head_y + dy)
+        if cell not in game.body_cells and not game.is_obstacle(cell):
+            snake.change_direction(direction)
+            return
+
+
+def check(seed: int, ticks: int) -> Tuple[int, float]:
+    """Wander through the world of ``seed``, checking that chunks are never generated late,
+    the cache stays within capacity and regenerated chunks match the first generation.
+
+    Raises AssertionError on failure; returns the chunks generated and the slowest tick in ms.
+    """
+    game = EndlessGame(seed)
+    rng = random.Random(seed)
+    first = {}
+    slowest = 0.0
+    for _ in range(ticks):
+        if game.over:
+            game.reset()
+        wander(game, rng)
+        start = time.perf_counter()
+        game.update()
+        slowest = max(slowest, time.perf_counter() - start)
+        assert len(game.chunks) <= game.chunks.capacity, "chunk cache grew past its capacity"
+        # The outer ring may still be catching up, but everything closer must be ready
+        head_x, head_y = chunk_of(game.snake.body[0])
+        for i in range(1 - GENERATE_RADIUS, GENERATE_RADIUS):
+            for j in range(1 - GENERATE_RADIUS, GENERATE_RADIUS):
+                assert (head_x + i, head_y + j) in game.chunks, "a chunk near the head is not cached"
+        for chunk in game.chunks.cached():
+            obstacles = game.chunks.get(chunk)
+            assert first.setdefault(chunk, obstacles) == obstacles, f"chunk {chunk} came out differently"
+    assert game.chunks.misses == 0, f"{game.chunks.misses} chunks were generated on demand"
+    return game.chunks.generated, slowest * 1000
+
+
+def main(argv=None):
+    """Command line entry point for endless mode."""
+    parser = argparse.ArgumentParser(description="Snake in an endless, procedurally generated world")
+    parser.add_argument("--seed", type=int, default=0, help="World to play in")
+    parser.add_argument("--check", action="store_true", help="Verify chunk generation and caching")
+    parser.add_argument("--ticks", type=int, default=50000, help="Ticks played by --check")
+    args = parser.parse_args(argv)
+    if args.check:
+        generated, slowest = check(args.seed, args.ticks)
+        print(f"{args.ticks} ticks: {generated} chunks generated within a {CHUNK_CACHE_SIZE}-chunk cache, "
+              f"none on demand; slowest tick {slowest:.2f} ms")
+        return
+    play(args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+Multi-food mode for the Snake Game.
+
+The board holds many items at once: hundreds of apples plus bonus items
+that are worth more but disappear after a while. Everything the game does
+per tick costs the same however many items there are:
+
+- Items are kept in a map from cell to item, so eating is one lookup.
+- The free cells (neither snake nor item) are kept in an indexable set,
+  updated as the snake moves, so new items are placed by drawing random
+  indices, all of them in one pass at the end of the tick, with no
+  rejection sampling however full the board is.
+- Bonus items expire from a queue ordered by expiry time and come back
+  as apples, so the number of items on the board stays the same.
+- Items are drawn once onto a layer that is blitted whole every frame;
+  only the cells that changed since the last frame are redrawn on it.
+
+The game runs on the normal 40x30 board in a window, or on boards of any
+size without one.
+
+Usage:
+    python feast.py [--items 300]    # play
+    python feast.py --benchmark      # cost per tick against number of items
+"""
+
+import argparse
+import random
+import time
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import pygame
+
+from bots import DIRECTIONS, is_opposite
+from snake_game import (BLACK, BLUE, CELL_RECTS, FRAME_WIDTH, GRID_HEIGHT, GRID_SIZE, GRID_WIDTH, INITIAL_SPEED,
+                        KEY_DIRECTIONS, WHITE, WINDOW_HEIGHT, WINDOW_WIDTH, DeathCause, Food, Snake, play_mode)
+
+Cell = Tuple[int, int]
+
+
+class ItemKind(NamedTuple):
+    """A kind of food item."""
+
+    name: str
+    points: int
+    growth: int
+    lifetime: Optional[int]  # Ticks before it disappears, None to stay
+
+
+APPLE = ItemKind("apple", 10, 1, None)
+BONUS = ItemKind("bonus", 50, 3, 80)
+BONUS_CHANCE = 0.05  # Chance that an eaten apple comes back as a bonus item
+GOLD = (255, 215, 0)
+DARK_GOLD = (184, 134, 11)
+
+
+class FreeCells:
+    """A set of cells that can also pick random members in O(1)."""
+
+    def __init__(self, cells: Sequence[Cell] = ()):
+        """Create the set holding ``cells``."""
+        self.cells: List[Cell] = list(cells)
+        self.index: Dict[Cell, int] = {cell: i for i, cell in enumerate(self.cells)}
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def __contains__(self, cell: Cell) -> bool:
+        return cell in self.index
+
+    def add(self, cell: Cell):
+        """Add ``cell``, which must not be in the set."""
+        self.index[cell] = len(self.cells)
+        self.cells.append(cell)
+
+    def remove(self, cell: Cell):
+        """Remove ``cell`` by moving the last cell into its place."""
+        i = self.index.pop(cell)
+        last = self.cells.pop()
+        if last != cell:
+            self.cells[i] = last
+            self.index[last] = i
+
+    def take(self, count: int, rng: random.Random) -> List[Cell]:
+        """Remove and return ``count`` distinct random cells (fewer if there are not enough)."""
+        chosen = [self.cells[i] for i in rng.sample(range(len(self.cells)), min(count, len(self.cells)))]
+        for cell in chosen:
+            self.remove(cell)
+        return chosen
+
+
+class FeastGame:
+    """A snake among many food items, without rendering."""
+
+    def __init__(self, items: int = 300, rng=None, width: int = GRID_WIDTH, height: int = GRID_HEIGHT):
+        """Create a ``width`` x ``height`` board that keeps ``items`` items on it.
+
+        ``rng`` is an optional ``random.Random`` used for reproducible games.
+        """
+        self.rng = rng if rng is not None else random.Random()
+        self.width = width
+        self.height = height
+        self.item_count = items
+        self.reset()
+
+    def reset(self):
+        """Start a new game."""
+        self.snake = Snake()
+        row = self.height // 2
+        self.snake.body = deque((self.width // 2 - i, row) for i in range(3))
+        self.body_cells = set(self.snake.body)
+        self.free = FreeCells([(x, y) for y in range(self.height) for x in range(self.width)
+                               if (x, y) not in self.body_cells])
+        self.items: Dict[Cell, ItemKind] = {}
+        # (tick, cell) in expiry order, and the expiry tick of the item now in each cell that has one
+        self.expiry: deque = deque()
+        self.expires: Dict[Cell, int] = {}
+        # Cells whose item appeared or went since the last call to take_changes
+        self.changed: List[Cell] = []
+        self.score = 0
+        self.moves = 0
+        self.death_cause = None
+        self.spawn([APPLE] * self.item_count)
+
+    @property
+    def over(self) -> bool:
+        """True once the snake has crashed."""
+        return self.death_cause is not None
+
+    def spawn(self, kinds: Sequence[ItemKind]):
+        """Place one item of each of ``kinds`` on random free cells in one pass."""
+        for cell, kind in zip(self.free.take(len(kinds), self.rng), kinds):
+            self.items[cell] = kind
+            self.changed.append(cell)
+            if kind.lifetime is not None:
+                self.expiry.append((self.moves + kind.lifetime, cell))
+                self.expires[cell] = self.moves + kind.lifetime
+
+    def take_changes(self) -> List[Cell]:
+        """Return and forget the cells that changed since the last call."""
+        changed, self.changed = self.changed, []
+        return changed
+
+    def update(self):
+        """Advance the game by one tick."""
+        if self.over:
+            return
+        snake = self.snake
+        if not snake.grow_pending:
+            tail = snake.body[-1]
+            self.body_cells.discard(tail)
+            self.free.add(tail)
+        snake.move()
+        self.moves += 1
+        head = snake.body[0]
+        x, y = head
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            self.death_cause = DeathCause.WALL
+            return
+        if head in self.body_cells:
+            self.death_cause = DeathCause.SELF
+            return
+        self.body_cells.add(head)
+
+        replacements = []
+        kind = self.items.pop(head, None)
+        if kind is None:
+            self.free.remove(head)
+        else:
+            self.expires.pop(head, None)
+            self.changed.append(head)
+            self.score += kind.points
+            snake.grow_pending += kind.growth
+            replacements.append(BONUS if kind is APPLE and self.rng.random() < BONUS_CHANCE else APPLE)
+        # Expired items come back as apples; items that were eaten are skipped when their time comes
+        while self.expiry and self.expiry[0][0] <= self.moves:
+            tick, cell = self.expiry.popleft()
+            if self.expires.get(cell) == tick:
+                del self.expires[cell]
+                del self.items[cell]
+                self.free.add(cell)
+                self.changed.append(cell)
+                replacements.append(APPLE)
+        if replacements:
+            self.spawn(replacements)
+
+
+def item_sprites() -> Dict[ItemKind, pygame.Surface]:
+    """Return a cell-sized picture of each kind of item."""
+    sprites = {}
+    for kind in (APPLE, BONUS):
+        canvas = pygame.Surface((GRID_SIZE * 2, GRID_SIZE * 2), pygame.SRCALPHA)
+        if kind is APPLE:
+            Food.draw_at(canvas, (0, 0))
+        else:
+            center = CELL_RECTS[(0, 0)].center
+            pygame.draw.circle(canvas, GOLD, center, GRID_SIZE // 2 - 1)
+            pygame.draw.circle(canvas, DARK_GOLD, center, GRID_SIZE // 2 - 1, 2)
+            pygame.draw.circle(canvas, WHITE, (center[0] - 3, center[1] - 3), 2)
+        sprite = pygame.Surface((GRID_SIZE, GRID_SIZE), pygame.SRCALPHA)
+        sprite.blit(canvas, (0, 0), CELL_RECTS[(0, 0)])
+        sprites[kind] = sprite
+    return sprites
+
+
+class ItemLayer:
+    """All items drawn on one surface that is updated only where items changed."""
+
+    def __init__(self):
+        """Create an empty layer the size of the window."""
+        self.surface = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
+        self.sprites = item_sprites()
+
+    def update(self, game: FeastGame):
+        """Redraw the cells of ``game`` that changed since the last update."""
+        for cell in game.take_changes():
+            rect = CELL_RECTS[cell]
+            self.surface.fill((0, 0, 0, 0), rect)
+            kind = game.items.get(cell)
+            if kind is not None:
+                self.surface.blit(self.sprites[kind], rect)
+
+
+def draw_feast(screen: pygame.Surface, game: FeastGame, layer: ItemLayer, font: pygame.font.Font):
+    """Draw a frame of a game on the normal board."""
+    screen.fill(BLACK)
+    pygame.draw.rect(screen, BLUE, pygame.Rect(0, 0, WINDOW_WIDTH, WINDOW_HEIGHT), FRAME_WIDTH)
+    layer.update(game)
+    screen.blit(layer.surface, (0, 0))
+    game.snake.draw(screen)
+    screen.blit(font.render(f"Score: {game.score}   Items: {len(game.items)}", True, WHITE), (10, 10))
+    if game.over:
+        message = font.render(f"Game over: {game.score}   R: play again  ESC: quit", True, WHITE)
+        screen.blit(message, message.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)))
+
+
+def play(items: int):
+    """Play multi-food mode in a window."""
+    game = FeastGame(items)
+    layer = ItemLayer()
+
+    def frame(screen, font, keys):
+        nonlocal layer
+        for key in keys:
+            if key == pygame.K_r and game.over:
+                game.reset()
+                layer = ItemLayer()
+            elif key in KEY_DIRECTIONS:
+                game.snake.change_direction(KEY_DIRECTIONS[key])
+        game.update()
+        draw_feast(screen, game, layer, font)
+        return INITIAL_SPEED
+
+    play_mode("Snake Game - Feast", 28, frame)
+
+
+def steer(game: FeastGame, rng: random.Random):
+    """Turn at random now and then, avoiding walls and the body."""
+    snake = game.snake
+    head_x, head_y = snake.body[0]
+    options = [snake.direction] if rng.random() > 0.1 else []
+    options += rng.sample(DIRECTIONS, 4)
+    for direction in options:
+        if is_opposite(snake.direction, direction):
+            continue
+        dx, dy = direction.value
+        x, y = head_x + dx, head_y + dy
+        if 0 <= x < game.width and 0 <= y < game.height and (x, y) not in game.body_cells:
+            snake.change_direction(direction)
+            return
+
+
+def benchmark(ticks: int = 20000):
+    """Print the cost of a tick on a 300x300 board as the number of items grows."""
+    for items in (10, 100, 1000, 10000, 50000):
+        game = FeastGame(items, random.Random(0), 300, 300)
+        rng = random.Random(1)
+        elapsed = 0.0
+        eaten = 0
+        for _ in range(ticks):
+            if game.over:
+                game.reset()
+            steer(game, rng)
+            score = game.score
+            start = time.perf_counter()
+            game.update()
+            elapsed += time.perf_counter() - start
+            eaten += game.score != score
+            game.take_changes()
+        print(f"{items:6d} items: {elapsed / ticks * 1e6:6.2f} us/tick ({eaten} eaten)")
+
+
+def main(argv=None):
+    """Command line entry point for multi-food mode."""
+    parser = argparse.ArgumentParser(description="Snake with many food items")
+    parser.add_argument("--items", type=int, default=300, help="Items kept on the board")
+    parser.add_argument("--benchmark", action="store_true", help="Measure tick cost against the number of items")
+    args = parser.parse_args(argv)
+    if args.benchmark:
+        benchmark()
+        return
+    if not 0 < args.items < GRID_WIDTH * GRID_HEIGHT - 3:
+        parser.error(f"--items must be between 1 and {GRID_WIDTH * GRID_HEIGHT - 4}")
+    play(args.items)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Per-frame memory and garbage collection profiling for the Snake Game.
+
+``FrameProfiler`` attaches to a Game and, for every frame of its main loop,
+measures time, memory allocated (with ``tracemalloc``) and garbage
+collection pauses (with ``gc.callbacks``), split between ``update``,
+``draw`` and the rest of the frame (input handling). Its report gives the
+averages per phase, GC pause percentiles per generation, the frames that
+missed their deadline (one tick at the current speed) and how many of them
+would have made it without a GC pause, and the source lines holding the
+most memory allocated since profiling started.
+
+Memory is reported as net bytes (still allocated when the phase ends) and
+peak bytes (the most allocated at once during the phase, including
+temporaries, on Python 3.9+). ``tracemalloc`` slows every allocation down,
+so times measured with it running are higher than normal.
+
+Run ``python snake_game.py --profile-memory`` to profile a normal session,
+or this module to profile a bot playing with a long snake without a window.
+
+Usage:
+    python frame_profiler.py [--frames 3000] [--segments 600] [--top 10]
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from array import array
+from collections import deque
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+PHASES = ("update", "draw", "other")
+PERCENTILES = (50, 90, 99)
+# Flagged frames listed in the report
+SLOW_FRAMES_KEPT = 10
+
+
+class SlowFrame(NamedTuple):
+    """A frame that took longer than its deadline."""
+
+    number: int
+    duration: float
+    deadline: float
+    gc_pause: float
+
+
+def percentile(values, p: float) -> float:
+    """Return the ``p``-th percentile of ``values`` (nearest rank)."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+
+class FrameProfiler:
+    """Measures time, allocations and GC pauses per frame of a Game's main loop."""
+
+    def __init__(self, top: int = 10, traceback_frames: int = 1):
+        """Create the profiler; ``top`` allocation sites are reported."""
+        self.top = top
+        self.traceback_frames = traceback_frames
+        self.game = None
+        self.frames = 0
+        self.time: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.net_bytes: Dict[str, int] = dict.fromkeys(PHASES, 0)
+        self.peak_bytes: Dict[str, int] = dict.fromkeys(PHASES, 0)
+        self.gc_time: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.gc_pauses: List[array] = [array("d") for _ in range(3)]
+        self.missed = 0
+        self.missed_by_gc = 0
+        self.slow_frames = deque(maxlen=SLOW_FRAMES_KEPT)
+        self._phase = None
+        self._frame_gc = 0.0
+        self._gc_started = 0.0
+        self._started_tracing = False
+        self._baseline = None
+        self._top_sites = []
+        self._replaced: Dict[str, Optional[Callable]] = {}  # Instance attributes the wrappers replaced
+
+    def attach(self, game):
+        """Start profiling every frame of ``game``."""
+        self.game = game
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.traceback_frames)
+            self._started_tracing = True
+        self._baseline = tracemalloc.take_snapshot()
+        gc.callbacks.append(self._on_gc)
+        frame, update, draw = game.frame, game.update, game.draw
+        # Wrappers another tool installed on the instance are restored by detach
+        self._replaced = {name: game.__dict__.get(name) for name in ("frame", "update", "draw")}
+
+        def profiled_frame():
+            return self._frame(frame)
+
+        def profiled_update():
+            return self._measure("update", update)
+
+        def profiled_draw():
+            return self._measure("draw", draw)
+
+        game.frame = profiled_frame
+        game.update = profiled_update
+        game.draw = profiled_draw
+
+    def detach(self):
+        """Stop profiling; the numbers gathered so far are kept for ``report``."""
+        if self.game is None:
+            return
+        self._top_sites = self._allocation_sites()
+        gc.callbacks.remove(self._on_gc)
+        for name, previous in self._replaced.items():
+            if previous is None:
+                delattr(self.game, name)
+            else:
+                setattr(self.game, name, previous)
+        if self._started_tracing:
+            tracemalloc.stop()
+        self.game = None
+
+    def _on_gc(self, phase: str, info: dict):
+        """gc callback: time each collection."""
+        if phase == "start":
+            self._gc_started = time.perf_counter()
+            return
+        pause = time.perf_counter() - self._gc_started
+        self.gc_pauses[info["generation"]].append(pause)
+        if self._phase is not None:
+            self._frame_gc += pause
+            self.gc_time[self._phase] += pause
+
+    def _measure(self, phase: str, function):
+        """Run one phase of a frame, charging its time and memory to ``phase``."""
+        if self._phase is None:
+            # Outside a profiled frame, e.g. while waiting on an idle screen
+            return function()
+        outer = self._phase
+        self._phase = phase
+        memory = tracemalloc.get_traced_memory()[0]
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            return function()
+        finally:
+            elapsed = time.perf_counter() - start
+            current, peak = tracemalloc.get_traced_memory()
+            self.time[phase] += elapsed
+            self.time[outer] -= elapsed
+            self.net_bytes[phase] += current - memory
+            self.net_bytes[outer] -= current - memory
+            if hasattr(tracemalloc, "reset_peak"):
+                self.peak_bytes[phase] += peak - memory
+            self._phase = outer
+
+    def _frame(self, frame) -> bool:
+        """Run one frame, then check it against its deadline."""
+        deadline = 1 / self.game.speed
+        self._phase = "other"
+        self._frame_gc = 0.0
+        memory = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            return frame()
+        finally:
+            duration = time.perf_counter() - start
+            self._phase = None
+            self.frames += 1
+            self.time["other"] += duration
+            self.net_bytes["other"] += tracemalloc.get_traced_memory()[0] - memory
+            if duration > deadline:
+                self.missed += 1
+                if self._frame_gc and duration - self._frame_gc <= deadline:
+                    self.missed_by_gc += 1
+                self.slow_frames.append(SlowFrame(self.frames, duration, deadline, self._frame_gc))
+
+    def _allocation_sites(self):
+        """Return the statistics of the lines holding the most memory allocated since attaching."""
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        return snapshot.compare_to(self._baseline, "lineno")[:self.top]
+
+    def report(self) -> str:
+        """Return the profile as text."""
+        sites = self._allocation_sites() if self.game is not None else self._top_sites
+        frames = max(self.frames, 1)
+        lines = [f"{self.frames} frames profiled (tracemalloc slows allocations, so times are inflated)",
+                 f"{'phase':8s} {'ms/frame':>9s} {'net bytes':>10s} {'peak bytes':>11s} {'GC ms/frame':>12s}"]
+        for phase in PHASES:
+            peak = f"{self.peak_bytes[phase] / frames:11.0f}" if phase != "other" else f"{'':11s}"
+            lines.append(f"{phase:8s} {self.time[phase] / frames * 1000:9.3f} {self.net_bytes[phase] / frames:10.0f} "
+                         f"{peak} {self.gc_time[phase] / frames * 1000:12.3f}")
+        lines.append("")
+        lines.append(f"{'GC gen':8s} {'count':>7s} " + " ".join(f"{f'p{p} ms':>8s}" for p in PERCENTILES)
+                     + f" {'max ms':>8s}")
+        for generation, pauses in enumerate(self.gc_pauses):
+            lines.append(f"{generation:<8d} {len(pauses):7d} "
+                         + " ".join(f"{percentile(pauses, p) * 1000:8.3f}" for p in PERCENTILES)
+                         + f" {max(pauses, default=0.0) * 1000:8.3f}")
+        lines.append("")
+        lines.append(f"{self.missed} frames missed their deadline, {self.missed_by_gc} of them only because of GC")
+        for frame in self.slow_frames:
+            lines.append(f"  frame {frame.number}: {frame.duration * 1000:.1f} ms of {frame.deadline * 1000:.1f} ms, "
+                         f"GC {frame.gc_pause * 1000:.1f} ms")
+        lines.append("")
+        lines.append("Top allocation sites (memory still held):")
+        for stat in sites:
+            lines.append(f"  {stat}")
+        return "\n".join(lines)
+
+
+def main(argv=None):
+    """Profile a bot game with a long snake in an offscreen window."""
+    parser = argparse.ArgumentParser(description="Profile allocations and GC pauses per frame")
+    parser.add_argument("--frames", type=int, default=3000)
+    parser.add_argument("--segments", type=int, default=600, help="Grow the snake to this length first")
+    parser.add_argument("--top", type=int, default=10, help="Number of allocation sites to list")
+    args = parser.parse_args(argv)
+
+    if sys.platform.startswith("linux") and not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")):
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from bots import GreedyBot
+    from snake_game import Game, GameState
+
+    game = Game(rng=random.Random(0))
+    game.idle_wait = False
+    bot = GreedyBot(random.Random(1), noise=0.02)
+    profiler = FrameProfiler(args.top)
+    profiler.attach(game)
+    game.start_playing()
+    for _ in range(args.frames):
+        if game.state == GameState.GAME_OVER:
+            game.reset_game()
+            game.start_playing()
+        if game.state == GameState.PLAYING:
+            if len(game.snake.body) < args.segments:
+                # Grow quickly to the length of a long session
+                game.snake.grow_pending = args.segments - len(game.snake.body)
+            game.snake.change_direction(bot.choose_direction(game))
+        game.frame()
+    profiler.detach()
+    print(profiler.report())
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
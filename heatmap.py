@@ -0,0 +1,320 @@
+"""
+Heatmaps of where players spend their time and where they die.
+
+``Heatmap`` counts, for each level, the ticks the snake's head spends in
+each cell and the deaths in each cell. The counts of a session are a NumPy
+array viewing the buffer of an ``array.array``, so a tick of play costs
+one increment of a Python array item, far cheaper than indexing NumPy.
+Wall deaths land on the wall ring around the arena, which the grid
+includes. Levels from ``LEVEL_SLOTS`` on share the last
+slot, as their obstacles are random anyway.
+
+Counts are kept across sessions in one ``.npy`` file opened as a memory
+map. The counts of a session are added into it whenever a level ends, so
+a crash loses at most the level being played. Opening and adding to the
+file is done under an exclusive lock on a ``.lock`` file next to it, so
+several games can share a file (on systems with ``fcntl``; elsewhere only
+one game should use a file at a time).
+
+With a heatmap attached, pressing H while playing shows the visits to the
+current level, then its deaths, then nothing. The overlay is rebuilt from
+the counts at most a few times a second: a NumPy colour lookup is written
+through ``surfarray`` into a Surface with a pixel per cell, which is
+scaled up into one overlay Surface, so drawing it is a single blit.
+
+Usage:
+    python heatmap.py [--path FILE]                        # counts per level
+    python heatmap.py --image deaths.png --level 3 --kind deaths
+    python heatmap.py --benchmark                          # cost per tick
+"""
+
+import argparse
+import os
+import random
+import time
+from array import array
+from contextlib import contextmanager
+from typing import Optional
+
+import numpy as np
+import pygame
+
+try:
+    import fcntl
+except ImportError:  # fcntl is not available on Windows
+    fcntl = None
+
+from snake_game import (BLACK, BLUE, FRAME_WIDTH, GRID_HEIGHT, GRID_SIZE, GRID_WIDTH, WINDOW_HEIGHT, WINDOW_WIDTH,
+                        GameEvent, GameLogic, GameState, LevelManager)
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".snake_game", "heatmap.npy")
+LEVEL_SLOTS = 16  # Levels with their own counts; later levels share the last slot
+KINDS = ("visits", "deaths")
+# The arena plus the wall ring and portal row around it, indexed [y + 1, x + 1]
+GRID_SHAPE = (GRID_HEIGHT + 2, GRID_WIDTH + 2)
+COUNTS_SHAPE = (LEVEL_SLOTS, len(KINDS)) + GRID_SHAPE
+OVERLAY_REFRESH = 0.25  # Seconds between rebuilds of the overlay while counts change
+OVERLAY_ALPHA = 170  # Opacity of the hottest cells
+OVERLAY_SIZE = (GRID_SHAPE[1] * GRID_SIZE, GRID_SHAPE[0] * GRID_SIZE)
+OVERLAY_POSITION = (FRAME_WIDTH - GRID_SIZE, FRAME_WIDTH - GRID_SIZE)  # Where cell (-1, -1) is drawn
+
+
+def level_slot(level: int) -> int:
+    """Return the slot holding the counts of ``level``."""
+    return min(max(level, 1), LEVEL_SLOTS) - 1
+
+
+def colour_table(kind: str) -> np.ndarray:
+    """Return 256 RGBA colours running from cold to hot for ``kind``."""
+    t = np.linspace(0.0, 1.0, 256)
+    if kind == "deaths":
+        rgb = np.stack([255 * np.minimum(1.0, 0.4 + t), 200 * t ** 2, 60 * t ** 4], axis=1)
+    else:
+        # Blue through cyan and yellow to red
+        rgb = np.stack([255 * np.clip(2 * t - 0.6, 0, 1), 255 * np.clip(1.6 - np.abs(3 * t - 1.6), 0, 1),
+                        255 * np.clip(1.2 - 2 * t, 0, 1)], axis=1)
+    alpha = OVERLAY_ALPHA * np.sqrt(t)
+    alpha[0] = 0  # Cells never counted stay clear
+    return np.concatenate([rgb, alpha[:, None]], axis=1).round().astype(np.uint8)
+
+
+COLOUR_TABLES = {kind: colour_table(kind) for kind in KINDS}
+
+
+@contextmanager
+def locked(path: str):
+    """Hold an exclusive lock for the counts file at ``path`` while the block runs."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def open_counts(path: str) -> np.memmap:
+    """Open the counts file at ``path`` for updating, creating it if needed."""
+    if os.path.exists(path):
+        counts = np.lib.format.open_memmap(path, mode="r+")
+        if counts.shape != COUNTS_SHAPE or counts.dtype != np.uint32:
+            raise ValueError(f"{path} holds {counts.dtype} counts of shape {counts.shape}, not {COUNTS_SHAPE}")
+        return counts
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return np.lib.format.open_memmap(path, mode="w+", dtype=np.uint32, shape=COUNTS_SHAPE)
+
+
+def render_overlay(counts: np.ndarray, kind: str, surface: Optional[pygame.Surface] = None) -> pygame.Surface:
+    """Draw ``counts`` (a GRID_SHAPE array) as a translucent heatmap of OVERLAY_SIZE.
+
+    Counts are scaled logarithmically so a few very busy cells do not hide
+    the rest. ``surface``, if given, is an SRCALPHA surface of OVERLAY_SIZE
+    that is drawn into instead of a new one. Blit the result at
+    OVERLAY_POSITION.
+    """
+    levels = np.log1p(counts.astype(np.float32))
+    top = levels.max()
+    if top > 0:
+        levels *= 255 / top
+    # surfarray views are indexed [x, y]
+    colours = COLOUR_TABLES[kind][levels.astype(np.uint8).T]
+    cells = pygame.Surface(GRID_SHAPE[::-1], pygame.SRCALPHA)
+    rgb = pygame.surfarray.pixels3d(cells)
+    rgb[...] = colours[..., :3]
+    del rgb
+    alpha = pygame.surfarray.pixels_alpha(cells)
+    alpha[...] = colours[..., 3]
+    del alpha
+    if surface is None:
+        return pygame.transform.scale(cells, OVERLAY_SIZE)
+    return pygame.transform.scale(cells, OVERLAY_SIZE, surface)
+
+
+class Heatmap:
+    """Per-level visit and death counts of a Game, kept in a file across sessions."""
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        """Open (or create) the counts file at ``path``.
+
+        Raises ``OSError`` if it cannot be opened and ``ValueError`` if it
+        holds counts of a different shape.
+        """
+        self.path = path
+        with locked(path):
+            self.totals = open_counts(path)
+        self._cells = array("I", bytes(4 * int(np.prod(COUNTS_SHAPE))))
+        self.session = np.frombuffer(self._cells, dtype=np.uint32).reshape(COUNTS_SHAPE)
+        self._visits = 0  # Index in _cells of the visits to cell (0, 0) of the level being played
+        self.ticks = 0
+        self.deaths = 0
+        self.game = None
+        self.mode = None  # The kind of count shown, or None when hidden
+        self._overlay = pygame.Surface(OVERLAY_SIZE, pygame.SRCALPHA)
+        self._overlay_key = None
+        self._overlay_time = 0.0
+
+    def attach(self, game):
+        """Start counting the ticks and deaths of ``game``."""
+        self.game = game
+        self._start_level(game)
+        game.add_listener(self.on_game_event)
+        game.add_tick_listener(self.on_tick)
+
+    def _start_level(self, game):
+        """Point the visit counter at the counts of the level ``game`` is on."""
+        index = level_slot(game.level_manager.current_level) * len(KINDS)
+        self._visits = (index * GRID_SHAPE[0] + 1) * GRID_SHAPE[1] + 1
+
+    def on_tick(self, game):
+        """Tick listener: count a visit to the cell the head of a snake still playing is on."""
+        if game.state == GameState.PLAYING:
+            # The head is inside the arena, or leaving through the portal
+            x, y = game.snake.body[0]
+            if y >= -1:
+                self._cells[self._visits + y * GRID_SHAPE[1] + x] += 1
+
+    def on_game_event(self, event: GameEvent, game):
+        """Game listener: count deaths and merge the counts into the file when a level ends."""
+        if event in (GameEvent.GAME_START, GameEvent.LEVEL_START):
+            self._start_level(game)
+        elif event == GameEvent.DEATH:
+            x, y = game.snake.body[0]
+            if -1 <= x <= GRID_WIDTH and -1 <= y <= GRID_HEIGHT:
+                deaths = self.session[level_slot(game.level_manager.current_level), KINDS.index("deaths")]
+                deaths[y + 1, x + 1] += 1
+            self.deaths += 1
+            self.merge()
+        elif event == GameEvent.LEVEL_COMPLETE:
+            self.merge()
+
+    def merge(self):
+        """Add the counts of this session so far to the file."""
+        self.ticks += int(self.session[:, 0].sum())
+        with locked(self.path):
+            self.totals += self.session
+        self.session.fill(0)
+
+    def counts(self, level: int, kind: str) -> np.ndarray:
+        """Return the GRID_SHAPE counts of ``kind`` for ``level``, over all sessions."""
+        slot, index = level_slot(level), KINDS.index(kind)
+        return self.totals[slot, index] + self.session[slot, index]
+
+    def toggle(self):
+        """Show visits, then deaths, then nothing."""
+        self.mode = {None: "visits", "visits": "deaths", "deaths": None}[self.mode]
+        self._overlay_key = None
+
+    def draw(self, screen: pygame.Surface, game):
+        """Blit the heatmap of the current level over ``screen`` if one is being shown."""
+        if self.mode is None:
+            return
+        key = (self.mode, level_slot(game.level_manager.current_level))
+        now = time.perf_counter()
+        if key != self._overlay_key or now - self._overlay_time >= OVERLAY_REFRESH:
+            render_overlay(self.counts(game.level_manager.current_level, self.mode), self.mode, self._overlay)
+            self._overlay_key = key
+            self._overlay_time = now
+        screen.blit(self._overlay, OVERLAY_POSITION)
+
+    def close(self) -> str:
+        """Stop counting, write the counts to the file and return a summary."""
+        game = self.game
+        if game is not None:
+            if self.on_tick in game.tick_listeners:
+                game.tick_listeners.remove(self.on_tick)
+            if self.on_game_event in game.listeners:
+                game.listeners.remove(self.on_game_event)
+            self.game = None
+        self.merge()
+        self.totals.flush()
+        return f"Added {self.ticks} ticks and {self.deaths} deaths to {self.path}"
+
+
+def summary(path: str):
+    """Print the counts per level in the file at ``path``."""
+    counts = np.load(path, mmap_mode="r")
+    for slot in range(LEVEL_SLOTS):
+        visits, deaths = counts[slot, 0], counts[slot, 1]
+        if not visits.any() and not deaths.any():
+            continue
+        label = f"{slot + 1}+" if slot == LEVEL_SLOTS - 1 else str(slot + 1)
+        y, x = np.unravel_index(int(deaths.argmax()), GRID_SHAPE)
+        worst = f", most at ({x - 1}, {y - 1}): {deaths[y, x]}" if deaths.any() else ""
+        print(f"level {label:>3s}: {int(visits.sum()):9d} ticks {int(deaths.sum()):6d} deaths{worst}")
+
+
+def save_image(path: str, level: int, kind: str, image: str):
+    """Save a picture of the ``kind`` heatmap for ``level`` over that level's obstacles.
+
+    Levels from 6 on have random obstacles, so one layout of them is shown.
+    """
+    counts = np.load(path, mmap_mode="r")[level_slot(level), KINDS.index(kind)]
+    levels = LevelManager(random.Random(0))
+    levels.current_level = level
+    levels.generate_obstacles()
+    screen = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+    screen.fill(BLACK)
+    pygame.draw.rect(screen, BLUE, pygame.Rect(0, 0, WINDOW_WIDTH, WINDOW_HEIGHT), FRAME_WIDTH)
+    levels.draw(screen)
+    screen.blit(render_overlay(np.asarray(counts), kind), OVERLAY_POSITION)
+    pygame.image.save(screen, image)
+
+
+def benchmark(ticks: int = 200000):
+    """Print the cost of a tick of GameLogic with and without a heatmap attached."""
+    import tempfile
+    from bots import GreedyBot
+
+    def play(heatmap: Optional[Heatmap]) -> float:
+        game = GameLogic(random.Random(0))
+        bot = GreedyBot()
+        if heatmap is not None:
+            heatmap.attach(game)
+        game.start_playing()
+        elapsed = 0.0
+        for _ in range(ticks):
+            if game.state != GameState.PLAYING:
+                game.reset_game()
+                game.start_playing()
+            game.snake.change_direction(bot.choose_direction(game))
+            start = time.perf_counter()
+            game.update()
+            elapsed += time.perf_counter() - start
+        return elapsed / ticks
+
+    plain = play(None)
+    with tempfile.TemporaryDirectory() as directory:
+        heatmap = Heatmap(os.path.join(directory, "heatmap.npy"))
+        counted = play(heatmap)
+        heatmap.close()
+        start = time.perf_counter()
+        for _ in range(20):
+            render_overlay(heatmap.counts(1, "visits"), "visits")
+        rebuild = (time.perf_counter() - start) / 20
+    print(f"update:              {plain * 1e6:6.2f} us/tick")
+    print(f"update with heatmap: {counted * 1e6:6.2f} us/tick (+{(counted - plain) * 1e6:.2f})")
+    print(f"overlay rebuild:     {rebuild * 1e3:6.2f} ms")
+
+
+def main(argv=None):
+    """Command line entry point for looking at heatmaps."""
+    parser = argparse.ArgumentParser(description="Snake Game heatmaps")
+    parser.add_argument("--path", default=DEFAULT_PATH, help="Counts file written by snake_game.py --heatmap")
+    parser.add_argument("--image", metavar="PNG", help="Save a picture of a heatmap")
+    parser.add_argument("--level", type=int, default=1, help="Level of the picture")
+    parser.add_argument("--kind", choices=KINDS, default="visits", help="Counts shown in the picture")
+    parser.add_argument("--benchmark", action="store_true", help="Measure the cost of counting per tick")
+    args = parser.parse_args(argv)
+    if args.benchmark:
+        benchmark()
+    elif args.image:
+        save_image(args.path, args.level, args.kind, args.image)
+    else:
+        summary(args.path)
+
+
+if __name__ == "__main__":
+    main()
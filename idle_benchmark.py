@@ -0,0 +1,97 @@
+"""
+CPU usage of the Snake Game's idle screens.
+
+Holds the game on each idle screen (menu, paused, game over and level
+transition) for a few seconds, once redrawing every tick as before and once
+rendering the screen once and waiting for events, and reports the CPU time
+used as a percentage of one core.
+
+Uses the real display when there is one, as on the kiosks. Without one
+(Linux with neither DISPLAY nor WAYLAND_DISPLAY set) it falls back to
+SDL's dummy video driver. That driver makes redraws cheaper than a real
+window. It also cannot block on its event queue, so SDL polls it every
+millisecond while waiting, where real video drivers sleep until an
+event arrives.
+
+Usage:
+    python idle_benchmark.py [--seconds 3]
+"""
+
+import os
+import sys
+
+# Must be set before pygame initialises its display module
+if sys.platform.startswith("linux") and not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import threading
+import time
+from typing import Tuple
+
+import pygame
+
+from snake_game import DeathCause, Game, GameState
+
+
+def prepare(game: Game, state: GameState):
+    """Put ``game`` on the screen for ``state``."""
+    game.reset_game()
+    if state == GameState.MENU:
+        return
+    game.start_playing()
+    for _ in range(5):
+        game.update()
+    if state == GameState.GAME_OVER:
+        game.end_game(DeathCause.WALL)
+    elif state == GameState.LEVEL_TRANSITION:
+        game.state = GameState.LEVEL_TRANSITION
+        game.transition_timer = 0
+    else:
+        game.state = state
+
+
+def measure(game: Game, state: GameState, idle_wait: bool, seconds: float) -> Tuple[float, int]:
+    """Show ``state`` for ``seconds``; return the CPU used (percent of one core) and frames drawn."""
+    prepare(game, state)
+    game.idle_wait = idle_wait
+    frames = 0
+    draw = Game.draw
+
+    def counting_draw():
+        nonlocal frames
+        frames += 1
+        draw(game)
+
+    game.draw = counting_draw
+    # Wake the loop when time is up, as a key press would
+    waker = threading.Timer(seconds, pygame.event.post, args=(pygame.event.Event(pygame.USEREVENT),))
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    waker.start()
+    while time.perf_counter() - wall_start < seconds:
+        game.tick()
+    waker.join()
+    del game.draw
+    return (time.process_time() - cpu_start) / (time.perf_counter() - wall_start) * 100, frames
+
+
+def main(argv=None):
+    """Command line entry point for the idle CPU comparison."""
+    parser = argparse.ArgumentParser(description="Compare CPU usage of idle screens")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Time spent on each screen")
+    args = parser.parse_args(argv)
+
+    game = Game()
+    print(f"Video driver: {pygame.display.get_driver()}")
+    print(f"{'screen':18s} {'redraw every tick':>26s} {'render once + wait':>26s}")
+    for state in Game.IDLE_STATES:
+        busy_cpu, busy_frames = measure(game, state, False, args.seconds)
+        idle_cpu, idle_frames = measure(game, state, True, args.seconds)
+        print(f"{state.name.lower():18s} {busy_cpu:11.1f}% CPU {busy_frames:5d} frames "
+              f"{idle_cpu:11.1f}% CPU {idle_frames:5d} frames")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,553 @@
+"""
+JIT-compiled game rules for fast headless simulation.
+
+The rules of ``GameLogic.update`` are written here as kernels over flat
+NumPy arrays: a few ints of game state, a ring buffer of body cells, a
+count of body segments per cell and one byte of flags (wall, obstacle,
+no food) per arena cell. Cells are numbered as in ``compact``. When
+``numba`` is installed the kernels are compiled to machine code on first
+use (and cached); without it they run as ordinary Python, and
+``simulator`` hands out the pure-Python ``CompactGame`` instead, which
+follows the same rules faster than uncompiled kernels would.
+
+Food placement draws its random numbers in the kernel too, from a copy of
+the Mersenne Twister state of the game's ``random.Random``, using the same
+algorithm as CPython. Given the same seed and directions a ``KernelGame``
+therefore places food exactly like ``GameLogic`` and ends up in the same
+state, tick for tick. Only level changes, which generate obstacles with
+``LevelManager``, go back to Python and to the ``random.Random`` itself.
+
+``KernelGame.update`` runs one tick; ``KernelGame.play`` runs a whole
+array of directions in one call, leaving the kernel only to start a new
+level.
+
+Usage:
+    python kernels.py --check [--seeds 20] [--steps 5000]
+    python kernels.py --benchmark [--steps 100000]
+    NUMBA_DISABLE_JIT=1 python kernels.py --benchmark     # the same kernels, interpreted
+"""
+
+import argparse
+import random
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from bitboard import record_actions, replay
+from bots import GreedyBot
+from compact import (ARENA_BASE, ARENA_CELLS, DIRECTION_INDEX, EXIT_ROWS, FIXED_LEVELS, RIGHT, STRIDE, TOP_ROW,
+                     WALLS, CompactGame, decode, encode, level_masks, state_of)
+from snake_game import (APPLES_PER_LEVEL, GRID_HEIGHT, GRID_WIDTH, INITIAL_SPEED, LEVEL_TRANSITION_TICKS,
+                        MAX_SPEED, PORTAL_LEFT, PORTAL_RIGHT, SPEED_INCREMENT, DeathCause, Direction, GameLogic,
+                        GameState, spawn_row)
+
+try:
+    import numba
+except ImportError:  # numba is optional
+    numba = None
+
+JIT = numba is not None and not numba.config.DISABLE_JIT
+
+
+def jit(function):
+    """Compile ``function`` with numba if it is installed, else return it unchanged."""
+    if numba is None:
+        return function
+    return numba.njit(cache=True)(function)
+
+
+# Indices into the game state array
+(S_STATE, S_SCORE, S_APPLES, S_LEVEL, S_PORTAL, S_TIMER, S_MOVES, S_CAUSE, S_DIRECTION, S_GROW, S_FOOD, S_HEAD,
+ S_LENGTH, S_IN_ARENA, S_MT_INDEX) = range(15)
+STATE_SIZE = 15
+
+PLAYING = GameState.PLAYING.value
+GAME_OVER = GameState.GAME_OVER.value
+LEVEL_TRANSITION = GameState.LEVEL_TRANSITION.value
+DEATH_CAUSES = (None, DeathCause.WALL, DeathCause.SELF, DeathCause.OBSTACLE)
+WALL_DEATH, SELF_DEATH, OBSTACLE_DEATH = 1, 2, 3
+
+# Cell flags of the board
+WALL = 1
+OBSTACLE = 2
+NO_FOOD = 4  # Obstacles and pockets the snake cannot reach
+
+# Events returned by step
+PORTAL_OPENED = 1
+APPLE_EATEN = 2
+LEVEL_COMPLETE = 4
+DIED = 8
+NEXT_LEVEL = 16  # The transition is over; Python must set up the next level
+
+RING_SIZE = 4096  # Body ring buffer length, a power of two above the number of arena cells
+CELLS = (GRID_HEIGHT + 1 + EXIT_ROWS) * STRIDE  # Every cell a body segment can be in
+DELTAS = np.array([-STRIDE, STRIDE, -1, 1], dtype=np.int64)
+OPPOSITES = np.array([1, 0, 3, 2], dtype=np.int64)
+WALL_FLAGS = np.frombuffer(bytes(WALLS), dtype=np.uint8) * WALL
+
+# CPython's Mersenne Twister (MT19937)
+MT_N = 624
+MT_M = 397
+MT_MATRIX_A = 0x9908B0DF
+MT_UPPER = 0x80000000
+MT_LOWER = 0x7FFFFFFF
+
+
+@jit
+def next_random(mt, s):
+    """Return the next 32 random bits of the generator state ``mt``, like genrand_uint32."""
+    if s[S_MT_INDEX] >= MT_N:
+        for k in range(MT_N):
+            y = (mt[k] & MT_UPPER) | (mt[(k + 1) % MT_N] & MT_LOWER)
+            mt[k] = mt[(k + MT_M) % MT_N] ^ (y >> 1) ^ (MT_MATRIX_A if y & 1 else 0)
+        s[S_MT_INDEX] = 0
+    y = mt[s[S_MT_INDEX]]
+    s[S_MT_INDEX] += 1
+    y ^= y >> 11
+    y ^= (y << 7) & 0x9D2C5680
+    y ^= (y << 15) & 0xEFC60000
+    return y ^ (y >> 18)
+
+
+@jit
+def random_below(mt, s, n):
+    """Return a random int in [0, n), drawing bits like ``Random._randbelow``."""
+    bits = 0
+    while (1 << bits) <= n:
+        bits += 1
+    r = next_random(mt, s) >> (32 - bits)
+    while r >= n:
+        r = next_random(mt, s) >> (32 - bits)
+    return r
+
+
+@jit
+def random_cell(mt, s):
+    """Draw a cell the way Food.generate_position does."""
+    x = random_below(mt, s, GRID_WIDTH)
+    y = random_below(mt, s, GRID_HEIGHT)
+    return (y + EXIT_ROWS) * STRIDE + x + 1
+
+
+@jit
+def place_food(s, occupied, board, mt):
+    """Move the food to a random cell free of the snake that food may go on."""
+    while True:
+        cell = random_cell(mt, s)
+        if occupied[cell] == 0 and board[cell - ARENA_BASE] & NO_FOOD == 0:
+            s[S_FOOD] = cell
+            return
+
+
+@jit
+def push_head(s, ring, occupied, cell):
+    """Add a new head segment in ``cell``."""
+    s[S_HEAD] = (s[S_HEAD] - 1) & (RING_SIZE - 1)
+    ring[s[S_HEAD]] = cell
+    s[S_LENGTH] += 1
+    occupied[cell] += 1
+    if cell >= TOP_ROW:
+        s[S_IN_ARENA] += 1
+
+
+@jit
+def pop_tail(s, ring, occupied):
+    """Remove the last body segment."""
+    s[S_LENGTH] -= 1
+    cell = ring[(s[S_HEAD] + s[S_LENGTH]) & (RING_SIZE - 1)]
+    occupied[cell] -= 1
+    if cell >= TOP_ROW:
+        s[S_IN_ARENA] -= 1
+
+
+@jit
+def step(s, ring, occupied, board, mt, speed):
+    """Advance the game by one tick, following ``GameLogic.update``; returns the events as bit flags."""
+    if s[S_STATE] == LEVEL_TRANSITION:
+        s[S_TIMER] += 1
+        return NEXT_LEVEL if s[S_TIMER] > LEVEL_TRANSITION_TICKS else 0
+    if s[S_STATE] != PLAYING:
+        return 0
+
+    events = 0
+    if s[S_APPLES] >= APPLES_PER_LEVEL and s[S_PORTAL] == 0:
+        s[S_PORTAL] = 1
+        events |= PORTAL_OPENED
+
+    # Drop the tail first so that an occupied cell means one in body[1:]
+    head = ring[s[S_HEAD]] + DELTAS[s[S_DIRECTION]]
+    if s[S_GROW] > 0:
+        s[S_GROW] -= 1
+    else:
+        pop_tail(s, ring, occupied)
+    hit_self = occupied[head] > 0
+    push_head(s, ring, occupied, head)
+    s[S_MOVES] += 1
+
+    if s[S_PORTAL] and s[S_IN_ARENA] == 0:
+        s[S_STATE] = LEVEL_TRANSITION
+        s[S_TIMER] = 0
+        return events | LEVEL_COMPLETE
+
+    if head == s[S_FOOD]:
+        s[S_GROW] += 1
+        s[S_SCORE] += 10
+        s[S_APPLES] += 1
+        place_food(s, occupied, board, mt)
+        speed[0] = min(MAX_SPEED, speed[0] + SPEED_INCREMENT)
+        events |= APPLE_EATEN
+
+    cause = 0
+    if head < TOP_ROW:
+        # Above the arena: only the open portal's columns are allowed
+        x = head % STRIDE - 1
+        if not (s[S_PORTAL] and PORTAL_LEFT <= x <= PORTAL_RIGHT):
+            cause = WALL_DEATH
+        elif hit_self:
+            cause = SELF_DEATH
+    elif board[head - ARENA_BASE] & WALL:
+        cause = WALL_DEATH
+    elif hit_self:
+        cause = SELF_DEATH
+    elif board[head - ARENA_BASE] & OBSTACLE:
+        cause = OBSTACLE_DEATH
+    if cause:
+        s[S_STATE] = GAME_OVER
+        s[S_CAUSE] = cause
+        events |= DIED
+    return events
+
+
+@jit
+def run(s, ring, occupied, board, mt, speed, directions, start):
+    """Play ``directions[start:]`` (indices into DIRECTIONS, -1 to keep going) one per tick.
+
+    Stops early when the game is over or a new level must be set up, and
+    returns the index of the first direction not played.
+    """
+    i = start
+    while i < len(directions):
+        if s[S_STATE] != PLAYING and s[S_STATE] != LEVEL_TRANSITION:
+            break
+        direction = directions[i]
+        if direction >= 0 and direction != OPPOSITES[s[S_DIRECTION]]:
+            s[S_DIRECTION] = direction
+        i += 1
+        if step(s, ring, occupied, board, mt, speed) & NEXT_LEVEL:
+            break
+    return i
+
+
+_fixed_boards = {}
+
+
+def level_board(level: int, rng) -> np.ndarray:
+    """Return the flags of each arena cell for ``level``, generated exactly like LevelManager."""
+    board = _fixed_boards.get(level)
+    if board is not None:
+        return board
+    obstacles, food_blocked = (np.unpackbits(np.frombuffer(bytes(mask), dtype=np.uint8), bitorder="little")
+                               [:ARENA_CELLS] for mask in level_masks(level, rng))
+    board = WALL_FLAGS | obstacles * OBSTACLE | food_blocked * NO_FOOD
+    if level <= FIXED_LEVELS:
+        _fixed_boards[level] = board
+    return board
+
+
+class KernelGame:
+    """Rule-identical counterpart of ``GameLogic`` whose ticks run in the kernels above.
+
+    Random numbers are drawn from a copy of the generator state; call
+    ``sync_rng`` before using ``rng`` for anything else.
+    """
+
+    def __init__(self, rng=None):
+        """Initialize the game; ``rng`` works as for ``GameLogic``."""
+        self.rng = rng if rng is not None else random
+        self.s = np.zeros(STATE_SIZE, dtype=np.int64)
+        self.ring = np.zeros(RING_SIZE, dtype=np.int64)
+        self.occupied = np.zeros(CELLS, dtype=np.uint8)
+        self.mt = np.zeros(MT_N, dtype=np.int64)
+        self.speed_box = np.zeros(1, dtype=np.float64)
+        self._gauss = None
+        self._load_rng()
+        self.reset_game()
+
+    def _load_rng(self):
+        """Copy the state of ``rng`` into the kernels' generator."""
+        version, internal, self._gauss = self.rng.getstate()
+        self.mt[:] = internal[:MT_N]
+        self.s[S_MT_INDEX] = internal[MT_N]
+
+    def sync_rng(self):
+        """Write the kernels' generator state back to ``rng``."""
+        self.rng.setstate((3, tuple(int(word) for word in self.mt) + (int(self.s[S_MT_INDEX]),), self._gauss))
+
+    def reset_game(self):
+        """Reset the game to its initial state (consuming random numbers like GameLogic)."""
+        s = self.s
+        self._reset_snake()
+        # GameLogic creates Food (one position draw) before LevelManager
+        random_cell(self.mt, s)
+        self._set_level(1)
+        s[S_SCORE] = s[S_APPLES] = s[S_PORTAL] = s[S_TIMER] = s[S_MOVES] = s[S_CAUSE] = 0
+        s[S_STATE] = GameState.MENU.value
+        self.speed_box[0] = INITIAL_SPEED
+        place_food(s, self.occupied, self.board, self.mt)
+
+    def start_playing(self):
+        """Start the game."""
+        self.s[S_STATE] = PLAYING
+
+    def _set_level(self, level: int):
+        """Make ``level`` the current level, generating it with ``rng`` like LevelManager."""
+        if level <= FIXED_LEVELS:
+            self.board = level_board(level, self.rng)  # Draws no random numbers
+        else:
+            self.sync_rng()
+            self.board = level_board(level, self.rng)
+            self._load_rng()
+        self.s[S_LEVEL] = level
+
+    def _reset_snake(self, row: int = GRID_HEIGHT // 2):
+        """Place a three-segment snake in the centre of ``row`` heading right."""
+        s = self.s
+        while s[S_LENGTH]:
+            pop_tail(s, self.ring, self.occupied)
+        s[S_HEAD] = 0
+        for i in range(3):
+            push_head(s, self.ring, self.occupied, encode(GRID_WIDTH // 2 - 2 + i, row))
+        s[S_DIRECTION] = RIGHT
+        s[S_GROW] = 0
+
+    def _next_level(self):
+        """Set up the next level once the transition is over, like GameLogic.update."""
+        s = self.s
+        self._set_level(int(s[S_LEVEL]) + 1)
+        s[S_PORTAL] = 0
+        s[S_APPLES] = 0
+        self._reset_snake(spawn_row(lambda position: bool(self.board[encode(*position) - ARENA_BASE] & OBSTACLE)))
+        place_food(s, self.occupied, self.board, self.mt)
+        s[S_STATE] = PLAYING
+        s[S_TIMER] = 0
+
+    def update(self):
+        """Advance the game by one tick."""
+        if step(self.s, self.ring, self.occupied, self.board, self.mt, self.speed_box) & NEXT_LEVEL:
+            self._next_level()
+
+    def play(self, directions: np.ndarray) -> int:
+        """Play ``directions`` (int64 indices into DIRECTIONS, -1 to keep going) one per tick.
+
+        Stops at game over and returns the number of directions played.
+        """
+        i = 0
+        while i < len(directions):
+            i = run(self.s, self.ring, self.occupied, self.board, self.mt, self.speed_box, directions, i)
+            s = self.s
+            if s[S_STATE] == LEVEL_TRANSITION and s[S_TIMER] > LEVEL_TRANSITION_TICKS:
+                self._next_level()
+            elif s[S_STATE] != PLAYING and s[S_STATE] != LEVEL_TRANSITION:
+                break
+        return i
+
+    def change_direction(self, direction: Direction):
+        """Change direction unless it would reverse the snake."""
+        self.change_direction_index(DIRECTION_INDEX[direction])
+
+    def change_direction_index(self, index: int):
+        """Change direction by index into DIRECTIONS unless it would reverse the snake."""
+        if index != OPPOSITES[self.s[S_DIRECTION]]:
+            self.s[S_DIRECTION] = index
+
+    # The same attributes as CompactGame, read from the state array
+
+    @property
+    def state(self) -> GameState:
+        return GameState(int(self.s[S_STATE]))
+
+    @property
+    def score(self) -> int:
+        return int(self.s[S_SCORE])
+
+    @property
+    def apples_eaten(self) -> int:
+        return int(self.s[S_APPLES])
+
+    @property
+    def speed(self) -> float:
+        return float(self.speed_box[0])
+
+    @property
+    def level(self) -> int:
+        return int(self.s[S_LEVEL])
+
+    @property
+    def portal_open(self) -> bool:
+        return bool(self.s[S_PORTAL])
+
+    @property
+    def transition_timer(self) -> int:
+        return int(self.s[S_TIMER])
+
+    @property
+    def moves(self) -> int:
+        return int(self.s[S_MOVES])
+
+    @property
+    def death_cause(self) -> Optional[DeathCause]:
+        return DEATH_CAUSES[self.s[S_CAUSE]]
+
+    @property
+    def direction(self) -> int:
+        return int(self.s[S_DIRECTION])
+
+    @property
+    def grow_pending(self) -> int:
+        return int(self.s[S_GROW])
+
+    @property
+    def body(self) -> List[Tuple[int, int]]:
+        """Return the body as (x, y) positions, head first, like ``Snake.body``."""
+        head, ring = int(self.s[S_HEAD]), self.ring
+        return [decode(int(ring[(head + i) & (RING_SIZE - 1)])) for i in range(self.s[S_LENGTH])]
+
+    @property
+    def food_position(self) -> Tuple[int, int]:
+        """Return the food as an (x, y) position."""
+        return decode(int(self.s[S_FOOD]))
+
+
+def simulator(rng=None):
+    """Return the fastest rule-identical engine available: KernelGame if numba is installed, else CompactGame."""
+    return KernelGame(rng) if JIT else CompactGame(rng)
+
+
+def differential_test(seeds, steps: int, noise: float = 0.1) -> Tuple[int, int]:
+    """Run GameLogic and KernelGame side by side on the same seeded inputs.
+
+    Raises AssertionError at the first tick where their states differ.
+    Returns the number of ticks and games played.
+    """
+    ticks = games = 0
+    for seed in seeds:
+        reference = GameLogic(random.Random(seed))
+        candidate = KernelGame(random.Random(seed))
+        bot = GreedyBot(random.Random(seed + 1), noise)
+        reference.start_playing()
+        candidate.start_playing()
+        games += 1
+
+        for tick in range(steps):
+            if reference.state == GameState.GAME_OVER:
+                reference.reset_game()
+                candidate.reset_game()
+                reference.start_playing()
+                candidate.start_playing()
+                games += 1
+            if reference.state == GameState.PLAYING:
+                direction = bot.choose_direction(reference)
+                reference.snake.change_direction(direction)
+                candidate.change_direction(direction)
+            reference.update()
+            candidate.update()
+            ticks += 1
+
+            expected, actual = state_of(reference), state_of(candidate)
+            if expected != actual:
+                raise AssertionError(f"seed {seed}, tick {tick}: engines differ\n"
+                                     f"  GameLogic:  {expected}\n"
+                                     f"  KernelGame: {actual}")
+        candidate.sync_rng()
+        if candidate.rng.getstate() != reference.rng.getstate():
+            raise AssertionError(f"seed {seed}: random generators differ after {steps} ticks")
+    return ticks, games
+
+
+def games_of(actions: List[Optional[Direction]]) -> List[np.ndarray]:
+    """Split recorded actions at each restart into arrays of direction indices for ``KernelGame.play``."""
+    games, current = [], []
+    for direction in actions + [None]:
+        if direction is None:
+            games.append(np.array(current, dtype=np.int64))
+            current = []
+        else:
+            current.append(DIRECTION_INDEX[direction])
+    return games
+
+
+def replay_engine(engine, seed: int, actions: List[Optional[Direction]]):
+    """Replay recorded actions tick by tick on a new ``engine(rng)`` and return the game.
+
+    Works like ``bitboard.replay`` for engines that are not GameLogic.
+    """
+    if issubclass(engine, GameLogic):
+        return replay(engine, seed, actions)
+    game = engine(random.Random(seed))
+    game.start_playing()
+    for direction in actions:
+        if direction is None:
+            game.reset_game()
+            game.start_playing()
+        else:
+            game.change_direction(direction)
+            game.update()
+    return game
+
+
+def play_games(engine, seed: int, games: List[np.ndarray]):
+    """Play recorded games with ``KernelGame.play`` on a new ``engine(rng)`` and return the game."""
+    game = engine(random.Random(seed))
+    for index, directions in enumerate(games):
+        if index:
+            game.reset_game()
+        game.start_playing()
+        game.play(directions)
+    return game
+
+
+def benchmark(steps: int, seed: int = 0):
+    """Print ticks per second of each engine replaying the same recorded bot games."""
+    actions = record_actions(seed, steps)
+    games = games_of(actions)
+    mode = "compiled" if JIT else "interpreted"
+    # Compile (or load from the cache) before timing
+    play_games(KernelGame, seed, games_of(actions[:1000]))
+    runs = (("GameLogic", lambda: replay_engine(GameLogic, seed, actions)),
+            ("CompactGame", lambda: replay_engine(CompactGame, seed, actions)),
+            (f"KernelGame.update ({mode})", lambda: replay_engine(KernelGame, seed, actions)),
+            (f"KernelGame.play ({mode})", lambda: play_games(KernelGame, seed, games)))
+    print(f"Replaying {len(actions)} recorded ticks, numba {'enabled' if JIT else 'not used'}:")
+    finals = []
+    for name, play in runs:
+        start = time.perf_counter()
+        game = play()
+        elapsed = time.perf_counter() - start
+        finals.append(state_of(game))
+        print(f"  {name:32s} {len(actions) / elapsed:12.0f} ticks/s")
+    if any(final != finals[0] for final in finals):
+        raise AssertionError("engines finished the recorded games in different states")
+
+
+def main(argv=None):
+    """Command line entry point for the differential check and benchmark."""
+    parser = argparse.ArgumentParser(description="JIT-compiled kernel checks and benchmark")
+    parser.add_argument("--check", action="store_true", help="Compare against GameLogic tick by tick")
+    parser.add_argument("--benchmark", action="store_true", help="Compare throughput with the Python engines")
+    parser.add_argument("--seeds", type=int, default=20)
+    parser.add_argument("--steps", type=int, default=None, help="Ticks per seed (check) or in total (benchmark)")
+    args = parser.parse_args(argv)
+
+    if not (args.check or args.benchmark):
+        parser.print_help()
+        return
+    if args.check:
+        ticks, games = differential_test(range(args.seeds), args.steps or 5000)
+        print(f"Engines agree on {ticks} ticks over {games} games ({'compiled' if JIT else 'interpreted'} kernels)")
+    if args.benchmark:
+        benchmark(args.steps or 100000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""
+Lookahead search support for the Snake Game.
+
+Search bots need to try out many moves from the current position. Two
+tools make that cheap:
+
+- ``GameLogic.fork()`` copies a game without its display, sharing the
+  level's obstacles and copying the snake body only when a copy moves
+- ``StepHistory`` applies steps to one game in place and undoes or redoes
+  them without copying it. Each step records only the values it may change,
+  and saves the random generator state only when the step draws random
+  numbers (eating food or starting a level). Undo and redo take constant
+  time at any snake length: they move the head and tail of the snake's
+  deque back or forward and restore the saved values. It works with
+  ``GameLogic`` and ``BitboardGame``
+
+``LookaheadBot`` is a small depth-limited search built on both.
+
+Usage:
+    python lookahead.py --check [--seeds 20] [--steps 2000]
+    python lookahead.py --benchmark
+    python lookahead.py --play [--depth 3] [--games 20]
+"""
+
+import argparse
+import copy
+import random
+import time
+from collections import deque
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from bitboard import BitboardGame, BitSnake, crowded, position
+from bots import DIRECTIONS, GreedyBot, is_opposite
+from compact import state_of
+from snake_game import (GRID_WIDTH, GRID_HEIGHT, LEVEL_TRANSITION_TICKS, PORTAL_LEFT, PORTAL_RIGHT, Direction,
+                        GameLogic, GameState, Snake)
+
+ENGINES = (GameLogic, BitboardGame)
+
+# Distance used for cells the search heuristic cannot reach
+UNREACHABLE = GRID_WIDTH * GRID_HEIGHT
+
+
+class SnakeLayout(NamedTuple):
+    """Where a snake class keeps what a step may change."""
+    segments: str  # Attribute holding the body as a deque, head first
+    fields: Tuple[str, ...]  # Other attributes a move may change
+    head: Callable  # head(snake) returns the (x, y) position of the head
+
+
+# Snake classes StepHistory can undo moves of in constant time
+SNAKE_LAYOUTS = {
+    Snake: SnakeLayout("body", ("direction", "grow_pending", "shared"), lambda snake: snake.body[0]),
+    BitSnake: SnakeLayout("cells", ("direction", "grow_pending", "bits", "self_hit"),
+                          lambda snake: position(snake.cells[0])),
+}
+
+
+class StepHistory:
+    """Applies steps to a GameLogic in place and undoes or redoes them.
+
+    Undo restores the game, including its random generator, exactly as it
+    was before the step, and redo exactly as it was after. Both take
+    constant time: a step that moves the snake is reverted by taking the
+    head off and putting the tail back on the body deque. Listeners are
+    only notified when a step is first applied, so search should run on a
+    fork. ``GameLogic`` and ``BitboardGame`` games are supported.
+    """
+
+    def __init__(self, game: GameLogic):
+        """Track steps applied to ``game``.
+
+        Raises TypeError if its snake is not one of SNAKE_LAYOUTS.
+        """
+        snake_class = type(getattr(game, "snake", None))
+        if snake_class not in SNAKE_LAYOUTS:
+            raise TypeError(f"StepHistory cannot undo moves of a {snake_class.__name__}")
+        self.game = game
+        self.layout = SNAKE_LAYOUTS[snake_class]
+        self._undo = []
+        self._redo = []
+
+    def __len__(self) -> int:
+        """Return the number of steps that can be undone."""
+        return len(self._undo)
+
+    def step(self, direction: Optional[Direction] = None):
+        """Steer in ``direction`` (if given) and advance the game by one tick."""
+        self._redo.clear()
+        game = self.game
+        layout = self.layout
+        snake = game.snake
+        segments = getattr(snake, layout.segments)
+        length = len(segments)
+        tail = segments[-1]
+        playing = game.state == GameState.PLAYING
+        before = self._state(game)
+        if direction is not None:
+            snake.change_direction(direction)
+        rng_state = game.rng.getstate() if self._draws_random(game) else None
+        game.update()
+
+        after = self._state(game)
+        if playing and getattr(snake, layout.segments) is segments:
+            # The snake moved in place; remember the cells that came and went
+            move = (segments[0], None if len(segments) > length else tail)
+        else:
+            # Not moved, or the body deque was replaced by copy-on-write or a new level
+            move = None
+        self._undo.append((before, after, move, rng_state,
+                           game.rng.getstate() if rng_state is not None else None))
+
+    def undo(self) -> bool:
+        """Revert the last step; returns False if there is nothing to undo."""
+        if not self._undo:
+            return False
+        record = self._undo.pop()
+        before, _, move, rng_state, _ = record
+        if move is not None:
+            segments = getattr(self.game.snake, self.layout.segments)
+            segments.popleft()
+            if move[1] is not None:
+                segments.append(move[1])
+        self._restore(before, rng_state)
+        self._redo.append(record)
+        return True
+
+    def redo(self) -> bool:
+        """Re-apply the last undone step; returns False if there is nothing to redo."""
+        if not self._redo:
+            return False
+        record = self._redo.pop()
+        _, after, move, _, rng_state = record
+        if move is not None:
+            segments = getattr(self.game.snake, self.layout.segments)
+            if move[1] is not None:
+                segments.pop()
+            segments.appendleft(move[0])
+        self._restore(after, rng_state)
+        self._undo.append(record)
+        return True
+
+    def _state(self, game: GameLogic) -> tuple:
+        """Return the values of ``game`` a step may change, apart from its body and random generator."""
+        snake = game.snake
+        level_manager = game.level_manager
+        return (getattr(snake, self.layout.segments), tuple(getattr(snake, name) for name in self.layout.fields),
+                game.food.position, level_manager.current_level, level_manager.obstacles, game.score,
+                game.apples_eaten, game.speed, game.state, game.portal_open, game.transition_timer, game.moves,
+                game.death_cause)
+
+    def _restore(self, state: tuple, rng_state):
+        """Put back values saved by ``_state`` and, if given, the random generator state."""
+        game = self.game
+        snake = game.snake
+        (segments, fields, game.food.position, level, obstacles, game.score, game.apples_eaten, game.speed,
+         game.state, game.portal_open, game.transition_timer, game.moves, game.death_cause) = state
+        setattr(snake, self.layout.segments, segments)
+        for name, value in zip(self.layout.fields, fields):
+            setattr(snake, name, value)
+        game.level_manager.current_level = level
+        game.level_manager.obstacles = obstacles
+        if rng_state is not None:
+            game.rng.setstate(rng_state)
+
+    def _draws_random(self, game: GameLogic) -> bool:
+        """Return True if the next update will draw random numbers."""
+        if game.state == GameState.PLAYING:
+            # Eating respawns the food
+            head_x, head_y = self.layout.head(game.snake)
+            dx, dy = game.snake.direction.value
+            return (head_x + dx, head_y + dy) == game.food.position
+        # Starting the next level generates obstacles and respawns the food
+        return game.state == GameState.LEVEL_TRANSITION and game.transition_timer + 1 > LEVEL_TRANSITION_TICKS
+
+
+class LookaheadBot:
+    """Picks the direction with the best discounted outcome ``depth`` moves ahead."""
+
+    # Weight of each further move; sooner apples beat later ones
+    DISCOUNT = 0.9
+
+    def __init__(self, depth: int = 3):
+        """Create the bot with the given search depth."""
+        self.depth = depth
+        self.nodes = 0
+        self._field_key = None
+        self._field: Dict[Tuple[int, int], int] = {}
+
+    def choose_direction(self, game: GameLogic) -> Direction:
+        """Return the direction to steer in this tick."""
+        self._update_field(game)
+        return self._search(StepHistory(game.fork()), self.depth)[1]
+
+    def _update_field(self, game: GameLogic):
+        """Compute path lengths around obstacles to the food, or to the open portal."""
+        if game.portal_open:
+            sources = [(x, 0) for x in range(PORTAL_LEFT, PORTAL_RIGHT + 1)]
+        else:
+            sources = [game.food.position]
+        obstacles = game.level_manager.obstacles
+        key = (sources[0], obstacles)
+        if key == self._field_key:
+            return
+        self._field_key = key
+        blocked = {cell for obstacle in obstacles for cell in obstacle.positions}
+        field = {cell: 0 for cell in sources}
+        queue = deque(sources)
+        while queue:
+            x, y = cell = queue.popleft()
+            for dx, dy in ((0, -1), (0, 1), (-1, 0), (1, 0)):
+                neighbour = (x + dx, y + dy)
+                if (neighbour not in field and neighbour not in blocked
+                        and 0 <= neighbour[0] < GRID_WIDTH and 0 <= neighbour[1] < GRID_HEIGHT):
+                    field[neighbour] = field[cell] + 1
+                    queue.append(neighbour)
+        self._field = field
+
+    def _search(self, history: StepHistory, depth: int) -> Tuple[float, Direction]:
+        """Return the best value reachable in ``depth`` moves and the first direction towards it."""
+        game = history.game
+        current = game.snake.direction
+        score = game.score
+        best_value, best_direction = None, current
+        for direction in DIRECTIONS:
+            if is_opposite(current, direction):
+                continue
+            history.step(direction)
+            value = game.score - score + self.DISCOUNT * self._evaluate(history, depth - 1)
+            history.undo()
+            if best_value is None or value > best_value:
+                best_value, best_direction = value, direction
+        return best_value, best_direction
+
+    def _evaluate(self, history: StepHistory, depth: int) -> float:
+        """Return the value of the position reached, searching ``depth`` more moves."""
+        self.nodes += 1
+        game = history.game
+        if game.state == GameState.GAME_OVER:
+            return -1000.0
+        if game.state == GameState.LEVEL_TRANSITION:
+            return 1000.0
+        if depth > 0:
+            return self._search(history, depth)[0]
+
+        head = game.snake.body[0]
+        if game.portal_open:
+            # The level ends once the whole body is up the portal shaft
+            if head[1] < 0:
+                distance = head[1] + len(game.snake.body)
+            else:
+                distance = self._field.get(head, UNREACHABLE) + len(game.snake.body)
+        elif game.food.position == self._field_key[0]:
+            distance = self._field.get(head, UNREACHABLE)
+        else:
+            # Food respawned during the search
+            food_x, food_y = game.food.position
+            distance = abs(head[0] - food_x) + abs(head[1] - food_y)
+        return -0.1 * distance
+
+
+def check(seeds, steps: int, excursion: int = 6, engine=GameLogic) -> int:
+    """Verify forks and undo/redo against plain play; returns the number of ticks checked.
+
+    At every tick of games on ``engine(rng)`` a random excursion of
+    ``excursion`` steps is applied, undone, redone on the game and
+    replayed on a fork. Raises AssertionError at the first difference.
+    """
+    ticks = 0
+    for seed in seeds:
+        game = engine(random.Random(seed))
+        bot = GreedyBot(random.Random(seed + 1), noise=0.1)
+        explorer = random.Random(seed + 2)
+        history = StepHistory(game)
+        game.start_playing()
+        for tick in range(steps):
+            if game.state == GameState.GAME_OVER:
+                game.reset_game()
+                game.start_playing()
+            before = (state_of(game), game.rng.getstate())
+            fork = game.fork()
+
+            directions = [explorer.choice(DIRECTIONS) for _ in range(excursion)]
+            for direction in directions:
+                history.step(direction)
+            after = (state_of(game), game.rng.getstate())
+            for _ in directions:
+                history.undo()
+            if (state_of(game), game.rng.getstate()) != before:
+                raise AssertionError(f"seed {seed}, tick {tick}: undo did not restore the game")
+            while history.redo():
+                pass
+            if (state_of(game), game.rng.getstate()) != after:
+                raise AssertionError(f"seed {seed}, tick {tick}: redo did not reproduce the game")
+            for _ in directions:
+                history.undo()
+
+            for direction in directions:
+                fork.snake.change_direction(direction)
+                fork.update()
+            if (state_of(fork), fork.rng.getstate()) != after:
+                raise AssertionError(f"seed {seed}, tick {tick}: fork did not play like the game")
+            if (state_of(game), game.rng.getstate()) != before:
+                raise AssertionError(f"seed {seed}, tick {tick}: playing a fork changed the game")
+
+            direction = bot.choose_direction(game) if game.state == GameState.PLAYING else None
+            history.step(direction)
+            ticks += 1
+    return ticks
+
+
+def benchmark(repeats: int = 2000):
+    """Print the cost of copying a game with deepcopy, fork and undo/redo."""
+    game = GameLogic(random.Random(0))
+    game.start_playing()
+    bot = GreedyBot(random.Random(1))
+    while len(game.snake.body) < 12 and game.state == GameState.PLAYING:
+        game.snake.change_direction(bot.choose_direction(game))
+        game.update()
+
+    def per_call(function) -> float:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            function()
+        return (time.perf_counter() - start) / repeats * 1e6
+
+    def deepcopy_step():
+        clone = copy.deepcopy(game)
+        clone.update()
+
+    def fork_step():
+        clone = game.fork()
+        clone.update()
+
+    shared_rng = random.Random(0)
+
+    def fork_shared_rng_step():
+        clone = game.fork(shared_rng)
+        clone.update()
+
+    history = StepHistory(game.fork())
+
+    def step_undo():
+        history.step()
+        history.undo()
+
+    print(f"Copy and advance one tick ({len(game.snake.body)}-segment snake, level {game.level_manager.current_level}):")
+    print(f"  copy.deepcopy          {per_call(deepcopy_step):8.2f} us")
+    print(f"  fork                   {per_call(fork_step):8.2f} us")
+    print(f"  fork with shared rng   {per_call(fork_shared_rng_step):8.2f} us")
+    print(f"  step + undo            {per_call(step_undo):8.2f} us")
+
+    print("Undo + redo of one step:")
+    for engine in ENGINES:
+        for length in (12, GRID_WIDTH * GRID_HEIGHT * 9 // 10):
+            long_game = crowded(engine, length)
+            long_game.state = GameState.PLAYING
+            long_history = StepHistory(long_game)
+            long_history.step()
+
+            def undo_redo():
+                long_history.undo()
+                long_history.redo()
+
+            label = f"{engine.__name__}, {length} segments"
+            print(f"  {label:28s} {per_call(undo_redo):6.2f} us")
+
+
+def play(depth: int, games: int):
+    """Print the average score of LookaheadBot and GreedyBot over seeded games."""
+    for name, make_bot in (("GreedyBot", lambda: GreedyBot(random.Random(1))),
+                           (f"LookaheadBot(depth={depth})", lambda: LookaheadBot(depth))):
+        total = 0
+        start = time.perf_counter()
+        for seed in range(games):
+            game = GameLogic(random.Random(seed))
+            bot = make_bot()
+            game.start_playing()
+            for _ in range(20000):
+                if game.state == GameState.GAME_OVER:
+                    break
+                if game.state == GameState.PLAYING:
+                    game.snake.change_direction(bot.choose_direction(game))
+                game.update()
+            total += game.score
+        elapsed = time.perf_counter() - start
+        print(f"{name:24s} average score {total / games:7.1f} ({elapsed:.1f}s)")
+
+
+def main(argv=None):
+    """Command line entry point for checks, benchmark and bot games."""
+    parser = argparse.ArgumentParser(description="Game forking and undo/redo for lookahead search")
+    parser.add_argument("--check", action="store_true", help="Verify fork and undo/redo against plain play")
+    parser.add_argument("--benchmark", action="store_true", help="Compare copying costs")
+    parser.add_argument("--play", action="store_true", help="Compare LookaheadBot with GreedyBot")
+    parser.add_argument("--seeds", type=int, default=20)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--games", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if not (args.check or args.benchmark or args.play):
+        parser.print_help()
+        return
+    if args.check:
+        for engine in ENGINES:
+            ticks = check(range(args.seeds), args.steps, engine=engine)
+            print(f"Fork and undo/redo agree with plain play on {ticks} ticks of {engine.__name__}")
+    if args.benchmark:
+        benchmark()
+    if args.play:
+        play(args.depth, args.games)
+
+
+if __name__ == "__main__":
+    main()
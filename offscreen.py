@@ -0,0 +1,287 @@
+"""
+Offscreen batch rendering of Snake games for video datasets.
+
+Games are played by a bot and drawn with ``Game.draw_state`` into a small
+pool of reusable 32-bit Surfaces using SDL's dummy video driver. A writer
+thread reads each Surface through a ``pygame.surfarray`` view (no copy) and
+streams it into fixed-size shards on disk, either raw ``.npy`` memmaps or
+compressed ``.npz`` files. Memory use is bounded by the Surface pool and one
+shard buffer, however many frames are produced.
+
+Shards hold whole 32-bit pixels, which is a plain memory copy of the
+Surface (about 15x faster than repacking to RGB on write).
+``load_shard()`` returns them as an RGB view without copying.
+
+Usage:
+    python offscreen.py OUT_DIR --frames 100000 [--format npz] [--size 160x120] [--workers 4]
+"""
+
+import os
+
+# Must be set before pygame initialises its display module
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import json
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+import numpy as np
+import pygame
+
+from bots import GreedyBot
+from snake_game import WINDOW_WIDTH, WINDOW_HEIGHT, Game, GameState, parse_size
+
+MANIFEST_NAME = "manifest.json"
+
+
+class ShardWriter:
+    """Writes frames into fixed-size shards and records them in a manifest."""
+
+    def __init__(self, directory: str, frame_size: Tuple[int, int], masks: Tuple[int, int, int, int],
+                 frames_per_shard: int = 1024, fmt: str = "raw", prefix: str = "frames"):
+        """Prepare the output directory.
+
+        ``frame_size`` is (width, height), ``masks`` the Surface colour masks
+        and ``fmt`` either ``"raw"`` or ``"npz"``.
+        """
+        if fmt not in ("raw", "npz"):
+            raise ValueError(f"Unknown shard format: {fmt}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.frame_shape = (frame_size[1], frame_size[0])
+        self.channel_bytes = [channel_byte(mask) for mask in masks[:3]]
+        self.frames_per_shard = frames_per_shard
+        self.fmt = fmt
+        self.prefix = prefix
+        self.shards = []
+        self.frames_written = 0
+
+        self._shard = None
+        self._shard_name = None
+        self._count = 0
+        # Compressed shards are assembled in one reused buffer
+        self._buffer = np.empty((frames_per_shard,) + self.frame_shape, dtype=np.uint32) if fmt == "npz" else None
+
+    def write(self, pixels: np.ndarray):
+        """Append one frame given as a (width, height) ``surfarray.pixels2d`` view."""
+        if self._shard is None:
+            self._open_shard()
+        # The transposed view is contiguous, so this is a straight memory copy
+        self._shard[self._count] = pixels.T
+        self._count += 1
+        self.frames_written += 1
+        if self._count == self.frames_per_shard:
+            self._close_shard()
+
+    def close(self):
+        """Finish the current shard and write the manifest."""
+        if self._shard is not None:
+            self._close_shard()
+        manifest = {
+            "format": self.fmt,
+            "dtype": "uint32",
+            "frame_shape": list(self.frame_shape),
+            "rgb_bytes": self.channel_bytes,
+            "frames": self.frames_written,
+            "shards": self.shards,
+        }
+        with open(os.path.join(self.directory, f"{self.prefix}-{MANIFEST_NAME}"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+    def _open_shard(self):
+        """Start a new shard."""
+        index = len(self.shards)
+        if self.fmt == "raw":
+            name = f"{self.prefix}-{index:05d}.npy"
+            self._shard = np.lib.format.open_memmap(os.path.join(self.directory, name), mode="w+",
+                                                    dtype=np.uint32,
+                                                    shape=(self.frames_per_shard,) + self.frame_shape)
+        else:
+            name = f"{self.prefix}-{index:05d}.npz"
+            self._shard = self._buffer
+        self._shard_name = name
+        self._count = 0
+
+    def _close_shard(self):
+        """Flush the current shard to disk."""
+        if self.fmt == "raw":
+            self._shard.flush()
+        else:
+            np.savez_compressed(os.path.join(self.directory, self._shard_name), frames=self._shard[:self._count])
+        # Raw shards are preallocated, so the manifest records how many frames are valid
+        self.shards.append({"file": self._shard_name, "frames": self._count})
+        self._shard = None
+        self._count = 0
+
+
+def channel_byte(mask: int) -> int:
+    """Return the byte offset of a colour channel within a little-endian pixel."""
+    return (mask & -mask).bit_length() // 8
+
+
+def load_shard(directory: str, shard: dict, rgb_bytes) -> np.ndarray:
+    """Return the valid frames of a manifest shard entry as an RGB array.
+
+    Raw shards are memory-mapped; the result is a view of shape
+    (frames, height, width, 3).
+    """
+    path = os.path.join(directory, shard["file"])
+    if path.endswith(".npz"):
+        with np.load(path) as data:
+            frames = data["frames"]
+    else:
+        frames = np.load(path, mmap_mode="r")
+    frames = frames[:shard["frames"]].view(np.uint8).reshape(frames[:shard["frames"]].shape + (4,))
+    r, g, b = rgb_bytes
+    if (r, g, b) == (2, 1, 0):
+        return frames[..., 2::-1]
+    if (r, g, b) == (0, 1, 2):
+        return frames[..., :3]
+    return frames[..., [r, g, b]]
+
+
+class OffscreenRenderer:
+    """Plays bot games and renders every tick into a pool of reusable Surfaces."""
+
+    def __init__(self, size: Optional[Tuple[int, int]] = None, pool_size: int = 4, seed: int = 0,
+                 include_transitions: bool = False):
+        """Create the game and the Surface pool.
+
+        ``size`` scales frames down (or up) from the window size.
+        """
+        self.game = Game(rng=random.Random(seed))
+        self.bot = GreedyBot(random.Random(seed + 1), noise=0.05)
+        self.size = size or (WINDOW_WIDTH, WINDOW_HEIGHT)
+        self.include_transitions = include_transitions
+        self.games_played = 0
+
+        # At window size the game draws straight into pool Surfaces; otherwise
+        # it draws into one full-size target that is scaled into the pool
+        self._scaled = self.size != (WINDOW_WIDTH, WINDOW_HEIGHT)
+        self._render_target = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), 0, 32) if self._scaled else None
+        self._pool = [pygame.Surface(self.size, 0, 32) for _ in range(pool_size)]
+        # The writer thread puts None here if it fails, so render() never waits on it forever
+        self._free: "queue.Queue[Optional[int]]" = queue.Queue()
+        for index in range(pool_size):
+            self._free.put(index)
+        self._filled: "queue.Queue[Optional[int]]" = queue.Queue()
+        self._error: Optional[Exception] = None
+
+    @property
+    def masks(self) -> Tuple[int, int, int, int]:
+        """Colour masks of the pooled Surfaces."""
+        return self._pool[0].get_masks()
+
+    def render(self, writer: ShardWriter, frames: int) -> float:
+        """Render ``frames`` frames into ``writer`` and return frames per second.
+
+        Errors raised while writing frames are raised here once the writer
+        thread has stopped.
+        """
+        self._error = None
+        consumer = threading.Thread(target=self._consume, args=(writer,), name="frame-writer")
+        consumer.start()
+        start = time.perf_counter()
+        try:
+            for _ in range(frames):
+                index = self._free.get()
+                if index is None:
+                    break
+                surface = self._pool[index]
+                if self._scaled:
+                    self._advance(self._render_target)
+                    pygame.transform.scale(self._render_target, self.size, surface)
+                else:
+                    self._advance(surface)
+                self._filled.put(index)
+        finally:
+            self._filled.put(None)
+            consumer.join()
+        if self._error is not None:
+            raise self._error
+        return frames / (time.perf_counter() - start)
+
+    def _advance(self, surface: pygame.Surface):
+        """Advance the bot game by one tick and draw it onto ``surface``."""
+        game = self.game
+        if game.state != GameState.PLAYING and game.state != GameState.LEVEL_TRANSITION:
+            game.reset_game()
+            game.start_playing()
+            self.games_played += 1
+
+        if game.state == GameState.PLAYING:
+            game.snake.change_direction(self.bot.choose_direction(game))
+        game.update()
+        if not self.include_transitions:
+            while game.state == GameState.LEVEL_TRANSITION:
+                game.update()
+        game.screen = surface
+        game.draw_state()
+
+    def _consume(self, writer: ShardWriter):
+        """Writer thread: copy filled Surfaces into shards and recycle them.
+
+        On failure the error is kept for ``render`` and None is queued as a
+        free Surface to stop it.
+        """
+        try:
+            while True:
+                index = self._filled.get()
+                if index is None:
+                    break
+                pixels = pygame.surfarray.pixels2d(self._pool[index])
+                writer.write(pixels)
+                # Release the Surface lock before the Surface is drawn on again
+                del pixels
+                self._free.put(index)
+            writer.close()
+        except Exception as error:
+            self._error = error
+            self._free.put(None)
+
+
+def render_dataset(directory: str, frames: int, size: Optional[Tuple[int, int]] = None, fmt: str = "raw",
+                   frames_per_shard: int = 1024, seed: int = 0, prefix: str = "frames") -> float:
+    """Render ``frames`` frames of bot games into ``directory``; returns frames per second."""
+    renderer = OffscreenRenderer(size=size, seed=seed)
+    writer = ShardWriter(directory, renderer.size, renderer.masks, frames_per_shard, fmt, prefix)
+    return renderer.render(writer, frames)
+
+
+def main(argv=None):
+    """Command line entry point for dataset generation."""
+    parser = argparse.ArgumentParser(description="Render Snake games offscreen into frame shards")
+    parser.add_argument("directory")
+    parser.add_argument("--frames", type=int, default=10000, help="Frames per worker")
+    parser.add_argument("--format", default="raw", choices=["raw", "npz"])
+    parser.add_argument("--size", type=parse_size, help="Output frame size, e.g. 160x120")
+    parser.add_argument("--frames-per-shard", type=int, default=1024)
+    parser.add_argument("--workers", type=int, default=1, help="Rendering processes")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    prefixes = [f"worker{i:02d}" for i in range(args.workers)]
+    seeds = [args.seed + 1000 * i for i in range(args.workers)]
+    start = time.perf_counter()
+    if args.workers == 1:
+        render_dataset(args.directory, args.frames, args.size, args.format, args.frames_per_shard,
+                       seeds[0], prefixes[0])
+    else:
+        with ProcessPoolExecutor(args.workers) as pool:
+            futures = [pool.submit(render_dataset, args.directory, args.frames, args.size, args.format,
+                                   args.frames_per_shard, seed, prefix)
+                       for seed, prefix in zip(seeds, prefixes)]
+            for future in futures:
+                future.result()
+    elapsed = time.perf_counter() - start
+    total = args.frames * args.workers
+    print(f"Rendered {total} frames in {elapsed:.1f}s ({total / elapsed:.0f} frames/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Particle effects for the Snake Game.
+
+``ParticlePool`` keeps every particle in a fixed set of NumPy arrays (one
+per attribute, ``capacity`` long) with the live particles packed at the
+front, so there is no Python object per particle. Emitting writes a slice,
+updating is a handful of whole-array operations, dead particles are
+dropped with one compaction, and drawing alpha-blends all particles into
+the screen through a ``surfarray`` view with a few fancy-indexing writes.
+
+Each pool has a time budget per frame. When updating and drawing take
+longer than that, the number of particles allowed is cut (the oldest go
+first) and it grows back while frames are cheap, so effects thin out
+rather than slow the game down.
+
+``GameEffects`` listens to a Game and adds a burst of sparks when an apple
+is eaten, the snake breaking apart when it dies and a pulsing glow with
+particles drawn into the open portal.
+
+Usage:
+    python particles.py [--particles 4000] [--frames 600]   # cost per frame
+"""
+
+import argparse
+import math
+import time
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pygame
+
+from snake_game import (CELL_CENTERS, GRID_SIZE, PORTAL_LEFT, PORTAL_RIGHT, PORTAL_WIDTH, WINDOW_WIDTH,
+                        GameEvent, GameState)
+
+DEFAULT_CAPACITY = 4096
+FRAME_BUDGET = 0.002  # Seconds per frame for updating and drawing particles
+MIN_LIMIT = 64  # Particles always allowed, however slow frames are
+MAX_STEP = 0.1  # Longest time step simulated at once, e.g. after a pause
+
+MAX_SIZE = 4  # Largest particle, in pixels square
+# Pixel offsets within a square particle of each size, and the number of pixels it covers
+SQUARE_AREAS = np.arange(MAX_SIZE + 1) ** 2
+SQUARE_DX = np.array([[k % max(side, 1) for k in range(MAX_SIZE ** 2)] for side in range(MAX_SIZE + 1)])
+SQUARE_DY = np.array([[k // max(side, 1) for k in range(MAX_SIZE ** 2)] for side in range(MAX_SIZE + 1)])
+
+APPLE_SPARKS = ((255, 80, 60), (255, 200, 80), (120, 220, 80))
+DEATH_SPARKS = ((0, 180, 0), (50, 205, 50), (255, 60, 60))
+PORTAL_GLOW = (100, 200, 255)
+
+
+class ParticlePool:
+    """A fixed-capacity pool of particles stored as structure-of-arrays."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, budget: float = FRAME_BUDGET, seed: Optional[int] = None):
+        """Allocate room for ``capacity`` particles; ``budget`` is in seconds per frame."""
+        self.capacity = capacity
+        self.budget = budget
+        self.limit = capacity
+        self.count = 0
+        self.dropped = 0
+        self.rng = np.random.default_rng(seed)
+        self.position = np.zeros((capacity, 2), dtype=np.float32)
+        self.velocity = np.zeros((capacity, 2), dtype=np.float32)
+        self.age = np.zeros(capacity, dtype=np.float32)
+        self.life = np.ones(capacity, dtype=np.float32)
+        self.color = np.zeros((capacity, 3), dtype=np.float32)
+        self.size = np.zeros(capacity, dtype=np.int8)
+        self.gravity = np.zeros(capacity, dtype=np.float32)
+        self.last_cost = 0.0
+
+    @property
+    def active(self) -> bool:
+        """True while any particle is alive."""
+        return self.count > 0
+
+    def clear(self):
+        """Remove every particle."""
+        self.count = 0
+
+    def emit(self, origins, count: int, speed: Tuple[float, float], life: Tuple[float, float],
+             colors: Sequence[Tuple[int, int, int]], size: Tuple[int, int] = (1, 3), gravity: float = 0.0,
+             direction: Optional[Tuple[float, float]] = None, spread: float = math.pi) -> int:
+        """Add ``count`` particles at each of ``origins`` (pixel positions, shape (n, 2)).
+
+        Speeds (pixels per second), lifetimes (seconds) and sizes (pixels) are
+        drawn uniformly from the given ranges and colours from ``colors``.
+        Particles fly out in every direction, or within ``spread`` radians of
+        ``direction`` if it is given. Returns how many were added; the rest
+        are dropped once the pool is at its limit.
+        """
+        if not 1 <= size[0] <= size[1] <= MAX_SIZE:
+            raise ValueError(f"particle sizes must be between 1 and {MAX_SIZE}")
+        origins = np.asarray(origins, dtype=np.float32).reshape(-1, 2)
+        wanted = len(origins) * count
+        added = max(0, min(wanted, self.limit - self.count))
+        self.dropped += wanted - added
+        if not added:
+            return 0
+        rng = self.rng
+        start, end = self.count, self.count + added
+        self.position[start:end] = np.repeat(origins, count, axis=0)[:added]
+        if direction is None:
+            angles = rng.uniform(0, 2 * math.pi, added)
+        else:
+            angles = math.atan2(direction[1], direction[0]) + rng.uniform(-spread, spread, added)
+        speeds = rng.uniform(speed[0], speed[1], added)
+        self.velocity[start:end, 0] = np.cos(angles) * speeds
+        self.velocity[start:end, 1] = np.sin(angles) * speeds
+        self.age[start:end] = 0
+        self.life[start:end] = rng.uniform(life[0], life[1], added)
+        self.color[start:end] = np.asarray(colors, dtype=np.float32)[rng.integers(0, len(colors), added)]
+        self.size[start:end] = rng.integers(size[0], size[1] + 1, added)
+        self.gravity[start:end] = gravity
+        self.count = end
+        return added
+
+    def update(self, dt: float):
+        """Advance every particle by ``dt`` seconds and drop the ones that expired."""
+        n = self.count
+        if not n:
+            return
+        dt = min(dt, MAX_STEP)
+        self.age[:n] += dt
+        self.velocity[:n, 1] += self.gravity[:n] * dt
+        self.velocity[:n] *= 1 - min(1.0, 1.5 * dt)  # Air drag
+        self.position[:n] += self.velocity[:n] * dt
+        alive = self.age[:n] < self.life[:n]
+        kept = int(np.count_nonzero(alive))
+        if kept < n:
+            self._keep(alive, kept)
+
+    def _keep(self, alive: np.ndarray, kept: int):
+        """Pack the particles selected by the mask ``alive`` at the front of the pool."""
+        n = self.count
+        for array in (self.position, self.velocity, self.age, self.life, self.color, self.size, self.gravity):
+            array[:kept] = array[:n][alive]
+        self.count = kept
+
+    def draw(self, surface: pygame.Surface):
+        """Blend every particle into ``surface``, fading it out over its life."""
+        n = self.count
+        if not n:
+            return
+        width, height = surface.get_size()
+        # Expand each particle into the pixels of its square, all particles at once
+        size = self.size[:n]
+        areas = SQUARE_AREAS[size]
+        owner = np.repeat(np.arange(n), areas)
+        within = np.arange(len(owner)) - np.repeat(np.cumsum(areas) - areas, areas)
+        side = size[owner]
+        px = self.position[:n, 0].astype(np.intp)[owner] + SQUARE_DX[side, within]
+        py = self.position[:n, 1].astype(np.intp)[owner] + SQUARE_DY[side, within]
+        visible = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+        owner = owner[visible]
+        cells = py[visible] * width + px[visible]
+        alpha = (1 - self.age[:n] / self.life[:n])[owner]
+        color = self.color[:n][owner]
+
+        pixels = pygame.surfarray.pixels2d(surface)
+        try:
+            # Rows of the transposed view are rows of the surface; a flat index needs no padding between them
+            flat = pixels.T.reshape(-1) if surface.get_pitch() == width * 4 else None
+            current = flat[cells] if flat is not None else pixels[px[visible], py[visible]]
+            mixed = np.zeros(len(cells), dtype=np.uint32)
+            for channel, shift in enumerate(surface.get_shifts()[:3]):
+                background = ((current >> shift) & 0xFF).astype(np.float32)
+                background += (color[:, channel] - background) * alpha
+                mixed |= background.astype(np.uint32) << shift
+            mixed |= current & ~np.uint32(sum(surface.get_masks()[:3]))
+            if flat is not None:
+                flat[cells] = mixed
+            else:
+                pixels[px[visible], py[visible]] = mixed
+        finally:
+            del pixels  # Unlock the surface
+
+    def step(self, dt: float, surface: Optional[pygame.Surface]):
+        """Update and draw once, then adjust the particle limit to the frame budget."""
+        start = time.perf_counter()
+        self.update(dt)
+        if surface is not None:
+            self.draw(surface)
+        self.last_cost = time.perf_counter() - start
+        if self.last_cost > self.budget:
+            self.limit = max(MIN_LIMIT, int(self.limit * 0.7))
+            if self.count > self.limit:
+                # The oldest particles go first
+                keep = np.zeros(self.count, dtype=bool)
+                keep[np.argsort(self.age[:self.count] / self.life[:self.count])[:self.limit]] = True
+                self._keep(keep, self.limit)
+        elif self.last_cost < self.budget / 2 and self.limit < self.capacity:
+            self.limit = min(self.capacity, self.limit + max(MIN_LIMIT, self.limit // 8))
+
+
+class GameEffects:
+    """Particle effects driven by a Game's events."""
+
+    def __init__(self, pool: Optional[ParticlePool] = None):
+        """Create the effects, drawing particles from ``pool``."""
+        self.pool = pool if pool is not None else ParticlePool()
+        self._last_step = None
+        self._portal_carry = 0.0
+
+    @property
+    def active(self) -> bool:
+        """True while an effect is still playing out and the screen must keep being redrawn."""
+        return self.pool.active
+
+    def on_game_event(self, event: GameEvent, game):
+        """Game listener: start the effect for ``event``."""
+        pool = self.pool
+        if event == GameEvent.APPLE_EATEN:
+            # The food has not moved yet; the head is on it
+            pool.emit([CELL_CENTERS[game.snake.body[0]]], 24, (60, 220), (0.3, 0.7), APPLE_SPARKS, gravity=150)
+        elif event == GameEvent.DEATH:
+            segments = [CELL_CENTERS[cell] for cell in game.snake.body if cell in CELL_CENTERS]
+            per_segment = max(2, min(12, 1200 // max(1, len(segments))))
+            pool.emit(segments, per_segment, (40, 260), (0.6, 1.4), DEATH_SPARKS, (2, 4), gravity=250)
+        elif event in (GameEvent.GAME_START, GameEvent.LEVEL_START):
+            pool.clear()
+
+    def draw(self, screen: pygame.Surface, game):
+        """Advance the effects to now and draw them on ``screen``."""
+        now = time.perf_counter()
+        dt = 0.0 if self._last_step is None else now - self._last_step
+        self._last_step = now
+        if game.portal_open and game.state == GameState.PLAYING:
+            self._draw_portal(screen, now, dt)
+        self.pool.step(dt, screen)
+
+    def _draw_portal(self, screen: pygame.Surface, now: float, dt: float):
+        """Pulse the portal glow and send particles up into it."""
+        pulse = 0.5 + 0.5 * math.sin(now * 6)
+        left = WINDOW_WIDTH // 2 - PORTAL_WIDTH // 2
+        for grow in range(3):
+            glow = tuple(int(c * (0.3 + 0.7 * pulse) / (grow + 1)) for c in PORTAL_GLOW)
+            pygame.draw.rect(screen, glow, pygame.Rect(left - 5 - 3 * grow, 0, PORTAL_WIDTH + 10 + 6 * grow,
+                                                       8 + 3 * grow), 2)
+        # About 60 particles a second, whatever the frame rate
+        self._portal_carry += 60 * min(dt, MAX_STEP)
+        count = int(self._portal_carry)
+        self._portal_carry -= count
+        if count:
+            xs = self.pool.rng.uniform(PORTAL_LEFT * GRID_SIZE, (PORTAL_RIGHT + 1) * GRID_SIZE, count)
+            origins = np.stack([xs, np.full(count, 3.0 * GRID_SIZE)], axis=1)
+            self.pool.emit(origins, 1, (40, 90), (0.5, 0.9), (PORTAL_GLOW, (220, 240, 255)), (1, 2),
+                           direction=(0, -1), spread=0.3)
+
+
+def benchmark(particles: int, frames: int):
+    """Print the cost per frame of keeping ``particles`` particles alive on a window-sized surface."""
+    from snake_game import WINDOW_HEIGHT
+
+    surface = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+    for budget in (1.0, FRAME_BUDGET):
+        pool = ParticlePool(max(particles, DEFAULT_CAPACITY), budget=budget, seed=0)
+        rng = np.random.default_rng(1)
+        costs = []
+        for _ in range(frames):
+            missing = particles - pool.count
+            if missing > 0:
+                origins = rng.uniform((0, 0), (WINDOW_WIDTH, WINDOW_HEIGHT), (missing, 2))
+                pool.emit(origins, 1, (20, 200), (0.5, 2.0), APPLE_SPARKS)
+            surface.fill((0, 0, 0))
+            pool.step(1 / 60, surface)
+            costs.append(pool.last_cost)
+        label = "no budget" if budget == 1.0 else f"{budget * 1000:.0f} ms budget"
+        print(f"{label:>12s}: {np.mean(costs) * 1000:6.3f} ms/frame (max {max(costs) * 1000:6.3f}), "
+              f"{pool.count} particles at the end, limit {pool.limit}")
+
+
+def main(argv=None):
+    """Command line entry point for the particle benchmark."""
+    parser = argparse.ArgumentParser(description="Particle system cost per frame")
+    parser.add_argument("--particles", type=int, default=4000, help="Particles kept alive")
+    parser.add_argument("--frames", type=int, default=600)
+    args = parser.parse_args(argv)
+    benchmark(args.particles, args.frames)
+
+
+if __name__ == "__main__":
+    main()
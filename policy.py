@@ -0,0 +1,344 @@
+"""
+Batched neural-network autopilot for many Snake games at once.
+
+A small multilayer perceptron picks each move from a window of cells around
+the head plus the direction of the food (or of the open portal). Running
+the network once per game per tick spends nearly all its time in Python and
+NumPy call overhead, so ``BatchedAutopilot`` steps many games together:
+
+- Every game keeps a ``snake_env.BoardEncoder``, updated incrementally, whose
+  label grid is one slice of a single (games, height, width) array.
+- The windows of all games are cut out of that array with one fancy-indexing
+  gather, and turned into feature planes with one table lookup.
+- One forward pass (a matrix product per layer) scores the four directions
+  for every game; reversing is masked out and the chosen directions are
+  handed back through ``Snake.change_direction``.
+
+Weights are stored in a plain ``.npz`` file: ``radius`` (the window is
+``2 * radius + 1`` cells wide) and ``w0``, ``b0``, ``w1``, ``b1``, ... for the
+layers, with ReLU between them. ``--clone`` trains a network by imitating
+``bots.GreedyBot``, which is a quick way to get weights that play.
+
+Usage:
+    python policy.py --clone policy.npz [--samples 50000]   # train by imitation
+    python policy.py --weights policy.npz [--games 256]     # play headless games
+    python policy.py --benchmark [--weights policy.npz]     # batched vs per-game
+"""
+
+import argparse
+import random
+import sys
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bots import GreedyBot
+from snake_env import (ACTIONS, BODY, EMPTY, FOOD, HEAD, LABELS_SHAPE, OBSTACLE, PAD, PORTAL, WALL,
+                       BoardEncoder)
+from snake_game import GRID_HEIGHT, GRID_WIDTH, PORTAL_LEFT, PORTAL_RIGHT, Direction, GameLogic, GameState
+
+DEFAULT_RADIUS = 4
+DEFAULT_HIDDEN = (64,)
+
+# Feature planes of the window, indexed by label code: blocked, food, portal
+CODE_PLANES = np.zeros((7, 3), dtype=np.float32)
+CODE_PLANES[[BODY, HEAD, OBSTACLE, WALL], 0] = 1
+CODE_PLANES[FOOD, 1] = 1
+CODE_PLANES[PORTAL, 2] = 1
+assert CODE_PLANES[EMPTY].sum() == 0
+
+# Direction one-hot (4), offset to the target (2) and whether the portal is open (1)
+EXTRA_FEATURES = 7
+ACTION_INDEX = {direction: i for i, direction in enumerate(ACTIONS)}
+OPPOSITE = np.array([ACTIONS.index(Direction((-direction.value[0], -direction.value[1])))
+                     for direction in ACTIONS])
+PORTAL_TARGET = ((PORTAL_LEFT + PORTAL_RIGHT) / 2, -1)
+
+
+def observation_size(radius: int) -> int:
+    """Return the length of an observation for a window of ``radius``."""
+    side = 2 * radius + 1
+    return side * side * CODE_PLANES.shape[1] + EXTRA_FEATURES
+
+
+class MLPPolicy:
+    """A multilayer perceptron from observations to scores for ``ACTIONS``."""
+
+    def __init__(self, layers: Sequence[Tuple[np.ndarray, np.ndarray]], radius: int = DEFAULT_RADIUS):
+        """Create the policy from ``(weights, bias)`` pairs, first layer first."""
+        if not 0 < radius <= PAD:
+            raise ValueError(f"radius must be between 1 and {PAD}")
+        size = observation_size(radius)
+        self.layers = []
+        for weights, bias in layers:
+            weights = np.asarray(weights, dtype=np.float32)
+            bias = np.asarray(bias, dtype=np.float32)
+            if weights.ndim != 2 or weights.shape[0] != size or bias.shape != (weights.shape[1],):
+                raise ValueError(f"layer {len(self.layers)} does not take {size} inputs")
+            self.layers.append((weights, bias))
+            size = weights.shape[1]
+        if size != len(ACTIONS):
+            raise ValueError(f"the last layer must have {len(ACTIONS)} outputs, not {size}")
+        self.radius = radius
+
+    @classmethod
+    def random(cls, hidden: Sequence[int] = DEFAULT_HIDDEN, radius: int = DEFAULT_RADIUS,
+               seed: Optional[int] = None) -> "MLPPolicy":
+        """Return an untrained policy with He-initialised weights."""
+        rng = np.random.default_rng(seed)
+        sizes = [observation_size(radius)] + list(hidden) + [len(ACTIONS)]
+        layers = [(rng.normal(0, np.sqrt(2 / n_in), (n_in, n_out)), np.zeros(n_out))
+                  for n_in, n_out in zip(sizes, sizes[1:])]
+        return cls(layers, radius)
+
+    @classmethod
+    def load(cls, path: str) -> "MLPPolicy":
+        """Load a policy saved by ``save``; raises ValueError if the file does not hold one."""
+        with np.load(path) as data:
+            if "radius" not in data or "w0" not in data:
+                raise ValueError(f"{path} does not hold policy weights")
+            layers = []
+            while f"w{len(layers)}" in data:
+                layers.append((data[f"w{len(layers)}"], data[f"b{len(layers)}"]))
+            return cls(layers, int(data["radius"]))
+
+    def save(self, path: str):
+        """Write the weights to a ``.npz`` file."""
+        arrays = {"radius": np.array(self.radius)}
+        for i, (weights, bias) in enumerate(self.layers):
+            arrays[f"w{i}"] = weights
+            arrays[f"b{i}"] = bias
+        np.savez(path, **arrays)
+
+    def forward(self, observations: np.ndarray) -> np.ndarray:
+        """Return the score of each action for each row of ``observations``."""
+        x = observations
+        for weights, bias in self.layers[:-1]:
+            x = x @ weights
+            x += bias
+            np.maximum(x, 0, out=x)
+        weights, bias = self.layers[-1]
+        x = x @ weights
+        x += bias
+        return x
+
+
+class BatchedAutopilot:
+    """Steers many games with one forward pass of a policy per tick."""
+
+    def __init__(self, policy: MLPPolicy, games: Sequence[GameLogic]):
+        """Attach to ``games``; they may be reset or change level freely afterwards."""
+        self.policy = policy
+        self.games = list(games)
+        self.boards = np.empty((len(self.games),) + LABELS_SHAPE, dtype=np.uint8)
+        self.encoders = [BoardEncoder(game, channels=False, labels=self.boards[i])
+                         for i, game in enumerate(self.games)]
+        radius = policy.radius
+        self._offsets = np.arange(-radius, radius + 1)
+        self._planes = (2 * radius + 1) ** 2 * CODE_PLANES.shape[1]
+        self._directions = None  # Direction index of each game in the last observation
+
+    def observe(self, indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return the observations of the games at ``indices`` (all by default), one per row."""
+        if indices is None:
+            indices = np.arange(len(self.games))
+        indices = np.asarray(indices, dtype=np.intp)
+        heads = []
+        targets = []
+        directions = []
+        portals = []
+        for i in indices:
+            encoder = self.encoders[i]
+            encoder.sync()
+            game = encoder.game
+            heads.append(game.snake.body[0])
+            targets.append(PORTAL_TARGET if game.portal_open else game.food.position)
+            directions.append(ACTION_INDEX[game.snake.direction])
+            portals.append(game.portal_open)
+        # Shaped explicitly so that an empty batch gives empty results
+        heads = np.array(heads, dtype=np.intp).reshape(len(indices), 2)
+        self._directions = directions = np.array(directions, dtype=np.intp)
+
+        # Far up the portal shaft the window stops at the top of the padding
+        radius = self.policy.radius
+        rows = np.clip(heads[:, 1] + PAD, radius, LABELS_SHAPE[0] - 1 - radius)[:, None] + self._offsets
+        cols = np.clip(heads[:, 0] + PAD, radius, LABELS_SHAPE[1] - 1 - radius)[:, None] + self._offsets
+        windows = self.boards[indices[:, None, None], rows[:, :, None], cols[:, None, :]]
+
+        observations = np.zeros((len(indices), self._planes + EXTRA_FEATURES), dtype=np.float32)
+        observations[:, :self._planes] = CODE_PLANES[windows].reshape(len(indices), self._planes)
+        extra = observations[:, self._planes:]
+        extra[np.arange(len(indices)), directions] = 1
+        offsets = np.array(targets, dtype=np.intp).reshape(len(indices), 2) - heads
+        extra[:, 4] = offsets[:, 0] / GRID_WIDTH
+        extra[:, 5] = offsets[:, 1] / GRID_HEIGHT
+        extra[:, 6] = portals
+        return observations
+
+    def choose(self, indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return the index into ``ACTIONS`` chosen for each game at ``indices``."""
+        if indices is None:
+            indices = np.arange(len(self.games))
+        scores = self.policy.forward(self.observe(indices))
+        scores[np.arange(len(indices)), OPPOSITE[self._directions]] = -np.inf
+        return scores.argmax(axis=1)
+
+    def act(self, indices: Optional[np.ndarray] = None):
+        """Choose and apply a move for each playing game at ``indices`` (all by default)."""
+        if indices is None:
+            indices = np.arange(len(self.games))
+        for i, action in zip(indices, self.choose(indices)):
+            game = self.games[i]
+            if game.state == GameState.PLAYING:
+                game.snake.change_direction(ACTIONS[action])
+
+
+def new_games(count: int, seed: int = 0) -> List[GameLogic]:
+    """Return ``count`` seeded games, already playing."""
+    games = [GameLogic(random.Random(seed + i)) for i in range(count)]
+    for game in games:
+        game.start_playing()
+    return games
+
+
+def advance(games: Sequence[GameLogic]) -> List[int]:
+    """Update every game once, restarting finished ones; return the scores of those."""
+    scores = []
+    for game in games:
+        game.update()
+        if game.state == GameState.GAME_OVER:
+            scores.append(game.score)
+            game.reset_game()
+            game.start_playing()
+    return scores
+
+
+def clone(samples: int, hidden: Sequence[int] = DEFAULT_HIDDEN, radius: int = DEFAULT_RADIUS,
+          epochs: int = 20, games: int = 64, seed: int = 0) -> MLPPolicy:
+    """Train a policy to copy ``GreedyBot`` from ``samples`` of its moves."""
+    policy = MLPPolicy.random(hidden, radius, seed)
+    playing = new_games(games, seed)
+    autopilot = BatchedAutopilot(policy, playing)
+    bot = GreedyBot(random.Random(seed), noise=0.05)
+    observations = []
+    actions = []
+    while len(actions) < samples:
+        indices = np.array([i for i, game in enumerate(playing) if game.state == GameState.PLAYING], dtype=np.intp)
+        observations.append(autopilot.observe(indices))
+        for i in indices:
+            direction = bot.choose_direction(playing[i])
+            actions.append(ACTION_INDEX[direction])
+            playing[i].snake.change_direction(direction)
+        advance(playing)
+    x = np.concatenate(observations)[:samples]
+    y = np.array(actions[:samples])
+
+    # Minibatch gradient descent with momentum on the softmax cross-entropy
+    rng = np.random.default_rng(seed)
+    velocity = [(np.zeros_like(w), np.zeros_like(b)) for w, b in policy.layers]
+    rate = 0.05
+    for epoch in range(epochs):
+        order = rng.permutation(len(y))
+        for start in range(0, len(y), 256):
+            batch = order[start:start + 256]
+            activations = [x[batch]]
+            for weights, bias in policy.layers[:-1]:
+                activations.append(np.maximum(activations[-1] @ weights + bias, 0))
+            scores = activations[-1] @ policy.layers[-1][0] + policy.layers[-1][1]
+            scores -= scores.max(axis=1, keepdims=True)
+            grad = np.exp(scores)
+            grad /= grad.sum(axis=1, keepdims=True)
+            grad[np.arange(len(batch)), y[batch]] -= 1
+            grad /= len(batch)
+            for layer in reversed(range(len(policy.layers))):
+                weights, bias = policy.layers[layer]
+                grad_w = activations[layer].T @ grad
+                grad_b = grad.sum(axis=0)
+                if layer:
+                    grad = (grad @ weights.T) * (activations[layer] > 0)
+                v_w, v_b = velocity[layer]
+                v_w *= 0.9
+                v_w -= rate * grad_w
+                v_b *= 0.9
+                v_b -= rate * grad_b
+                weights += v_w
+                bias += v_b
+        if sys.stdout.isatty():
+            accuracy = (policy.forward(x).argmax(axis=1) == y).mean()
+            print(f"\repoch {epoch + 1}/{epochs}: {accuracy:.1%} of moves match", end="", flush=True)
+    if sys.stdout.isatty():
+        print()
+    return policy
+
+
+def evaluate(policy: MLPPolicy, games: int, ticks: int, seed: int = 0) -> List[int]:
+    """Play ``games`` games side by side for ``ticks`` ticks and return the final scores."""
+    playing = new_games(games, seed)
+    autopilot = BatchedAutopilot(policy, playing)
+    scores = []
+    for _ in range(ticks):
+        autopilot.act()
+        scores += advance(playing)
+    return scores
+
+
+def benchmark(policy: MLPPolicy, ticks: int = 200):
+    """Print decisions per second for batched and per-game inference."""
+    print(f"{'games':>6s} {'per game/s':>11s} {'batched/s':>11s} {'speedup':>8s}")
+    for count in (16, 64, 256, 1024):
+        rates = []
+        for batched in (False, True):
+            playing = new_games(count)
+            autopilot = BatchedAutopilot(policy, playing)
+            singles = [np.array([i]) for i in range(count)]
+            elapsed = 0.0
+            for _ in range(ticks):
+                start = time.perf_counter()
+                if batched:
+                    autopilot.act()
+                else:
+                    for indices in singles:
+                        autopilot.act(indices)
+                elapsed += time.perf_counter() - start
+                advance(playing)
+            rates.append(count * ticks / elapsed)
+        print(f"{count:6d} {rates[0]:11.0f} {rates[1]:11.0f} {rates[1] / rates[0]:7.1f}x")
+
+
+def main(argv=None):
+    """Command line entry point for the batched autopilot."""
+    parser = argparse.ArgumentParser(description="Batched neural-network autopilot")
+    parser.add_argument("--weights", help="Policy weights (.npz)")
+    parser.add_argument("--clone", metavar="OUT", help="Train weights by imitating GreedyBot and save them")
+    parser.add_argument("--samples", type=int, default=50000, help="Moves to imitate with --clone")
+    parser.add_argument("--hidden", type=int, nargs="*", default=list(DEFAULT_HIDDEN), help="Hidden layer sizes")
+    parser.add_argument("--radius", type=int, default=DEFAULT_RADIUS, help="Cells seen on each side of the head")
+    parser.add_argument("--games", type=int, default=256, help="Games played side by side")
+    parser.add_argument("--ticks", type=int, default=2000)
+    parser.add_argument("--benchmark", action="store_true", help="Compare batched and per-game inference")
+    args = parser.parse_args(argv)
+
+    if args.clone:
+        policy = clone(args.samples, args.hidden, args.radius)
+        policy.save(args.clone)
+        print(f"Saved {args.clone}")
+        return
+    try:
+        policy = MLPPolicy.load(args.weights) if args.weights else MLPPolicy.random(args.hidden, args.radius, 0)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if args.benchmark:
+        benchmark(policy)
+        return
+    if not args.weights:
+        parser.error("--weights is required to play (create them with --clone)")
+    scores = evaluate(policy, args.games, args.ticks)
+    if scores:
+        print(f"{len(scores)} games finished: mean score {np.mean(scores):.1f}, best {max(scores)}")
+    else:
+        print("No game finished")
+
+
+if __name__ == "__main__":
+    main()
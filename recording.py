@@ -0,0 +1,148 @@
+"""
+Gameplay recording for the Snake Game.
+
+After each displayed frame the game thread copies the screen into one of a
+fixed pool of preallocated buffers (a plain memory copy of the 32-bit
+pixels) and hands it to a background encoder thread. Capture never waits:
+if every buffer is still queued for encoding the frame is dropped and
+counted, so a slow encoder costs frames rather than memory or frame time.
+If encoding fails, capture stops and ``close()`` reports the error.
+
+The game draws frames at its current speed, which rises as the snake
+eats. Each frame is therefore captured with a timestamp. Videos are
+written at a fixed ``fps`` (the game's top speed), and each frame is
+repeated until the next one is due, so the video plays back in real time
+and dropped frames become pauses instead of skips.
+
+Output formats:
+    directory (no extension)  numbered PNG images, using pygame only
+    .gif / .mp4 / ...         video via ``imageio`` (optional dependency)
+"""
+
+import os
+import queue
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+import pygame
+
+try:
+    import imageio
+except ImportError:  # imageio is optional
+    imageio = None
+
+
+class FrameRecorder:
+    """Captures frames into pooled buffers and encodes them on a background thread."""
+
+    def __init__(self, path: str, size, masks, pool_size: int = 8, fps: int = 20):
+        """Prepare the output and start the encoder thread.
+
+        ``size`` is the (width, height) of captured Surfaces and ``masks``
+        their colour masks (``Surface.get_masks()``). ``fps`` is the frame
+        rate of videos; it should be at least the rate frames are captured at.
+        """
+        self.path = path
+        self.size = size
+        self.fps = fps
+        self.captured = 0
+        self.dropped = 0
+        self.error: Optional[Exception] = None  # Set by the encoder thread if it fails
+
+        extension = os.path.splitext(path)[1].lower()
+        self._video = bool(extension)
+        if self._video:
+            if imageio is None:
+                raise RuntimeError(f"Recording to {extension} files requires the imageio package")
+        else:
+            os.makedirs(path, exist_ok=True)
+
+        # Byte offsets of R, G and B within a little-endian 32-bit pixel
+        self._rgb_bytes = [(mask & -mask).bit_length() // 8 for mask in masks[:3]]
+        width, height = size
+        self._buffers = [np.empty((height, width), dtype=np.uint32) for _ in range(pool_size)]
+        self._times = [0.0] * pool_size
+        self._free: "queue.Queue[int]" = queue.Queue()
+        for index in range(pool_size):
+            self._free.put(index)
+        self._ready: "queue.Queue[Optional[int]]" = queue.Queue()
+
+        self._encoder = threading.Thread(target=self._encode_loop, name="frame-encoder", daemon=True)
+        self._encoder.start()
+
+    def capture(self, surface: pygame.Surface):
+        """Copy ``surface`` into a free buffer with the time, or drop the frame if none is free."""
+        if self.error is not None:
+            return
+        try:
+            index = self._free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return
+        pixels = pygame.surfarray.pixels2d(surface)
+        self._buffers[index][:] = pixels.T
+        del pixels  # Unlock the surface before it is drawn on again
+        self._times[index] = time.monotonic()
+        self.captured += 1
+        self._ready.put(index)
+
+    def close(self) -> str:
+        """Encode the remaining frames, close the output and return a summary."""
+        self._ready.put(None)
+        self._encoder.join()
+        if self.error is not None:
+            return f"Recording to {self.path} failed after {self.captured} frames: {self.error}"
+        return f"Recorded {self.captured} frames to {self.path} ({self.dropped} dropped)"
+
+    def _rgb(self, buffer: np.ndarray) -> np.ndarray:
+        """Return an RGB view of a captured buffer."""
+        pixels = buffer.view(np.uint8).reshape(buffer.shape + (4,))
+        r, g, b = self._rgb_bytes
+        if (r, g, b) == (2, 1, 0):
+            return pixels[..., 2::-1]
+        return pixels[..., [r, g, b]]
+
+    def _encode_loop(self):
+        """Encoder thread: write frames in capture order and recycle their buffers.
+
+        Any error is kept in ``error`` and ends the thread.
+        """
+        writer = None
+        frame_number = 0
+        start = None
+        previous = None  # Last frame written to the video
+        try:
+            writer = imageio.get_writer(self.path, fps=self.fps) if self._video else None
+            surface = None if self._video else pygame.Surface(self.size, 0, 32)
+            while True:
+                index = self._ready.get()
+                if index is None:
+                    break
+                buffer = self._buffers[index]
+                if writer is not None:
+                    if start is None:
+                        start = self._times[index]
+                    # Hold the previous frame until this one is due
+                    due = round((self._times[index] - start) * self.fps)
+                    while previous is not None and frame_number < due:
+                        writer.append_data(previous)
+                        frame_number += 1
+                    previous = np.ascontiguousarray(self._rgb(buffer))
+                    writer.append_data(previous)
+                else:
+                    pixels = pygame.surfarray.pixels2d(surface)
+                    pixels[:] = buffer.T
+                    del pixels
+                    pygame.image.save(surface, os.path.join(self.path, f"frame{frame_number:06d}.png"))
+                frame_number += 1
+                self._free.put(index)
+        except Exception as error:
+            self.error = error
+        finally:
+            if writer is not None:
+                try:
+                    writer.close()
+                except Exception as error:
+                    self.error = self.error or error
@@ -0,0 +1,250 @@
+"""
+Save and resume games in progress.
+
+A save file holds the complete state of a game: the snake's body,
+direction and pending growth, the food, the level with its exact obstacle
+layout, score, apples, speed, portal state and the random generator. It is
+a versioned little-endian binary format:
+
+    header    magic b"SNKS", format version
+    state     fixed-size struct of the scalar fields and the array lengths
+    body      int16 x, y pairs, head first
+    obstacles uint32 cell count per obstacle, then int16 x, y pairs
+    rng       optional Mersenne Twister state (625 uint32 words)
+    crc32     of everything before it
+
+The variable-length parts are stored as raw arrays, so loading reads each
+one with a single ``array.frombytes`` call instead of parsing segments one
+by one. Files are written on a background thread to a temporary file that
+then atomically replaces the old save, so a crash never leaves a partial
+file behind.
+"""
+
+import os
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from collections import deque
+from typing import Optional
+
+from snake_game import Direction, GameEvent, GameState, Obstacle
+
+MAGIC = b"SNKS"
+VERSION = 1
+HEADER = struct.Struct("<4sH")  # magic, version
+# state, direction, portal open, has rng, level, apples, transition timer, food x, food y,
+# grow pending, score, moves, speed, body length, obstacle count, obstacle cells
+STATE = struct.Struct("<BBBBHHHhhIIIdIII")
+RNG = struct.Struct("<Bd")  # has gauss_next, gauss_next
+RNG_WORDS = 625
+CRC = struct.Struct("<I")
+
+DIRECTIONS = (Direction.UP, Direction.DOWN, Direction.LEFT, Direction.RIGHT)
+DIRECTION_INDEX = {direction: index for index, direction in enumerate(DIRECTIONS)}
+
+# States worth saving; a finished game has nothing to resume
+IN_PROGRESS = (GameState.PLAYING, GameState.PAUSED, GameState.LEVEL_TRANSITION)
+
+
+def _little_endian(values: array) -> bytes:
+    """Return the bytes of ``values`` in little-endian order."""
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _read_array(typecode: str, data: memoryview, offset: int, count: int):
+    """Read ``count`` little-endian items at ``offset``; returns (array, next offset)."""
+    values = array(typecode)
+    end = offset + count * values.itemsize
+    if end > len(data):
+        raise ValueError("save file is truncated")
+    values.frombytes(data[offset:end])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values, end
+
+
+def dumps(game, include_rng: bool = True) -> bytes:
+    """Serialize the state of a GameLogic (or Game).
+
+    Without ``include_rng`` the random generator is left out, so whoever
+    reads the state cannot predict where food will appear.
+    """
+    snake = game.snake
+    body = array("h", [coordinate for cell in snake.body for coordinate in cell])
+    sizes = array("I", [len(obstacle.positions) for obstacle in game.level_manager.obstacles])
+    cells = array("h", [coordinate for obstacle in game.level_manager.obstacles
+                        for cell in obstacle.positions for coordinate in cell])
+    rng_state = game.rng.getstate() if include_rng and hasattr(game.rng, "getstate") else None
+    food_x, food_y = game.food.position
+
+    parts = [
+        HEADER.pack(MAGIC, VERSION),
+        STATE.pack(game.state.value, DIRECTION_INDEX[snake.direction], game.portal_open, rng_state is not None,
+                   game.level_manager.current_level, game.apples_eaten, game.transition_timer, food_x, food_y,
+                   snake.grow_pending, game.score, game.moves, game.speed, len(body) // 2, len(sizes),
+                   len(cells) // 2),
+        _little_endian(body),
+        _little_endian(sizes),
+        _little_endian(cells),
+    ]
+    if rng_state is not None:
+        _, words, gauss_next = rng_state
+        parts.append(RNG.pack(gauss_next is not None, gauss_next or 0.0))
+        parts.append(_little_endian(array("I", words)))
+    data = b"".join(parts)
+    return data + CRC.pack(zlib.crc32(data))
+
+
+def loads(data: bytes, game):
+    """Restore a game serialized by ``dumps`` into ``game``.
+
+    Raises ValueError if ``data`` is not an intact save of a known version.
+    A game that was playing comes back paused.
+    """
+    if len(data) < HEADER.size + STATE.size + CRC.size:
+        raise ValueError("save file is truncated")
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a version {VERSION} save file")
+    (expected_crc,) = CRC.unpack_from(data, len(data) - CRC.size)
+    if zlib.crc32(memoryview(data)[:-CRC.size]) != expected_crc:
+        raise ValueError("save file is corrupt")
+
+    (state, direction, portal_open, has_rng, level, apples_eaten, transition_timer, food_x, food_y,
+     grow_pending, score, moves, speed, body_length, obstacle_count,
+     obstacle_cells) = STATE.unpack_from(data, HEADER.size)
+    view = memoryview(data)[:-CRC.size]
+    offset = HEADER.size + STATE.size
+    body, offset = _read_array("h", view, offset, 2 * body_length)
+    sizes, offset = _read_array("I", view, offset, obstacle_count)
+    cells, offset = _read_array("h", view, offset, 2 * obstacle_cells)
+    rng_state = None
+    if has_rng:
+        if offset + RNG.size > len(view):
+            raise ValueError("save file is truncated")
+        has_gauss, gauss_next = RNG.unpack_from(view, offset)
+        words, offset = _read_array("I", view, offset + RNG.size, RNG_WORDS)
+        rng_state = (3, tuple(words), gauss_next if has_gauss else None)
+    if body_length == 0 or sum(sizes) != obstacle_cells or direction >= len(DIRECTIONS):
+        raise ValueError("save file is inconsistent")
+    state = GameState(state)
+
+    positions = list(zip(cells[0::2], cells[1::2]))
+    obstacles = []
+    start = 0
+    for size in sizes:
+        obstacles.append(Obstacle(positions[start:start + size]))
+        start += size
+
+    snake = game.snake
+    snake.body = deque(zip(body[0::2], body[1::2]))
+    snake.direction = DIRECTIONS[direction]
+    snake.grow_pending = grow_pending
+    game.food.position = (food_x, food_y)
+    game.level_manager.current_level = level
+    game.level_manager.obstacles = obstacles
+    game.score = score
+    game.apples_eaten = apples_eaten
+    game.speed = speed
+    game.portal_open = bool(portal_open)
+    game.transition_timer = transition_timer
+    game.moves = moves
+    game.death_cause = None
+    game.state = GameState.PAUSED if state == GameState.PLAYING else state
+    if rng_state is not None and hasattr(game.rng, "setstate"):
+        game.rng.setstate(rng_state)
+
+
+def load(path: str, game) -> bool:
+    """Restore ``game`` from the save file at ``path``; returns False if there is none.
+
+    Listeners of ``game`` are sent ``GameEvent.GAME_RESUMED`` once it is restored.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return False
+    loads(data, game)
+    game.notify(GameEvent.GAME_RESUMED)
+    return True
+
+
+class SaveWriter:
+    """Saves games to one file atomically on a background thread.
+
+    Serialization happens on the calling thread, so the saved state is
+    consistent; only disk I/O is deferred. If saves arrive faster than
+    they can be written, only the latest one is kept.
+    """
+
+    def __init__(self, path: str):
+        """Start the writer thread for save file ``path``."""
+        self.path = path
+        self.error: Optional[OSError] = None
+        self._request = None
+        self._closing = False
+        self._condition = threading.Condition()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._writer = threading.Thread(target=self._write_loop, name="save-writer", daemon=True)
+        self._writer.start()
+
+    def save(self, game):
+        """Save ``game`` if it is in progress (non-blocking)."""
+        if game.state in IN_PROGRESS:
+            self._submit(dumps(game))
+
+    def discard(self):
+        """Delete the save file (non-blocking)."""
+        self._submit(b"")
+
+    def on_game_event(self, event: GameEvent, game):
+        """Game listener: a finished game can no longer be resumed."""
+        if event == GameEvent.DEATH:
+            self.discard()
+
+    def close(self):
+        """Finish any pending write and stop the writer thread."""
+        with self._condition:
+            self._closing = True
+            self._condition.notify()
+        self._writer.join()
+
+    def _submit(self, data: bytes):
+        """Replace any unwritten request with ``data`` (empty to delete)."""
+        with self._condition:
+            self._request = data
+            self._condition.notify()
+
+    def _write_loop(self):
+        """Writer thread: perform the latest request until closed."""
+        while True:
+            with self._condition:
+                while self._request is None and not self._closing:
+                    self._condition.wait()
+                data, self._request = self._request, None
+            if data is None:
+                return
+            try:
+                if data:
+                    self._write(data)
+                elif os.path.exists(self.path):
+                    os.remove(self.path)
+            except OSError as e:
+                self.error = e
+
+    def _write(self, data: bytes):
+        """Write ``data`` to a temporary file and atomically move it into place."""
+        temporary = self.path + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
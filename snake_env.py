@@ -0,0 +1,376 @@
+"""
+Gymnasium-style environment for the Snake Game.
+
+Observations are built straight from the game state without rendering and
+are kept up to date incrementally: after each move only the cells that
+changed (new head, old head, vacated tail, food) are rewritten.
+
+Observation types:
+    grid      uint8 array (5, GRID_HEIGHT, GRID_WIDTH): body, head, food,
+              obstacles and open portal cells
+    features  uint8 vector: danger ahead/left/right, current direction and
+              food direction
+    pixels    uint8 RGB image with one pixel per cell, including the border
+
+Usage:
+    python snake_env.py --benchmark [--obs all] [--steps 20000] [--processes 4]
+"""
+
+import argparse
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Optional
+
+import numpy as np
+
+from snake_game import GRID_WIDTH, GRID_HEIGHT, PORTAL_LEFT, PORTAL_RIGHT, Direction, GameLogic, GameState
+
+try:
+    import gymnasium
+    from gymnasium import spaces
+except ImportError:  # gymnasium is optional
+    gymnasium = None
+    spaces = None
+
+# Actions are absolute directions
+ACTIONS = (Direction.UP, Direction.DOWN, Direction.LEFT, Direction.RIGHT)
+
+# Cell codes used by the label grid
+EMPTY, BODY, HEAD, FOOD, OBSTACLE, WALL, PORTAL = range(7)
+
+# Grid observation channels
+CHANNEL_NAMES = ("body", "head", "food", "obstacle", "portal")
+CODE_CHANNELS = {BODY: 0, HEAD: 1, FOOD: 2, OBSTACLE: 3}
+PORTAL_CHANNEL = 4
+
+# Colours for the pixel observation, indexed by cell code
+PALETTE = np.array([
+    (0, 0, 0),        # EMPTY
+    (0, 180, 0),      # BODY
+    (50, 205, 50),    # HEAD
+    (255, 0, 0),      # FOOD
+    (0, 0, 255),      # OBSTACLE
+    (0, 0, 128),      # WALL
+    (100, 200, 255),  # PORTAL
+], dtype=np.uint8)
+
+# Cells of padding around the arena in the label grid
+PAD = 8
+LABELS_SHAPE = (GRID_HEIGHT + 2 * PAD, GRID_WIDTH + 2 * PAD)
+
+FEATURE_SIZE = 11
+
+# Turning left/right relative to each direction
+LEFT_TURN = {Direction.UP: Direction.LEFT, Direction.LEFT: Direction.DOWN,
+             Direction.DOWN: Direction.RIGHT, Direction.RIGHT: Direction.UP}
+RIGHT_TURN = {turn: direction for direction, turn in LEFT_TURN.items()}
+
+
+class BoardEncoder:
+    """Grid encodings of a GameLogic that are updated one cell at a time.
+
+    ``labels`` holds a cell code for every cell of the arena plus ``PAD``
+    cells of wall around it (the portal opening is marked in the top wall).
+    ``channels`` and ``frame`` are optional views derived from the same
+    updates. Call ``sync()`` after every ``game.update()``.
+    """
+
+    def __init__(self, game: GameLogic, channels: bool = True, frame: bool = False,
+                 labels: Optional[np.ndarray] = None):
+        """Allocate the encodings and build them from the current game state.
+
+        ``labels`` is an optional uint8 array of shape ``LABELS_SHAPE`` to
+        keep the labels in, e.g. one slice of a batch of boards.
+        """
+        self.game = game
+        height, width = LABELS_SHAPE
+        if labels is None:
+            labels = np.empty(LABELS_SHAPE, dtype=np.uint8)
+        elif labels.shape != LABELS_SHAPE or labels.dtype != np.uint8:
+            raise ValueError(f"labels must be a uint8 array of shape {LABELS_SHAPE}")
+        self.padded_labels = labels
+        self.background = np.empty((height, width), dtype=np.uint8)
+        self.labels = self.padded_labels[PAD:PAD + GRID_HEIGHT, PAD:PAD + GRID_WIDTH]
+        self.channels = np.zeros((len(CHANNEL_NAMES), GRID_HEIGHT, GRID_WIDTH), dtype=np.uint8) if channels else None
+        self.padded_frame = np.empty((height, width, 3), dtype=np.uint8) if frame else None
+        self.rebuild()
+
+    @property
+    def frame(self) -> np.ndarray:
+        """RGB image of the arena and its one-cell border."""
+        return self.padded_frame[PAD - 1:PAD + GRID_HEIGHT + 1, PAD - 1:PAD + GRID_WIDTH + 1]
+
+    def rebuild(self):
+        """Rebuild every encoding from scratch (new game or new level)."""
+        game = self.game
+        background = self.background
+        background.fill(WALL)
+        background[PAD:PAD + GRID_HEIGHT, PAD:PAD + GRID_WIDTH] = EMPTY
+        for obstacle in game.level_manager.obstacles:
+            for x, y in obstacle.positions:
+                background[y + PAD, x + PAD] = OBSTACLE
+
+        self._portal_open = game.portal_open
+        if self._portal_open:
+            # The portal shaft runs up through the padding above the opening
+            background[:PAD, PORTAL_LEFT + PAD:PORTAL_RIGHT + PAD + 1] = PORTAL
+
+        self.padded_labels[:] = background
+        if self.channels is not None:
+            self.channels.fill(0)
+            self.channels[CODE_CHANNELS[OBSTACLE]] = self.labels == OBSTACLE
+            if self._portal_open:
+                self.channels[PORTAL_CHANNEL, 0, PORTAL_LEFT:PORTAL_RIGHT + 1] = 1
+
+        body = game.snake.body
+        for x, y in islice(body, 1, None):
+            self._set(x, y, BODY)
+        self._set(body[0][0], body[0][1], HEAD)
+        self._set(game.food.position[0], game.food.position[1], FOOD)
+
+        if self.padded_frame is not None:
+            self.padded_frame[:] = PALETTE[self.padded_labels]
+
+        self._snake = game.snake
+        self._body = body
+        self._level = game.level_manager.current_level
+        self._moves = game.moves
+        self._head = body[0]
+        self._tail = body[-1]
+        self._length = len(body)
+        self._food = game.food.position
+
+    def sync(self):
+        """Bring the encodings up to date after a single ``game.update()``."""
+        game = self.game
+        body = game.snake.body
+        if (game.snake is not self._snake or body is not self._body
+                or game.level_manager.current_level != self._level or game.moves - self._moves > 1):
+            self.rebuild()
+            return
+
+        if game.portal_open != self._portal_open:
+            self._set_portal(game.portal_open)
+
+        food = game.food.position
+        if game.moves != self._moves:
+            if food != self._food:
+                self._clear(self._food[0], self._food[1])
+            if len(body) == self._length:
+                self._clear(self._tail[0], self._tail[1])
+            self._set(self._head[0], self._head[1], BODY)
+            self._set(body[0][0], body[0][1], HEAD)
+            self._moves = game.moves
+            self._head = body[0]
+            self._tail = body[-1]
+            self._length = len(body)
+        elif food != self._food:
+            self._clear(self._food[0], self._food[1])
+
+        if food != self._food:
+            self._set(food[0], food[1], FOOD)
+            self._food = food
+
+    def _set_portal(self, portal_open: bool):
+        """Open or close the portal in the top wall."""
+        self._portal_open = portal_open
+        code = PORTAL if portal_open else WALL
+        self.background[:PAD, PORTAL_LEFT + PAD:PORTAL_RIGHT + PAD + 1] = code
+        for x in range(PORTAL_LEFT, PORTAL_RIGHT + 1):
+            for y in range(-PAD, 0):
+                if self.padded_labels[y + PAD, x + PAD] in (WALL, PORTAL):
+                    self._set(x, y, code)
+        if self.channels is not None:
+            self.channels[PORTAL_CHANNEL, 0, PORTAL_LEFT:PORTAL_RIGHT + 1] = 1 if portal_open else 0
+
+    def _clear(self, x: int, y: int):
+        """Restore a cell to its static background code."""
+        if -PAD <= x < GRID_WIDTH + PAD and -PAD <= y < GRID_HEIGHT + PAD:
+            self._set(x, y, self.background[y + PAD, x + PAD])
+
+    def _set(self, x: int, y: int, code: int):
+        """Write one cell in every maintained encoding."""
+        px = x + PAD
+        py = y + PAD
+        if not (0 <= px < GRID_WIDTH + 2 * PAD and 0 <= py < GRID_HEIGHT + 2 * PAD):
+            return  # Far up the portal shaft
+        if self.channels is not None and 0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT:
+            old = CODE_CHANNELS.get(self.padded_labels[py, px])
+            if old is not None:
+                self.channels[old, y, x] = 0
+            new = CODE_CHANNELS.get(code)
+            if new is not None:
+                self.channels[new, y, x] = 1
+        self.padded_labels[py, px] = code
+        if self.padded_frame is not None:
+            self.padded_frame[py, px] = PALETTE[code]
+
+    def is_blocked(self, x: int, y: int) -> bool:
+        """Return True if moving the head onto (x, y) would be fatal."""
+        px = x + PAD
+        py = y + PAD
+        if not (0 <= px < GRID_WIDTH + 2 * PAD and 0 <= py < GRID_HEIGHT + 2 * PAD):
+            return False  # Far up the portal shaft
+        return self.padded_labels[py, px] in (BODY, HEAD, OBSTACLE, WALL)
+
+    def features(self, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return the compact feature vector for the current state."""
+        if out is None:
+            out = np.zeros(FEATURE_SIZE, dtype=np.uint8)
+        snake = self.game.snake
+        direction = snake.direction
+        head_x, head_y = snake.body[0]
+        for i, heading in enumerate((direction, LEFT_TURN[direction], RIGHT_TURN[direction])):
+            dx, dy = heading.value
+            out[i] = self.is_blocked(head_x + dx, head_y + dy)
+        for i, candidate in enumerate(ACTIONS):
+            out[3 + i] = direction is candidate
+        food_x, food_y = self.game.food.position
+        out[7] = food_y < head_y
+        out[8] = food_y > head_y
+        out[9] = food_x < head_x
+        out[10] = food_x > head_x
+        return out
+
+
+_EnvBase = gymnasium.Env if gymnasium is not None else object
+
+
+class SnakeEnv(_EnvBase):
+    """Headless Snake environment with ``reset()``/``step()`` in the Gymnasium style."""
+
+    metadata = {"render_modes": ["rgb_array"]}
+
+    def __init__(self, obs_type: str = "grid", max_steps: int = 10000, seed: Optional[int] = None,
+                 copy_obs: bool = True):
+        """Create the environment.
+
+        ``copy_obs=False`` returns the internal observation buffer, which is
+        faster but is overwritten by the next ``step()``.
+        """
+        if obs_type not in ("grid", "features", "pixels"):
+            raise ValueError(f"Unknown observation type: {obs_type}")
+        self.obs_type = obs_type
+        self.max_steps = max_steps
+        self.copy_obs = copy_obs
+        self.render_mode = "rgb_array"
+        self._seed = seed
+        self._features = np.zeros(FEATURE_SIZE, dtype=np.uint8)
+
+        if spaces is not None:
+            self.action_space = spaces.Discrete(len(ACTIONS))
+            if obs_type == "grid":
+                self.observation_space = spaces.Box(0, 1, (len(CHANNEL_NAMES), GRID_HEIGHT, GRID_WIDTH), np.uint8)
+            elif obs_type == "features":
+                self.observation_space = spaces.Box(0, 1, (FEATURE_SIZE,), np.uint8)
+            else:
+                self.observation_space = spaces.Box(0, 255, (GRID_HEIGHT + 2, GRID_WIDTH + 2, 3), np.uint8)
+
+        self.game = None
+        self.encoder = None
+        self.steps = 0
+
+    def reset(self, seed: Optional[int] = None, options: Optional[dict] = None):
+        """Start a new game and return ``(observation, info)``."""
+        if seed is not None:
+            self._seed = seed
+        rng = random.Random(self._seed)
+        # Later resets without a seed continue the same random sequence
+        self._seed = rng.getrandbits(64)
+
+        self.game = GameLogic(rng)
+        self.game.start_playing()
+        self.encoder = BoardEncoder(self.game, channels=self.obs_type == "grid",
+                                    frame=self.obs_type == "pixels")
+        self.steps = 0
+        return self._observation(), self._info()
+
+    def step(self, action: int):
+        """Apply an action and return ``(obs, reward, terminated, truncated, info)``."""
+        game = self.game
+        score = game.score
+        level = game.level_manager.current_level
+
+        game.snake.change_direction(ACTIONS[action])
+        game.update()
+        # Skip the level transition screen; it has no decisions to make
+        while game.state == GameState.LEVEL_TRANSITION:
+            game.update()
+        self.encoder.sync()
+        self.steps += 1
+
+        terminated = game.state == GameState.GAME_OVER
+        truncated = not terminated and self.steps >= self.max_steps
+        reward = (game.score - score) / 10.0
+        if game.level_manager.current_level != level:
+            reward += 5.0
+        if terminated:
+            reward -= 1.0
+        return self._observation(), reward, terminated, truncated, self._info()
+
+    def render(self):
+        """Return the board as a small RGB image."""
+        if self.encoder.padded_frame is not None:
+            return self.encoder.frame.copy()
+        return PALETTE[self.encoder.padded_labels[PAD - 1:PAD + GRID_HEIGHT + 1, PAD - 1:PAD + GRID_WIDTH + 1]]
+
+    def _observation(self) -> np.ndarray:
+        """Return the observation for the configured type."""
+        if self.obs_type == "grid":
+            obs = self.encoder.channels
+        elif self.obs_type == "features":
+            obs = self.encoder.features(self._features)
+        else:
+            obs = self.encoder.frame
+        return obs.copy() if self.copy_obs else obs
+
+    def _info(self) -> dict:
+        """Return auxiliary information about the game."""
+        game = self.game
+        return {"score": game.score, "level": game.level_manager.current_level,
+                "apples": game.apples_eaten, "length": len(game.snake.body)}
+
+
+def benchmark(obs_type: str, steps: int, seed: int = 0) -> float:
+    """Run random actions for ``steps`` steps and return steps per second."""
+    env = SnakeEnv(obs_type, seed=seed, copy_obs=False)
+    rng = random.Random(seed)
+    env.reset()
+    start = time.perf_counter()
+    for _ in range(steps):
+        _, _, terminated, truncated, _ = env.step(rng.randrange(len(ACTIONS)))
+        if terminated or truncated:
+            env.reset()
+    return steps / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    """Command line entry point for the environment benchmark."""
+    parser = argparse.ArgumentParser(description="Snake environment benchmark")
+    parser.add_argument("--benchmark", action="store_true", help="Measure environment steps per second")
+    parser.add_argument("--obs", default="all", choices=["all", "grid", "features", "pixels"])
+    parser.add_argument("--steps", type=int, default=20000)
+    parser.add_argument("--processes", type=int, default=1, help="Run one environment per process")
+    args = parser.parse_args(argv)
+
+    if not args.benchmark:
+        parser.print_help()
+        return
+
+    obs_types = ["grid", "features", "pixels"] if args.obs == "all" else [args.obs]
+    for obs_type in obs_types:
+        if args.processes == 1:
+            rates = [benchmark(obs_type, args.steps)]
+        else:
+            with ProcessPoolExecutor(args.processes) as pool:
+                rates = list(pool.map(benchmark, [obs_type] * args.processes, [args.steps] * args.processes,
+                                      range(args.processes)))
+        total = sum(rates)
+        print(f"{obs_type:>8}: {total / len(rates):10.0f} steps/s per core, "
+              f"{total:10.0f} steps/s total ({len(rates)} processes)")
+
+
+if __name__ == "__main__":
+    main()
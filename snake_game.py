@@ -4,13 +4,24 @@ Classic Snake Game
 A Python implementation of the classic Snake game using pygame.
 """
 
+import argparse
+import os
 import pygame
 import random
 import sys
+from array import array
+from collections import OrderedDict, deque
 from enum import Enum
-from typing import List, Tuple
+from typing import Iterable, List, Optional, Tuple
 
-# Initialize pygame
+# When run as a script, register this module under its import name so that
+# feature modules doing ``import snake_game`` share the same classes.
+sys.modules.setdefault("snake_game", sys.modules[__name__])
+
+# Initialize pygame, with a small mixer buffer so sound effects start promptly
+AUDIO_FREQUENCY = 44100
+AUDIO_BUFFER = 512  # Samples per mixer chunk, about 12 ms
+pygame.mixer.pre_init(AUDIO_FREQUENCY, -16, 2, AUDIO_BUFFER)
 pygame.init()
 
 # Constants
@@ -39,7 +50,39 @@ SPEED_INCREMENT = 0.5
 MAX_SPEED = 20
 FRAME_WIDTH = 3
 APPLES_PER_LEVEL = 10
+OBSTACLE_DENSITY = 0.7  # Chance of each block in a random obstacle cluster
 PORTAL_WIDTH = GRID_SIZE*2  # Same width as an apple
+PORTAL_LEFT = GRID_WIDTH // 2 - PORTAL_WIDTH // (2 * GRID_SIZE)  # Leftmost portal column
+PORTAL_RIGHT = GRID_WIDTH // 2 + PORTAL_WIDTH // (2 * GRID_SIZE)  # Rightmost portal column
+LEVEL_TRANSITION_TICKS = 180  # 3 seconds at 60 FPS
+SPAWN_RUNWAY = 3  # Clear cells required ahead of a newly placed snake
+COUNTDOWN_TICKS = 60  # Transition ticks per countdown number
+LEVEL_MAP_CACHE_SIZE = 32  # Obstacle layouts whose LevelMap is kept
+
+def build_cell_tables():
+    """Return lookup tables of pixel geometry for each (x, y) cell on the logical screen.
+
+    The tables cover the arena, its wall ring and the portal row above it;
+    cells further out are never visible. Returns (cell rects, cell centres,
+    body segment rects, inner body segment rects).
+    """
+    rects, centers, segments, inner_segments = {}, {}, {}, {}
+    for y in range(-1, GRID_HEIGHT + 1):
+        for x in range(-1, GRID_WIDTH + 1):
+            left = x * GRID_SIZE + FRAME_WIDTH
+            top = y * GRID_SIZE + FRAME_WIDTH
+            rects[(x, y)] = pygame.Rect(left, top, GRID_SIZE, GRID_SIZE)
+            centers[(x, y)] = (left + GRID_SIZE // 2, top + GRID_SIZE // 2)
+            segments[(x, y)] = pygame.Rect(left + 2, top + 2, GRID_SIZE - 4, GRID_SIZE - 4)
+            inner_segments[(x, y)] = pygame.Rect(left + 4, top + 4, GRID_SIZE - 8, GRID_SIZE - 8)
+    return rects, centers, segments, inner_segments
+
+CELL_RECTS, CELL_CENTERS, SEGMENT_RECTS, SEGMENT_INNER_RECTS = build_cell_tables()
+
+# Window scaling of the logical screen
+SCALERS = {"nearest": pygame.transform.scale, "smooth": pygame.transform.smoothscale}
+# Window events after which an idle screen must be shown again
+REDRAW_EVENTS = (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE, pygame.WINDOWSIZECHANGED)
 
 class Direction(Enum):
     """Enumeration for snake movement directions."""
@@ -48,6 +91,14 @@ class Direction(Enum):
     LEFT = (-1, 0)
     RIGHT = (1, 0)
 
+# Arrow keys and WASD
+KEY_DIRECTIONS = {
+    pygame.K_UP: Direction.UP, pygame.K_w: Direction.UP,
+    pygame.K_DOWN: Direction.DOWN, pygame.K_s: Direction.DOWN,
+    pygame.K_LEFT: Direction.LEFT, pygame.K_a: Direction.LEFT,
+    pygame.K_RIGHT: Direction.RIGHT, pygame.K_d: Direction.RIGHT,
+}
+
 class GameState(Enum):
     """Enumeration for different game states."""
     MENU = 1
@@ -56,28 +107,78 @@ class GameState(Enum):
     GAME_OVER = 4
     LEVEL_TRANSITION = 5
 
+class DeathCause(Enum):
+    """Enumeration for the ways a game can end."""
+    WALL = "wall"
+    SELF = "self"
+    OBSTACLE = "obstacle"
+
+class GameEvent(Enum):
+    """Enumeration for events reported to game listeners."""
+    GAME_START = 1
+    LEVEL_START = 2
+    LEVEL_COMPLETE = 3
+    DEATH = 4
+    APPLE_EATEN = 5
+    SPEED_CHANGE = 6
+    PORTAL_OPEN = 7
+    GAME_RESUMED = 8
+
+def spawn_row(is_blocked) -> int:
+    """Return the row nearest the centre where a new snake and its runway are clear.
+
+    ``is_blocked((x, y))`` tells whether a cell holds an obstacle.
+    """
+    center_x = GRID_WIDTH // 2
+    center_y = GRID_HEIGHT // 2
+    for offset in range(GRID_HEIGHT):
+        for row in (center_y + offset, center_y - offset):
+            if 0 <= row < GRID_HEIGHT and not any(
+                    is_blocked((x, row)) for x in range(center_x - 2, center_x + SPAWN_RUNWAY + 1)):
+                return row
+    return center_y
+
 class Snake:
-    """Snake class to handle snake logic and rendering."""
+    """Snake class to handle snake logic and rendering.
+
+    ``body`` is a deque of (x, y) cells, head first, so moving the head and
+    tail (or undoing a move) takes constant time at any length.
+    """
+    
+    __slots__ = ("body", "direction", "grow_pending", "shared")
     
     def __init__(self):
         """Initialize the snake at the center of the screen."""
         self.reset()
     
-    def reset(self):
-        """Reset snake to initial state."""
+    def reset(self, row: int = GRID_HEIGHT // 2):
+        """Reset snake to initial state, heading right from the centre of ``row``."""
         center_x = GRID_WIDTH // 2
-        center_y = GRID_HEIGHT // 2
-        self.body = [(center_x, center_y), (center_x - 1, center_y), (center_x - 2, center_y)]
+        self.body = deque([(center_x, row), (center_x - 1, row), (center_x - 2, row)])
         self.direction = Direction.RIGHT
         self.grow_pending = 0
+        self.shared = False
+    
+    def fork(self) -> "Snake":
+        """Return a copy that shares the body deque until either snake moves."""
+        clone = Snake.__new__(type(self))
+        clone.body = self.body
+        clone.direction = self.direction
+        clone.grow_pending = self.grow_pending
+        clone.shared = self.shared = True
+        return clone
     
     def move(self):
         """Move the snake in the current direction."""
+        if self.shared:
+            # Copy on write: the body deque is shared with a fork
+            self.body = deque(self.body)
+            self.shared = False
         head_x, head_y = self.body[0]
         dx, dy = self.direction.value
         new_head = (head_x + dx, head_y + dy)
         
-        self.body.insert(0, new_head)
+        self.body.appendleft(new_head)
         
         if self.grow_pending > 0:
             self.grow_pending -= 1
@@ -104,18 +205,21 @@ class Snake:
     
     def check_self_collision(self) -> bool:
         """Check if snake has hit itself."""
-        head = self.body[0]
-        return head in self.body[1:]
+        return self.body.count(self.body[0]) > 1
     
     def draw(self, screen):
         """Draw the snake on the screen with smooth, rounded segments and texture."""
         if len(self.body) == 0:
             return
             
+        # Segments far up the portal shaft are off screen and have no entry
+        centers = [CELL_CENTERS.get(cell) for cell in self.body]
+        
         # Draw snake body segments as continuous rounded rectangles
-        for i, (x, y) in enumerate(self.body):
-            center_x = x * GRID_SIZE + GRID_SIZE // 2 + FRAME_WIDTH
-            center_y = y * GRID_SIZE + GRID_SIZE // 2 + FRAME_WIDTH
+        for i, cell in enumerate(self.body):
+            if centers[i] is None:
+                continue
+            center_x, center_y = centers[i]
             
             if i == 0:  # Head
                 # Draw head as a circle with gradient effect
@@ -129,48 +233,55 @@ class Snake:
                 pygame.draw.circle(screen, BLACK, (center_x + eye_offset//2, center_y - eye_offset//2), 2)
             else:  # Body
                 # Draw body segment as rounded rectangle
-                segment_rect = pygame.Rect(x * GRID_SIZE + 2 + FRAME_WIDTH, y * GRID_SIZE + 2 + FRAME_WIDTH, 
-                                         GRID_SIZE - 4, GRID_SIZE - 4)
+                segment_rect = SEGMENT_RECTS[cell]
                 
                 # Main body color
                 pygame.draw.rect(screen, DARK_GREEN, segment_rect, border_radius=6)
                 
                 # Add texture with lighter inner rectangle
-                inner_rect = pygame.Rect(x * GRID_SIZE + 4 + FRAME_WIDTH, y * GRID_SIZE + 4 + FRAME_WIDTH, 
-                                       GRID_SIZE - 8, GRID_SIZE - 8)
-                pygame.draw.rect(screen, LIGHT_GREEN, inner_rect, border_radius=4)
+                pygame.draw.rect(screen, LIGHT_GREEN, SEGMENT_INNER_RECTS[cell], border_radius=4)
                 
                 # Add outline
                 pygame.draw.rect(screen, SNAKE_OUTLINE, segment_rect, 2, border_radius=6)
         
         # Draw connections between segments to make it look continuous
-        for i in range(len(self.body) - 1):
-            x1, y1 = self.body[i]
-            x2, y2 = self.body[i + 1]
-            
-            center_x1 = x1 * GRID_SIZE + GRID_SIZE // 2 + FRAME_WIDTH
-            center_y1 = y1 * GRID_SIZE + GRID_SIZE // 2 + FRAME_WIDTH
-            center_x2 = x2 * GRID_SIZE + GRID_SIZE // 2 + FRAME_WIDTH
-            center_y2 = y2 * GRID_SIZE + GRID_SIZE // 2 + FRAME_WIDTH
+        for i in range(len(centers) - 1):
+            start = centers[i]
+            end = centers[i + 1]
+            if start is None or end is None:
+                continue
             
             # Draw thick line between segments
-            pygame.draw.line(screen, DARK_GREEN, (center_x1, center_y1), (center_x2, center_y2), GRID_SIZE - 4)
-            pygame.draw.line(screen, LIGHT_GREEN, (center_x1, center_y1), (center_x2, center_y2), GRID_SIZE - 8)
+            pygame.draw.line(screen, DARK_GREEN, start, end, GRID_SIZE - 4)
+            pygame.draw.line(screen, LIGHT_GREEN, start, end, GRID_SIZE - 8)
 
 class Food:
     """Food class to handle food logic and rendering."""
     
-    def __init__(self):
-        """Initialize food at a random position."""
+    __slots__ = ("rng", "position")
+    
+    def __init__(self, rng=None):
+        """Initialize food at a random position.
+
+        ``rng`` is an optional ``random.Random`` used for reproducible games.
+        """
+        self.rng = rng if rng is not None else random
         self.position = self.generate_position()
     
+    def fork(self, rng) -> "Food":
+        """Return a copy drawing its positions from ``rng``."""
+        clone = Food.__new__(type(self))
+        clone.rng = rng
+        clone.position = self.position
+        return clone
+    
     def generate_position(self) -> Tuple[int, int]:
         """Generate a random position for the food."""
-        x = random.randint(0, GRID_WIDTH - 1)
-        y = random.randint(0, GRID_HEIGHT - 1)
+        x = self.rng.randint(0, GRID_WIDTH - 1)
+        y = self.rng.randint(0, GRID_HEIGHT - 1)
         return (x, y)
     
-    def respawn(self, snake_body: List[Tuple[int, int]]):
+    def respawn(self, snake_body: Iterable[Tuple[int, int]]):
         """Respawn food at a position not occupied by the snake."""
         while True:
             self.position = self.generate_position()
@@ -179,9 +290,12 @@ class Food:
     
     def draw(self, screen):
         """Draw the food as an apple on the screen."""
-        x, y = self.position
-        center_x = x * GRID_SIZE + GRID_SIZE // 2 + FRAME_WIDTH
-        center_y = y * GRID_SIZE + GRID_SIZE // 2 + FRAME_WIDTH
+        self.draw_at(screen, self.position)
+    
+    @staticmethod
+    def draw_at(screen, cell: Tuple[int, int]):
+        """Draw an apple in grid ``cell`` of ``screen``."""
+        center_x, center_y = CELL_CENTERS[cell]
         
         # Draw apple body (main red circle)
         apple_radius = GRID_SIZE // 2 - 2
@@ -214,15 +328,16 @@ class Food:
 class Obstacle:
     """Obstacle class to handle level obstacles."""
     
+    __slots__ = ("positions",)
+    
     def __init__(self, positions: List[Tuple[int, int]]):
         """Initialize obstacle with list of grid positions."""
         self.positions = positions
     
     def draw(self, screen):
         """Draw obstacle blocks on the screen."""
-        for x, y in self.positions:
-            rect = pygame.Rect(x * GRID_SIZE + FRAME_WIDTH, y * GRID_SIZE + FRAME_WIDTH, 
-                             GRID_SIZE, GRID_SIZE)
+        for position in self.positions:
+            rect = CELL_RECTS[position]
             pygame.draw.rect(screen, BLUE, rect)
             pygame.draw.rect(screen, WHITE, rect, 1)
     
@@ -233,12 +348,29 @@ class Obstacle:
 class LevelManager:
     """Manages game levels and obstacles."""
     
-    def __init__(self):
-        """Initialize level manager."""
+    __slots__ = ("rng", "current_level", "obstacles")
+    
+    def __init__(self, rng=None):
+        """Initialize level manager.
+
+        ``rng`` is an optional ``random.Random`` used for reproducible levels.
+        """
+        self.rng = rng if rng is not None else random
         self.current_level = 1
         self.obstacles = []
         self.generate_obstacles()
     
+    def fork(self, rng) -> "LevelManager":
+        """Return a copy drawing from ``rng`` that shares this level's obstacles.
+
+        Obstacle lists are never modified once generated, so sharing them is safe.
+        """
+        clone = LevelManager.__new__(type(self))
+        clone.rng = rng
+        clone.current_level = self.current_level
+        clone.obstacles = self.obstacles
+        return clone
+    
     def generate_obstacles(self):
         """Generate obstacles for current level."""
         self.obstacles = []
@@ -280,13 +412,13 @@ class LevelManager:
             
             # Create multiple random obstacle clusters
             for cluster in range(level_complexity):
-                center_x = random.randint(8, GRID_WIDTH - 8)
-                center_y = random.randint(8, GRID_HEIGHT - 8)
-                cluster_size = random.randint(3, 7)  # Slightly larger clusters for higher levels
+                center_x = self.rng.randint(8, GRID_WIDTH - 8)
+                center_y = self.rng.randint(8, GRID_HEIGHT - 8)
+                cluster_size = self.rng.randint(3, 7)  # Slightly larger clusters for higher levels
                 
                 for i in range(cluster_size):
                     for j in range(cluster_size):
-                        if random.random() < 0.7:  # 70% chance for each block (increased density)
+                        if self.rng.random() < OBSTACLE_DENSITY:
                             x, y = center_x + i - cluster_size//2, center_y + j - cluster_size//2
                             if 3 < x < GRID_WIDTH - 3 and 3 < y < GRID_HEIGHT - 3:
                                 obstacles.append((x, y))
@@ -295,15 +427,15 @@ class LevelManager:
             if self.current_level >= 8:
                 # Add random horizontal and vertical lines
                 for _ in range(self.current_level // 4):
-                    if random.choice([True, False]):  # Horizontal line
-                        y_pos = random.randint(5, GRID_HEIGHT - 6)
-                        x_start = random.randint(5, GRID_WIDTH // 3)
-                        x_end = random.randint(2 * GRID_WIDTH // 3, GRID_WIDTH - 5)
+                    if self.rng.choice([True, False]):  # Horizontal line
+                        y_pos = self.rng.randint(5, GRID_HEIGHT - 6)
+                        x_start = self.rng.randint(5, GRID_WIDTH // 3)
+                        x_end = self.rng.randint(2 * GRID_WIDTH // 3, GRID_WIDTH - 5)
                         obstacles.extend([(x, y_pos) for x in range(x_start, x_end)])
                     else:  # Vertical line
-                        x_pos = random.randint(5, GRID_WIDTH - 6)
-                        y_start = random.randint(5, GRID_HEIGHT // 3)
-                        y_end = random.randint(2 * GRID_HEIGHT // 3, GRID_HEIGHT - 5)
+                        x_pos = self.rng.randint(5, GRID_WIDTH - 6)
+                        y_start = self.rng.randint(5, GRID_HEIGHT // 3)
+                        y_end = self.rng.randint(2 * GRID_HEIGHT // 3, GRID_HEIGHT - 5)
                         obstacles.extend([(x_pos, y) for y in range(y_start, y_end)])
             
             if obstacles:  # Only create obstacle if we have positions
@@ -326,88 +458,261 @@ class LevelManager:
         for obstacle in self.obstacles:
             obstacle.draw(screen)
 
-class Game:
-    """Main game class to handle game logic and rendering."""
+def _cell_neighbours(cell: int) -> Tuple[int, ...]:
+    """Return the numbers of the arena cells next to arena cell ``y * GRID_WIDTH + x``."""
+    y, x = divmod(cell, GRID_WIDTH)
+    return tuple(n for n, inside in ((cell - GRID_WIDTH, y > 0), (cell + GRID_WIDTH, y < GRID_HEIGHT - 1),
+                                     (cell - 1, x > 0), (cell + 1, x < GRID_WIDTH - 1)) if inside)
+
+CELL_NEIGHBOURS = [_cell_neighbours(cell) for cell in range(GRID_WIDTH * GRID_HEIGHT)]
+
+class LevelMap:
+    """Static reachability of a level's cells, ignoring the snake.
     
-    def __init__(self):
-        """Initialize the game."""
-        self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-        pygame.display.set_caption("Snake Game")
-        self.clock = pygame.time.Clock()
-        self.font = pygame.font.Font(None, 36)
-        self.big_font = pygame.font.Font(None, 72)
+    Cells are numbered ``y * GRID_WIDTH + x``. ``components`` labels each
+    arena cell with its connected region of obstacle-free cells (0 for
+    obstacles, regions numbered from 1), and ``portal_distance`` and
+    ``spawn_distance`` hold the moves needed to leave through the portal
+    from each cell and to reach each cell from where the snake spawns
+    (``UNREACHABLE`` if it cannot). All three are compact uint16 arrays, so
+    every query is one index. Build them with ``level_map()``, which caches
+    them per obstacle layout.
+    """
+    
+    __slots__ = ("components", "component_sizes", "spawn", "spawn_component", "_spawn_distance", "_portal_distance")
+    
+    UNREACHABLE = 0xFFFF
+    
+    def __init__(self, obstacle_cells: Iterable[Tuple[int, int]]):
+        """Compute the maps for a level whose obstacles cover ``obstacle_cells``."""
+        blocked = set(obstacle_cells)
+        # Obstacles start out labelled with a region number no free cell gets
+        components = array("H", bytes(2 * GRID_WIDTH * GRID_HEIGHT))
+        for x, y in blocked:
+            if 0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT:
+                components[y * GRID_WIDTH + x] = self.UNREACHABLE
+        self.component_sizes = [0]
+        for start in range(GRID_WIDTH * GRID_HEIGHT):
+            if not components[start]:
+                # Flood the new region
+                label = len(self.component_sizes)
+                components[start] = label
+                size = 1
+                queue = deque([start])
+                while queue:
+                    for neighbour in CELL_NEIGHBOURS[queue.popleft()]:
+                        if not components[neighbour]:
+                            components[neighbour] = label
+                            size += 1
+                            queue.append(neighbour)
+                self.component_sizes.append(size)
+        for cell in range(GRID_WIDTH * GRID_HEIGHT):
+            if components[cell] == self.UNREACHABLE:
+                components[cell] = 0
+        self.components = components
+        
+        self.spawn = (GRID_WIDTH // 2, spawn_row(blocked.__contains__))
+        self.spawn_component = self.component(self.spawn)
+        # Distance fields are computed when first needed
+        self._spawn_distance = None
+        self._portal_distance = None
+    
+    @property
+    def spawn_distance(self) -> array:
+        """Moves from the spawn point to each cell."""
+        if self._spawn_distance is None:
+            self._spawn_distance = self._distances([self.index(self.spawn)], 0)
+        return self._spawn_distance
+    
+    @property
+    def portal_distance(self) -> array:
+        """Moves from each cell out through the portal."""
+        if self._portal_distance is None:
+            # The portal is left by moving up from the top row below it
+            exits = [self.index((x, 0)) for x in range(PORTAL_LEFT, PORTAL_RIGHT + 1)]
+            self._portal_distance = self._distances(exits, 1)
+        return self._portal_distance
+    
+    @staticmethod
+    def index(cell: Tuple[int, int]) -> int:
+        """Return the number of arena cell (x, y)."""
+        return cell[1] * GRID_WIDTH + cell[0]
+    
+    def component(self, cell: Tuple[int, int]) -> int:
+        """Return the region label of (x, y): 0 for obstacles and cells outside the arena."""
+        x, y = cell
+        return self.components[y * GRID_WIDTH + x] if 0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT else 0
+    
+    def connected(self, a: Tuple[int, int], b: Tuple[int, int]) -> bool:
+        """Check if a path free of obstacles joins cells ``a`` and ``b``."""
+        label = self.component(a)
+        return label != 0 and label == self.component(b)
+    
+    def distance_to_portal(self, cell: Tuple[int, int]) -> int:
+        """Return the fewest moves from (x, y) out through the portal, or ``UNREACHABLE``."""
+        x, y = cell
+        if 0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT:
+            return self.portal_distance[y * GRID_WIDTH + x]
+        return self.UNREACHABLE
+    
+    def distance_from_spawn(self, cell: Tuple[int, int]) -> int:
+        """Return the fewest moves from the spawn point to (x, y), or ``UNREACHABLE``."""
+        x, y = cell
+        if 0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT:
+            return self.spawn_distance[y * GRID_WIDTH + x]
+        return self.UNREACHABLE
+    
+    def placeable(self, cell: Tuple[int, int]) -> bool:
+        """Check if food on (x, y) could be reached by a snake starting from the spawn point.
+        
+        If the spawn point itself is blocked, any cell free of obstacles is allowed.
+        """
+        label = self.component(cell)
+        return label != 0 and (label == self.spawn_component or not self.spawn_component)
+    
+    def pockets(self) -> List[Tuple[int, int]]:
+        """Return the cells free of obstacles that are not ``placeable``."""
+        if len(self.component_sizes) <= 2 or not self.spawn_component:
+            return []
+        return [(cell % GRID_WIDTH, cell // GRID_WIDTH) for cell, label in enumerate(self.components)
+                if label and label != self.spawn_component]
+    
+    @property
+    def portal_reachable(self) -> bool:
+        """True if the snake can get from its spawn point to the portal."""
+        return self.portal_distance[self.index(self.spawn)] != self.UNREACHABLE
+    
+    def _distances(self, sources: List[int], first: int) -> array:
+        """Return the moves from the nearest of ``sources`` (which count as ``first``) to every cell."""
+        components = self.components
+        distances = array("H", [self.UNREACHABLE]) * (GRID_WIDTH * GRID_HEIGHT)
+        queue = deque()
+        for cell in sources:
+            if components[cell]:
+                distances[cell] = first
+                queue.append(cell)
+        while queue:
+            cell = queue.popleft()
+            distance = distances[cell] + 1
+            for neighbour in CELL_NEIGHBOURS[cell]:
+                if distances[neighbour] == self.UNREACHABLE and components[neighbour]:
+                    distances[neighbour] = distance
+                    queue.append(neighbour)
+        return distances
+
+_level_maps: "OrderedDict[frozenset, LevelMap]" = OrderedDict()
+
+def level_map(obstacle_cells: Iterable[Tuple[int, int]]) -> LevelMap:
+    """Return the LevelMap of an obstacle layout, computing it only the first time it is seen recently."""
+    key = frozenset(obstacle_cells)
+    level = _level_maps.get(key)
+    if level is None:
+        level = LevelMap(key)
+        _level_maps[key] = level
+        if len(_level_maps) > LEVEL_MAP_CACHE_SIZE:
+            _level_maps.popitem(last=False)
+    else:
+        _level_maps.move_to_end(key)
+    return level
+
+class GameLogic:
+    """Game rules and state, without any rendering or input handling."""
+    
+    # Snake implementation created by reset_game; alternative engines replace it
+    snake_class = Snake
+    
+    def __init__(self, rng=None):
+        """Initialize the game state.
+
+        ``rng`` is an optional ``random.Random``; seeding it makes the whole
+        game (food and obstacle placement) reproducible.
+        """
+        self.rng = rng if rng is not None else random
+        self.listeners = []
+        self.tick_listeners = []
+        self._level_map_key = None
+        self._level_map = None
         
         self.reset_game()
     
     def reset_game(self):
         """Reset the game to initial state."""
-        self.snake = Snake()
-        self.food = Food()
-        self.level_manager = LevelManager()
+        self.snake = self.snake_class()
+        self.food = Food(self.rng)
+        self.level_manager = LevelManager(self.rng)
+        self.moves = 0
         self.score = 0
         self.apples_eaten = 0
         self.speed = INITIAL_SPEED
         self.state = GameState.MENU
         self.portal_open = False
         self.transition_timer = 0
+        self.death_cause = None
         
         # Ensure food doesn't spawn on snake or obstacles
         self.respawn_food_safely()
     
+    def fork(self, rng=None) -> "GameLogic":
+        """Return an independent copy of the game for lookahead search.
+
+        Obstacles are shared and the snake body is only copied once one of the
+        games moves. The copy has no listeners or tick listeners and continues
+        with a copy of the random generator, unless ``rng`` is given.
+        """
+        if rng is None:
+            # Skip Random.__init__, which would seed from the OS only to be overwritten
+            rng = random.Random.__new__(random.Random)
+            rng.setstate(self.rng.getstate())
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        clone.rng = rng
+        clone.listeners = []
+        clone.tick_listeners = []
+        clone.snake = self.snake.fork()
+        clone.food = self.food.fork(rng)
+        clone.level_manager = self.level_manager.fork(rng)
+        return clone
+    
+    @property
+    def level_map(self) -> LevelMap:
+        """Reachability and distance maps of the current level."""
+        obstacles = self.level_manager.obstacles
+        if obstacles is not self._level_map_key:
+            self._level_map_key = obstacles
+            self._level_map = level_map(cell for obstacle in obstacles for cell in obstacle.positions)
+        return self._level_map
+    
     def respawn_food_safely(self):
-        """Respawn food in a safe location away from snake and obstacles."""
+        """Respawn food in a location the snake can reach, away from snake and obstacles."""
+        level = self.level_map
         while True:
             self.food.position = self.food.generate_position()
-            if (self.food.position not in self.snake.body and 
-                not self.level_manager.check_collision(self.food.position)):
+            if self.food.position not in self.snake.body and level.placeable(self.food.position):
                 break
     
-    def handle_input(self):
-        """Handle keyboard input."""
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                return False
-            
-            if event.type == pygame.KEYDOWN:
-                if self.state == GameState.MENU:
-                    if event.key == pygame.K_SPACE:
-                        self.state = GameState.PLAYING
-                
-                elif self.state == GameState.PLAYING:
-                    # Movement controls
-                    if event.key in [pygame.K_UP, pygame.K_w]:
-                        self.snake.change_direction(Direction.UP)
-                    elif event.key in [pygame.K_DOWN, pygame.K_s]:
-                        self.snake.change_direction(Direction.DOWN)
-                    elif event.key in [pygame.K_LEFT, pygame.K_a]:
-                        self.snake.change_direction(Direction.LEFT)
-                    elif event.key in [pygame.K_RIGHT, pygame.K_d]:
-                        self.snake.change_direction(Direction.RIGHT)
-                    elif event.key == pygame.K_SPACE:
-                        self.state = GameState.PAUSED
-                
-                elif self.state == GameState.PAUSED:
-                    if event.key == pygame.K_SPACE:
-                        self.state = GameState.PLAYING
-                
-                elif self.state == GameState.LEVEL_TRANSITION:
-                    if event.key == pygame.K_SPACE:
-                        self.state = GameState.PLAYING
-                        self.transition_timer = 0
-                
-                elif self.state == GameState.GAME_OVER:
-                    if event.key == pygame.K_r:
-                        self.reset_game()
-                        self.state = GameState.PLAYING
-                    elif event.key == pygame.K_m:
-                        self.reset_game()
-                        self.state = GameState.MENU
-                
-                # Global controls
-                if event.key == pygame.K_ESCAPE:
-                    return False
-        
-        return True
+    def add_listener(self, callback):
+        """Register ``callback(event, game)`` to be called for each GameEvent."""
+        self.listeners.append(callback)
+    
+    def notify(self, event: GameEvent):
+        """Report an event to all registered listeners."""
+        for listener in self.listeners:
+            listener(event, self)
+    
+    def add_tick_listener(self, callback):
+        """Register ``callback(game)`` to be called after every ``update``."""
+        self.tick_listeners.append(callback)
+    
+    def start_playing(self):
+        """Start a fresh game from the menu or game over screen."""
+        self.state = GameState.PLAYING
+        self.notify(GameEvent.GAME_START)
+    
+    def end_game(self, cause: DeathCause):
+        """End the current game because the snake died."""
+        self.state = GameState.GAME_OVER
+        self.death_cause = cause
+        self.notify(GameEvent.DEATH)
     
     def check_portal_collision(self) -> bool:
         """Check if snake head is at the portal opening."""
@@ -415,11 +720,7 @@ class Game:
             return False
         
         head_x, head_y = self.snake.body[0]
-        portal_center = GRID_WIDTH // 2
-        portal_left = portal_center - (PORTAL_WIDTH // (2 * GRID_SIZE))
-        portal_right = portal_center + (PORTAL_WIDTH // (2 * GRID_SIZE))
-        
-        return head_y <= -1 and portal_left <= head_x <= portal_right
+        return head_y <= -1 and PORTAL_LEFT <= head_x <= PORTAL_RIGHT
     
     def snake_fully_through_portal(self) -> bool:
         """Check if entire snake has passed through the portal."""
@@ -433,15 +734,25 @@ class Game:
         return True
     
     def update(self):
+        """Advance the game by one tick, then call the tick listeners."""
+        self.advance()
+        for listener in self.tick_listeners:
+            listener(self)
+    
+    def advance(self):
         """Update game logic."""
         if self.state == GameState.LEVEL_TRANSITION:
             self.transition_timer += 1
-            if self.transition_timer > 180:  # 3 seconds at 60 FPS
+            if self.transition_timer > LEVEL_TRANSITION_TICKS:
                 self.level_manager.next_level()
                 self.portal_open = False
                 self.apples_eaten = 0
+                # Start the new level near the centre, clear of its obstacles
+                self.snake.reset(spawn_row(self.level_manager.check_collision))
+                self.respawn_food_safely()
                 self.state = GameState.PLAYING
                 self.transition_timer = 0
+                self.notify(GameEvent.LEVEL_START)
             return
         
         if self.state != GameState.PLAYING:
@@ -450,61 +761,171 @@ class Game:
         # Check if portal should open
         if self.apples_eaten >= APPLES_PER_LEVEL and not self.portal_open:
             self.portal_open = True
+            self.notify(GameEvent.PORTAL_OPEN)
         
         # Move snake
         self.snake.move()
+        self.moves += 1
         
-        # Check portal collision and level progression
-        if self.portal_open and self.check_portal_collision():
-            # Allow snake to move through portal
-            pass
-        elif self.portal_open and self.snake_fully_through_portal():
+        # Check level progression and portal collision
+        if self.portal_open and self.snake_fully_through_portal():
             # Transition to next level
             self.state = GameState.LEVEL_TRANSITION
             self.transition_timer = 0
+            self.notify(GameEvent.LEVEL_COMPLETE)
             return
+        elif self.portal_open and self.check_portal_collision():
+            # Allow snake to move through portal
+            pass
         
         # Check food collision
         if self.snake.body[0] == self.food.position:
             self.snake.grow()
             self.score += 10
             self.apples_eaten += 1
+            self.notify(GameEvent.APPLE_EATEN)
             self.respawn_food_safely()
             
             # Increase speed slightly
-            self.speed = min(MAX_SPEED, self.speed + SPEED_INCREMENT)
+            new_speed = min(MAX_SPEED, self.speed + SPEED_INCREMENT)
+            if new_speed != self.speed:
+                self.speed = new_speed
+                self.notify(GameEvent.SPEED_CHANGE)
         
         # Check collisions (walls, self, obstacles)
         head_x, head_y = self.snake.body[0]
         
         # Check wall collision (but allow portal exit)
         if self.portal_open:
-            # Allow movement through portal area
-            portal_center = GRID_WIDTH // 2
-            portal_left = portal_center - (PORTAL_WIDTH // (2 * GRID_SIZE))
-            portal_right = portal_center + (PORTAL_WIDTH // (2 * GRID_SIZE))
-            
             # If snake is in portal area, allow movement beyond normal boundaries
-            if portal_left <= head_x <= portal_right and head_y <= -1:
+            if PORTAL_LEFT <= head_x <= PORTAL_RIGHT and head_y <= -1:
                 pass  # Allow portal movement
             elif self.snake.check_wall_collision():
-                self.state = GameState.GAME_OVER
+                self.end_game(DeathCause.WALL)
                 return
         else:
             # Normal wall collision check
             if self.snake.check_wall_collision():
-                self.state = GameState.GAME_OVER
+                self.end_game(DeathCause.WALL)
                 return
         
         # Check self collision
         if self.snake.check_self_collision():
-            self.state = GameState.GAME_OVER
+            self.end_game(DeathCause.SELF)
             return
         
         # Check obstacle collision
         if self.level_manager.check_collision(self.snake.body[0]):
-            self.state = GameState.GAME_OVER
+            self.end_game(DeathCause.OBSTACLE)
             return
+
+class Game(GameLogic):
+    """Main game class to handle input and rendering on top of the game logic."""
+    
+    # States whose screen only changes on input (or on the transition countdown)
+    IDLE_STATES = (GameState.MENU, GameState.PAUSED, GameState.GAME_OVER, GameState.LEVEL_TRANSITION)
+    
+    def __init__(self, leaderboard=None, rng=None, window_size=None, scaling="nearest", fullscreen=False):
+        """Initialize the game.
+
+        ``leaderboard`` is an optional object with a ``top_scores(n)`` method
+        (such as ``stats_store.StatsStore``) shown on the game over screen.
+        
+        Everything is drawn onto ``self.screen``, a fixed logical surface of
+        WINDOW_WIDTH x WINDOW_HEIGHT pixels, which is scaled once per frame
+        to fit the resizable window (``window_size``, or the whole display
+        when ``fullscreen``). ``scaling`` is ``"nearest"`` or ``"smooth"``.
+        """
+        if scaling not in SCALERS:
+            raise ValueError(f"Unknown scaling: {scaling}")
+        self.scale = SCALERS[scaling]
+        if fullscreen:
+            pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        else:
+            pygame.display.set_mode(window_size or (WINDOW_WIDTH, WINDOW_HEIGHT), pygame.RESIZABLE)
+        pygame.display.set_caption("Snake Game")
+        self.screen = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), 0, 32)
+        self._window_size = None
+        self._viewport = None
+        self.clock = pygame.time.Clock()
+        self.font = pygame.font.Font(None, 36)
+        self.big_font = pygame.font.Font(None, 72)
+        self.leaderboard = leaderboard
+        self.recorder = None
+        # Optional savegame.SaveWriter; games in progress are saved on pause and quit
+        self.saver = None
+        # Optional particles.GameEffects, drawn over the game and game over screens
+        self.effects = None
+        # Optional audio.AudioPlayer; turns are played from here, other sounds from its listener
+        self.audio = None
+        # Optional heatmap.Heatmap, shown over the game screen with H
+        self.heatmap = None
+        # Render idle screens once and sleep until input instead of redrawing every tick
+        self.idle_wait = True
+        self._drawn_key = None
+        self._tick_carry = 0.0
+        self._paused_frame = None
+        self._overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+        self._overlay.set_alpha(128)
+        self._overlay.fill(BLACK)
+        
+        super().__init__(rng)
+    
+    def handle_input(self, events=None):
+        """Handle keyboard input from ``events``, or from the event queue if not given."""
+        if events is None:
+            events = pygame.event.get()
+        snake, heading = self.snake, self.snake.direction
+        for event in events:
+            if event.type == pygame.QUIT:
+                self.save()
+                return False
+            
+            if event.type == pygame.KEYDOWN:
+                if self.state == GameState.MENU:
+                    if event.key == pygame.K_SPACE:
+                        self.start_playing()
+                
+                elif self.state == GameState.PLAYING:
+                    # Movement controls
+                    if event.key in KEY_DIRECTIONS:
+                        self.snake.change_direction(KEY_DIRECTIONS[event.key])
+                    elif event.key == pygame.K_h and self.heatmap is not None:
+                        self.heatmap.toggle()
+                    elif event.key == pygame.K_SPACE:
+                        self.state = GameState.PAUSED
+                        self.save()
+                
+                elif self.state == GameState.PAUSED:
+                    if event.key == pygame.K_SPACE:
+                        self.state = GameState.PLAYING
+                
+                elif self.state == GameState.LEVEL_TRANSITION:
+                    if event.key == pygame.K_SPACE:
+                        self.state = GameState.PLAYING
+                        self.transition_timer = 0
+                
+                elif self.state == GameState.GAME_OVER:
+                    if event.key == pygame.K_r:
+                        self.reset_game()
+                        self.start_playing()
+                    elif event.key == pygame.K_m:
+                        self.reset_game()
+                        self.state = GameState.MENU
+                
+                # Global controls
+                if event.key == pygame.K_ESCAPE:
+                    self.save()
+                    return False
+        
+        if self.audio is not None and self.snake is snake and self.snake.direction != heading:
+            self.audio.play("turn")
+        return True
+    
+    def save(self):
+        """Save the game in the background if a saver is attached."""
+        if self.saver is not None:
+            self.saver.save(self)
     
     def draw_text(self, text: str, x: int, y: int, font=None, color=WHITE):
         """Draw text on the screen."""
@@ -548,6 +969,10 @@ class Game:
         # Draw game objects
         self.snake.draw(self.screen)
         self.food.draw(self.screen)
+        if self.effects is not None:
+            self.effects.draw(self.screen, self)
+        if self.heatmap is not None:
+            self.heatmap.draw(self.screen, self)
         
         # Draw score and level info
         level_text = f"Level: {self.level_manager.current_level}"
@@ -561,23 +986,31 @@ class Game:
     
     def draw_paused(self):
         """Draw the pause screen."""
-        self.draw_game()  # Draw game behind pause menu
-        
-        # Semi-transparent overlay
-        overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
-        overlay.set_alpha(128)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
-        
-        self.draw_text("PAUSED", WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 - 40, self.big_font)
-        self.draw_text("Press SPACE to Resume", WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 20)
+        if self._paused_frame is None:
+            # The game cannot change while paused, so compose the screen once
+            self.draw_game()  # Draw game behind pause menu
+            self.screen.blit(self._overlay, (0, 0))
+            self.draw_text("PAUSED", WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 - 40, self.big_font)
+            self.draw_text("Press SPACE to Resume", WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 20)
+            self._paused_frame = self.screen.copy()
+        else:
+            self.screen.blit(self._paused_frame, (0, 0))
     
     def draw_game_over(self):
         """Draw the game over screen."""
         self.screen.fill(BLACK)
+        if self.effects is not None:
+            self.effects.draw(self.screen, self)
         
         self.draw_text("GAME OVER", WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 - 100, self.big_font, RED)
         self.draw_text(f"Final Score: {self.score}", WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 - 40)
+        
+        if self.leaderboard is not None:
+            top_scores = self.leaderboard.top_scores(3)
+            if top_scores:
+                scores_text = "  ".join(str(entry.score) for entry in top_scores)
+                self.draw_text(f"High Scores: {scores_text}", WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 - 10,
+                               color=GRAY)
         self.draw_text("Press R to Restart", WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 20)
         self.draw_text("Press M for Menu", WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 60)
         self.draw_text("Press ESC to Quit", WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 100)
@@ -592,13 +1025,49 @@ class Game:
                       WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 20)
         
         # Show countdown
-        countdown = 3 - (self.transition_timer // 60)
+        countdown = self.countdown()
         if countdown > 0:
             self.draw_text(f"{countdown}", WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 60, 
                           self.big_font, WHITE)
 
     def draw(self):
-        """Draw the current game state."""
+        """Draw the current game state and show it."""
+        self.draw_state()
+        self.present()
+    
+    def present(self):
+        """Scale the logical screen into the window and show it."""
+        window = pygame.display.get_surface()
+        if window.get_size() != self._window_size:
+            self._layout(window)
+        if self._viewport is None:
+            window.blit(self.screen, (0, 0))
+        else:
+            # Scale straight into the window instead of through a temporary Surface
+            self.scale(self.screen, self._viewport.size, window.subsurface(self._viewport))
+        pygame.display.flip()
+    
+    def _layout(self, window):
+        """Fit the logical screen into a new window size, letterboxed to keep its aspect ratio."""
+        self._window_size = window_width, window_height = window.get_size()
+        if self._window_size == self.screen.get_size():
+            self._viewport = None
+            return
+        factor = min(window_width / WINDOW_WIDTH, window_height / WINDOW_HEIGHT)
+        rect = pygame.Rect(0, 0, max(1, round(WINDOW_WIDTH * factor)), max(1, round(WINDOW_HEIGHT * factor)))
+        rect.center = (window_width // 2, window_height // 2)
+        window.fill(BLACK)
+        self._viewport = rect
+    
+    def countdown(self) -> int:
+        """Return the number shown on the level transition screen."""
+        return LEVEL_TRANSITION_TICKS // COUNTDOWN_TICKS - self.transition_timer // COUNTDOWN_TICKS
+    
+    def draw_state(self):
+        """Draw the current game state onto ``self.screen``."""
+        if self.state != GameState.PAUSED:
+            self._paused_frame = None
+        
         if self.state == GameState.MENU:
             self.draw_menu()
         elif self.state == GameState.PLAYING:
@@ -609,26 +1078,272 @@ class Game:
             self.draw_game_over()
         elif self.state == GameState.LEVEL_TRANSITION:
             self.draw_level_transition()
-        
-        pygame.display.flip()
     
-    def run(self):
-        """Main game loop."""
+    def run(self) -> Optional[str]:
+        """Main game loop; returns the recorder's summary if recording."""
         running = True
         
         while running:
-            running = self.handle_input()
-            self.update()
-            self.draw()
-            self.clock.tick(self.speed)
+            running = self.tick()
         
+        summary = None
+        if self.recorder is not None:
+            # Finish encoding while pygame is still initialised
+            summary = self.recorder.close()
         pygame.quit()
-        sys.exit()
+        return summary
+
+    def tick(self) -> bool:
+        """Run one pass of the main loop; returns False when the game should quit."""
+        if self.can_idle():
+            return self.wait_idle()
+        
+        running = self.frame()
+        self.clock.tick(self.speed)
+        return running
+    
+    def can_idle(self) -> bool:
+        """True if the screen only needs redrawing when it changes."""
+        return (self.idle_wait and self.recorder is None and self.state in self.IDLE_STATES
+                and not (self.effects is not None and self.effects.active))
+    
+    def frame(self) -> bool:
+        """Handle input, update and draw once without waiting; returns False when the game should quit.
+
+        Idle screens are only redrawn when they change.
+        """
+        events = pygame.event.get()
+        if any(event.type in REDRAW_EVENTS for event in events):
+            self._drawn_key = None
+        running = self.handle_input(events)
+        self.update()
+        if self.can_idle():
+            self.show_idle()
+        else:
+            self._drawn_key = None
+            self.draw()
+            if self.recorder is not None:
+                self.recorder.capture(self.screen)
+        return running
+    
+    def show_idle(self):
+        """Draw the idle screen if it changed since it was last drawn."""
+        key = self._idle_key()
+        if key != self._drawn_key:
+            self.draw()
+            self._drawn_key = key
+    
+    def wait_idle(self) -> bool:
+        """Show an idle screen if it changed, then sleep until input or the next countdown step.
 
-def main():
+        Level transitions are advanced by the ticks that would have passed
+        at the current speed, so the countdown keeps its normal pace.
+        """
+        self.show_idle()
+        
+        timeout = 0
+        if self.state == GameState.LEVEL_TRANSITION:
+            # Wake up when the countdown number changes or the transition ends
+            timer = self.transition_timer
+            remaining = min(COUNTDOWN_TICKS - timer % COUNTDOWN_TICKS, LEVEL_TRANSITION_TICKS + 1 - timer)
+            timeout = max(1, int((remaining - self._tick_carry) * 1000 / self.speed) + 1)
+        
+        started = pygame.time.get_ticks()
+        event = pygame.event.wait(timeout) if timeout else pygame.event.wait()
+        events = [event] + pygame.event.get() if event.type != pygame.NOEVENT else pygame.event.get()
+        if any(event.type in REDRAW_EVENTS for event in events):
+            self._drawn_key = None
+        
+        if self.state == GameState.LEVEL_TRANSITION:
+            ticks = (pygame.time.get_ticks() - started) * self.speed / 1000 + self._tick_carry
+            self._tick_carry = ticks % 1
+            for _ in range(int(ticks)):
+                self.update()
+                if self.state != GameState.LEVEL_TRANSITION:
+                    self._tick_carry = 0.0
+                    break
+        
+        running = self.handle_input(events)
+        # The busy loop restarts its frame timing from here
+        self.clock.tick()
+        return running
+    
+    def _idle_key(self):
+        """Return a value that changes whenever the idle screen would look different."""
+        if self.state == GameState.LEVEL_TRANSITION:
+            return (self.state, self.level_manager.current_level, self.countdown())
+        return (self.state, self.score)
+
+def play_mode(caption: str, font_size: int, frame):
+    """Run one of the extra game modes in a window until it is closed or ESC is pressed.
+
+    ``frame(screen, font, keys)`` is called once a tick with the keys
+    pressed since the last call. It updates and draws the game and returns
+    the ticks per second to run at.
+    """
+    pygame.init()
+    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    pygame.display.set_caption(caption)
+    font = pygame.font.Font(None, font_size)
+    clock = pygame.time.Clock()
+    while True:
+        keys = []
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                pygame.quit()
+                return
+            if event.type == pygame.KEYDOWN:
+                keys.append(event.key)
+        speed = frame(screen, font, keys)
+        pygame.display.flip()
+        clock.tick(speed)
+
+def parse_size(text: str) -> Tuple[int, int]:
+    """Parse a ``WIDTHxHEIGHT`` string."""
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+def main(argv=None):
     """Main function to start the game."""
-    game = Game()
-    game.run()
+    parser = argparse.ArgumentParser(description="Classic Snake Game")
+    parser.add_argument("--stats-db", default=os.path.join(os.path.expanduser("~"), ".snake_game", "stats.db"),
+                        help="SQLite file for high scores and statistics")
+    parser.add_argument("--no-stats", action="store_true", help="Do not record high scores or statistics")
+    parser.add_argument("--telemetry", metavar="DIR", help="Write a binary telemetry event log to DIR")
+    parser.add_argument("--record", metavar="PATH",
+                        help="Record gameplay to a video file (.gif, .mp4) or a directory of PNG frames")
+    parser.add_argument("--window-size", type=parse_size, metavar="WxH", help="Initial window size, e.g. 1600x1200")
+    parser.add_argument("--fullscreen", action="store_true", help="Fill the whole display")
+    parser.add_argument("--scaling", choices=sorted(SCALERS), default="nearest",
+                        help="Filter used to scale the game to the window")
+    parser.add_argument("--save", default=os.path.join(os.path.expanduser("~"), ".snake_game", "save.bin"),
+                        help="File a game in progress is saved to on pause and quit, and resumed from")
+    parser.add_argument("--no-save", action="store_true", help="Do not save or resume games")
+    parser.add_argument("--no-effects", action="store_true", help="Turn off particle effects")
+    parser.add_argument("--no-sound", action="store_true", help="Turn off sound effects")
+    parser.add_argument("--sounds", metavar="DIR", help="Directory of NAME.wav or NAME.ogg files replacing the "
+                        "built-in sounds (turn, eat, portal, death)")
+    parser.add_argument("--heatmap", default=os.path.join(os.path.expanduser("~"), ".snake_game", "heatmap.npy"),
+                        help="File of per-level visit and death counts, shown with H while playing")
+    parser.add_argument("--no-heatmap", action="store_true", help="Do not count visits and deaths")
+    parser.add_argument("--dataset", metavar="DIR",
+                        help="Record every tick played to an imitation learning dataset in DIR")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="Track allocations and GC pauses per frame and print a report on exit")
+    args = parser.parse_args(argv)
+    
+    store = None
+    tracker = None
+    if not args.no_stats:
+        import sqlite3
+        from stats_store import StatsStore, StatsTracker
+        try:
+            store = StatsStore(args.stats_db)
+            tracker = StatsTracker(store)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Statistics disabled: {e}")
+    
+    game = Game(leaderboard=store, window_size=args.window_size, scaling=args.scaling,
+                fullscreen=args.fullscreen)
+    if tracker is not None:
+        game.add_listener(tracker.on_game_event)
+    
+    if not args.no_effects:
+        from particles import GameEffects
+        game.effects = GameEffects()
+        game.add_listener(game.effects.on_game_event)
+    
+    audio = None
+    if not args.no_sound:
+        from audio import SOUND_DIR, AudioPlayer, SoundBank
+        try:
+            audio = AudioPlayer(SoundBank(args.sounds or SOUND_DIR))
+        except pygame.error as e:
+            print(f"Sound disabled: {e}")
+        else:
+            game.audio = audio
+            game.add_listener(audio.on_game_event)
+    
+    telemetry = None
+    if args.telemetry:
+        from telemetry import TelemetryRecorder
+        telemetry = TelemetryRecorder(args.telemetry)
+        game.add_listener(telemetry.on_game_event)
+    
+    if args.record:
+        from recording import FrameRecorder
+        try:
+            game.recorder = FrameRecorder(args.record, game.screen.get_size(), game.screen.get_masks(),
+                                          fps=MAX_SPEED)
+        except (OSError, RuntimeError) as e:
+            print(f"Recording disabled: {e}")
+    
+    saver = None
+    if not args.no_save:
+        import savegame
+        try:
+            if savegame.load(args.save, game):
+                print(f"Resumed saved game from {args.save}")
+        except (OSError, ValueError) as e:
+            print(f"Ignoring saved game: {e}")
+            game.reset_game()
+        try:
+            saver = savegame.SaveWriter(args.save)
+        except OSError as e:
+            print(f"Saving disabled: {e}")
+        else:
+            game.saver = saver
+            game.add_listener(saver.on_game_event)
+    
+    heatmap = None
+    if not args.no_heatmap:
+        from heatmap import Heatmap
+        try:
+            heatmap = Heatmap(args.heatmap)
+        except (OSError, ValueError) as e:
+            print(f"Heatmaps disabled: {e}")
+        else:
+            heatmap.attach(game)
+            game.heatmap = heatmap
+    
+    dataset = None
+    if args.dataset:
+        from dataset import DatasetRecorder
+        try:
+            dataset = DatasetRecorder(args.dataset)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Dataset recording disabled: {e}")
+        else:
+            dataset.attach(game)
+    
+    profiler = None
+    if args.profile_memory:
+        from frame_profiler import FrameProfiler
+        profiler = FrameProfiler()
+        profiler.attach(game)
+    
+    try:
+        recording = game.run()
+        if recording is not None:
+            print(recording)
+    finally:
+        if profiler is not None:
+            profiler.detach()
+            print(profiler.report())
+        if audio is not None:
+            audio.close()
+        if heatmap is not None:
+            print(heatmap.close())
+        if dataset is not None:
+            print(dataset.close())
+        if saver is not None:
+            saver.close()
+        if telemetry is not None:
+            telemetry.close()
+        if tracker is not None:
+            tracker.close()
+        if store is not None:
+            store.close()
 
 if __name__ == "__main__":
     main()
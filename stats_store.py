@@ -0,0 +1,271 @@
+"""
+Persistent high scores and statistics for the Snake Game.
+
+Results are kept in a local SQLite database in WAL mode. Writes are queued
+and committed in batches by a background thread so that disk I/O never
+stalls the frame loop; the game over screen reads from an in-memory cache.
+"""
+
+import bisect
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from snake_game import GameEvent, GameState
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    played_at REAL NOT NULL,
+    score INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    apples INTEGER NOT NULL,
+    death_cause TEXT,
+    duration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_games_score ON games (score DESC, played_at);
+CREATE INDEX IF NOT EXISTS idx_games_death_cause ON games (death_cause);
+
+CREATE TABLE IF NOT EXISTS level_times (
+    id INTEGER PRIMARY KEY,
+    played_at REAL NOT NULL,
+    level INTEGER NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_level_times_level ON level_times (level, seconds);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    ended_at REAL NOT NULL,
+    games_played INTEGER NOT NULL,
+    total_score INTEGER NOT NULL,
+    apples_eaten INTEGER NOT NULL,
+    best_score INTEGER NOT NULL
+);
+"""
+
+INSERT_GAME = ("INSERT INTO games (played_at, score, level, apples, death_cause, duration) "
+               "VALUES (?, ?, ?, ?, ?, ?)")
+INSERT_LEVEL_TIME = "INSERT INTO level_times (played_at, level, seconds) VALUES (?, ?, ?)"
+INSERT_SESSION = ("INSERT INTO sessions (started_at, ended_at, games_played, total_score, apples_eaten, best_score) "
+                  "VALUES (?, ?, ?, ?, ?, ?)")
+
+# Number of leaderboard entries kept in memory for the game over screen
+CACHE_SIZE = 10
+
+
+class ScoreEntry(NamedTuple):
+    """A single leaderboard row."""
+    score: int
+    level: int
+    death_cause: Optional[str]
+    played_at: float
+
+
+class StatsStore:
+    """SQLite-backed store with a background writer and a read-through score cache."""
+
+    def __init__(self, path: str, batch_size: int = 64, flush_interval: float = 0.5):
+        """Open (or create) the database at ``path`` and start the writer thread."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        # Connection used for reads from the game thread
+        self._reader = sqlite3.connect(path, check_same_thread=False)
+        self._reader.execute("PRAGMA journal_mode=WAL")
+        self._reader.executescript(SCHEMA)
+        self._reader.commit()
+
+        self._top_cache: Optional[List[ScoreEntry]] = None
+        self._cache_lock = threading.Lock()
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="stats-writer", daemon=True)
+        self._writer.start()
+
+    # Writes (non-blocking, called from the game thread)
+
+    def record_game(self, score: int, level: int, apples: int, death_cause: Optional[str], duration: float):
+        """Queue a finished game and update the cached leaderboard."""
+        played_at = time.time()
+        with self._cache_lock:
+            # Load the cache before queueing the row, so the writer cannot
+            # commit it first and the new score is counted exactly once
+            if self._top_cache is None:
+                self._top_cache = self._query_top_scores(CACHE_SIZE)
+            self._queue.put((INSERT_GAME, (played_at, score, level, apples, death_cause, duration)))
+            # Cache is sorted by descending score, earliest first on ties
+            keys = [(-e.score, e.played_at) for e in self._top_cache]
+            index = bisect.bisect_right(keys, (-score, played_at))
+            if index < CACHE_SIZE:
+                self._top_cache.insert(index, ScoreEntry(score, level, death_cause, played_at))
+                del self._top_cache[CACHE_SIZE:]
+
+    def record_level_time(self, level: int, seconds: float):
+        """Queue the time taken to complete a level."""
+        self._queue.put((INSERT_LEVEL_TIME, (time.time(), level, seconds)))
+
+    def record_session(self, started_at: float, ended_at: float, games_played: int,
+                       total_score: int, apples_eaten: int, best_score: int):
+        """Queue summary statistics for a play session."""
+        self._queue.put((INSERT_SESSION, (started_at, ended_at, games_played, total_score,
+                                          apples_eaten, best_score)))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued write has been committed."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        """Commit pending writes, stop the writer thread and close the database."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        self._reader.close()
+
+    def _write_loop(self):
+        """Collect queued writes into batches and commit each batch at once."""
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        running = True
+
+        while running:
+            item = self._queue.get()
+            batch = []
+            waiters = []
+            deadline = time.monotonic() + self.flush_interval
+
+            while True:
+                if item is None:
+                    running = False
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                with connection:
+                    for sql, params in batch:
+                        connection.execute(sql, params)
+            for waiter in waiters:
+                waiter.set()
+
+        connection.close()
+
+    # Reads (served from the cache where possible)
+
+    def top_scores(self, n: int = 10) -> List[ScoreEntry]:
+        """Return the ``n`` best games, highest score first."""
+        if n > CACHE_SIZE:
+            return self._query_top_scores(n)
+
+        with self._cache_lock:
+            if self._top_cache is None:
+                self._top_cache = self._query_top_scores(CACHE_SIZE)
+            return self._top_cache[:n]
+
+    def high_score(self) -> int:
+        """Return the best score ever recorded, or 0."""
+        top = self.top_scores(1)
+        return top[0].score if top else 0
+
+    def best_level_times(self, level: int, n: int = 10) -> List[float]:
+        """Return the ``n`` fastest completion times for ``level`` in seconds."""
+        rows = self._reader.execute(
+            "SELECT seconds FROM level_times WHERE level = ? ORDER BY seconds LIMIT ?", (level, n))
+        return [seconds for (seconds,) in rows]
+
+    def deaths_by_cause(self) -> Dict[str, int]:
+        """Return the number of games ended by each death cause."""
+        rows = self._reader.execute(
+            "SELECT death_cause, COUNT(*) FROM games WHERE death_cause IS NOT NULL GROUP BY death_cause")
+        return dict(rows.fetchall())
+
+    def _query_top_scores(self, n: int) -> List[ScoreEntry]:
+        """Read the leaderboard straight from the database."""
+        rows = self._reader.execute(
+            "SELECT score, level, death_cause, played_at FROM games ORDER BY score DESC, played_at LIMIT ?", (n,))
+        return [ScoreEntry(*row) for row in rows]
+
+
+class StatsTracker:
+    """Game listener that times games and levels and records them in a StatsStore."""
+
+    def __init__(self, store: StatsStore):
+        """Start a new play session."""
+        self.store = store
+        self.session_started_at = time.time()
+        self.games_played = 0
+        self.total_score = 0
+        self.apples_eaten = 0
+        self.best_score = 0
+        self._game_started = None
+        self._level_started = None
+        self._game_apples = 0
+        self._closed = False
+
+    def on_game_event(self, event: GameEvent, game):
+        """Handle a GameEvent reported by ``Game.notify``."""
+        now = time.monotonic()
+        if event == GameEvent.GAME_START:
+            self._game_started = now
+            self._level_started = now
+            self._game_apples = 0
+        elif event == GameEvent.GAME_RESUMED:
+            # Play before the game was saved is not timed; count from now. Each apple
+            # scores 10, so the score tells how many were eaten on finished levels.
+            self._game_started = now
+            self._game_apples = game.score // 10
+            if game.state == GameState.LEVEL_TRANSITION:
+                self._level_started = None
+            else:
+                self._level_started = now
+                self._game_apples -= game.apples_eaten
+        elif event == GameEvent.LEVEL_START:
+            self._level_started = now
+        elif event == GameEvent.LEVEL_COMPLETE:
+            if self._level_started is not None:
+                self.store.record_level_time(game.level_manager.current_level, now - self._level_started)
+            self._game_apples += game.apples_eaten
+            self._level_started = None
+        elif event == GameEvent.DEATH:
+            duration = now - self._game_started if self._game_started is not None else 0.0
+            cause = game.death_cause.value if game.death_cause is not None else None
+            apples = self._game_apples + game.apples_eaten
+            self.store.record_game(game.score, game.level_manager.current_level, apples, cause, duration)
+            self.games_played += 1
+            self.total_score += game.score
+            self.apples_eaten += apples
+            self.best_score = max(self.best_score, game.score)
+            self._game_started = None
+            self._level_started = None
+
+    def close(self):
+        """Record the session summary."""
+        if self._closed:
+            return
+        self._closed = True
+        self.store.record_session(self.session_started_at, time.time(), self.games_played,
+                                  self.total_score, self.apples_eaten, self.best_score)
@@ -0,0 +1,279 @@
+"""
+Telemetry event stream for the Snake Game.
+
+Game events are packed into a preallocated ring buffer on the game thread
+and written by a background thread to rotating binary log files. Each
+record is length-prefixed so readers can skip records they do not know.
+When the buffer is full new events are dropped and counted; the game
+thread never blocks.
+
+Usage:
+    python telemetry.py summary LOG_DIR
+    python telemetry.py export LOG_DIR -o events.jsonl
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Iterable, Iterator, List, NamedTuple, Optional, TextIO
+
+from snake_game import DeathCause, GameEvent
+
+MAGIC = b"SNKT"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sHH")  # magic, version, record size
+
+# length, event, death cause, level, x, y, value, wall clock time (ns)
+RECORD = struct.Struct("<HBBHhhdq")
+PAYLOAD_SIZE = RECORD.size - 2
+
+DEATH_CAUSE_CODES = {None: 0, DeathCause.WALL: 1, DeathCause.SELF: 2, DeathCause.OBSTACLE: 3}
+DEATH_CAUSE_NAMES = {code: (cause.value if cause else None) for cause, code in DEATH_CAUSE_CODES.items()}
+
+# Records read per chunk when streaming log files
+READ_CHUNK_RECORDS = 4096
+
+
+class TelemetryEvent(NamedTuple):
+    """A decoded telemetry record."""
+    event: str
+    death_cause: Optional[str]
+    level: int
+    x: int
+    y: int
+    value: float
+    time_ns: int
+
+
+class TelemetryRecorder:
+    """Ring-buffered event recorder with a background writer for rotating log files."""
+
+    def __init__(self, directory: str, capacity: int = 65536, flush_interval: float = 0.25,
+                 max_file_bytes: int = 16 * 1024 * 1024, max_files: int = 32):
+        """Create the log directory and start the writer thread."""
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.dropped = 0
+
+        # Single producer (game thread), single consumer (writer thread).
+        # Both counters only ever grow; the slot is ``counter % capacity``.
+        self._buffer = bytearray(capacity * RECORD.size)
+        self._head = 0
+        self._tail = 0
+
+        self._file = None
+        self._file_bytes = 0
+        self._file_index = 0
+        self._stop = threading.Event()
+        self._writer = threading.Thread(target=self._write_loop, name="telemetry-writer", daemon=True)
+        self._writer.start()
+
+    def emit(self, event: int, death_cause: int, level: int, x: int, y: int, value: float):
+        """Append one record to the ring buffer, or drop it if the buffer is full."""
+        head = self._head
+        if head - self._tail >= self.capacity:
+            self.dropped += 1
+            return
+        RECORD.pack_into(self._buffer, (head % self.capacity) * RECORD.size,
+                         PAYLOAD_SIZE, event, death_cause, level, x, y, value, time.time_ns())
+        self._head = head + 1
+
+    def on_game_event(self, event: GameEvent, game):
+        """Game listener that records gameplay events."""
+        if event == GameEvent.SPEED_CHANGE:
+            value = game.speed
+        elif event == GameEvent.LEVEL_START or event == GameEvent.LEVEL_COMPLETE:
+            value = game.apples_eaten
+        else:
+            value = game.score
+        x, y = game.snake.body[0]
+        self.emit(event.value, DEATH_CAUSE_CODES[game.death_cause], game.level_manager.current_level,
+                  x, y, value)
+
+    def close(self):
+        """Flush everything still buffered and stop the writer thread."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._writer.join()
+
+    def _write_loop(self):
+        """Periodically copy buffered records to the current log file."""
+        while not self._stop.wait(self.flush_interval):
+            self._drain()
+        self._drain()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _drain(self):
+        """Write all complete records between the tail and head counters."""
+        head = self._head
+        tail = self._tail
+        if head == tail:
+            return
+
+        view = memoryview(self._buffer)
+        start = (tail % self.capacity) * RECORD.size
+        end = (head % self.capacity) * RECORD.size
+        if end > start:
+            chunks = [view[start:end]]
+        elif end == 0:
+            chunks = [view[start:]]
+        else:
+            chunks = [view[start:], view[:end]]
+
+        for chunk in chunks:
+            self._write(chunk)
+        self._file.flush()
+        self._tail = head
+
+    def _write(self, data):
+        """Write records to the current file, rotating when it is full."""
+        if self._file is None or self._file_bytes >= self.max_file_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._file_bytes += len(data)
+
+    def _rotate(self):
+        """Start a new log file and delete the oldest ones beyond ``max_files``."""
+        if self._file is not None:
+            self._file.close()
+
+        self._file_index += 1
+        name = time.strftime("telemetry-%Y%m%d-%H%M%S") + f"-{os.getpid()}-{self._file_index:04d}.bin"
+        self._file = open(os.path.join(self.directory, name), "wb")
+        self._file.write(FILE_HEADER.pack(MAGIC, VERSION, RECORD.size))
+        self._file_bytes = FILE_HEADER.size
+
+        logs = log_files(self.directory)
+        for old in logs[:max(0, len(logs) - self.max_files)]:
+            os.remove(old)
+
+
+def log_files(directory: str) -> List[str]:
+    """Return telemetry log files in ``directory``, oldest first."""
+    names = sorted(name for name in os.listdir(directory)
+                   if name.startswith("telemetry-") and name.endswith(".bin"))
+    return [os.path.join(directory, name) for name in names]
+
+
+def iter_raw_records(path: str) -> Iterator[tuple]:
+    """Stream raw record tuples from a single log file."""
+    with open(path, "rb") as f:
+        header = f.read(FILE_HEADER.size)
+        if len(header) < FILE_HEADER.size:
+            return
+        magic, version, record_size = FILE_HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            raise ValueError(f"{path}: not a version {VERSION} telemetry log")
+
+        while True:
+            chunk = f.read(READ_CHUNK_RECORDS * RECORD.size)
+            # A trailing partial record means the writer was interrupted
+            partial = len(chunk) % RECORD.size
+            if partial:
+                chunk = chunk[:-partial]
+            for record in RECORD.iter_unpack(chunk):
+                if record[0] != PAYLOAD_SIZE:
+                    raise ValueError(f"{path}: corrupt record length {record[0]}")
+                yield record
+            if partial or len(chunk) < READ_CHUNK_RECORDS * RECORD.size:
+                return
+
+
+def iter_events(paths: Iterable[str]) -> Iterator[TelemetryEvent]:
+    """Stream decoded events from several log files in order."""
+    names = {event.value: event.name.lower() for event in GameEvent}
+    for path in paths:
+        for _, event, cause, level, x, y, value, time_ns in iter_raw_records(path):
+            yield TelemetryEvent(names.get(event, str(event)), DEATH_CAUSE_NAMES.get(cause),
+                                 level, x, y, value, time_ns)
+
+
+def export_jsonl(paths: Iterable[str], out: TextIO) -> int:
+    """Write events as JSON lines and return how many were written."""
+    count = 0
+    for event in iter_events(paths):
+        out.write(json.dumps(event._asdict()))
+        out.write("\n")
+        count += 1
+    return count
+
+
+def summarize(paths: Iterable[str]) -> dict:
+    """Aggregate event counts, deaths and apples per level in one streaming pass."""
+    events = Counter()
+    deaths = Counter()
+    level_deaths = Counter()
+    level_apples = Counter()
+    death_cells = defaultdict(Counter)
+    max_speed = 0.0
+    max_score = 0
+
+    death_code = GameEvent.DEATH.value
+    apple_code = GameEvent.APPLE_EATEN.value
+    speed_code = GameEvent.SPEED_CHANGE.value
+    for path in paths:
+        for _, event, cause, level, x, y, value, _ in iter_raw_records(path):
+            events[event] += 1
+            if event == death_code:
+                deaths[DEATH_CAUSE_NAMES.get(cause)] += 1
+                level_deaths[level] += 1
+                death_cells[level][(x, y)] += 1
+                max_score = max(max_score, int(value))
+            elif event == apple_code:
+                level_apples[level] += 1
+            elif event == speed_code:
+                max_speed = max(max_speed, value)
+
+    names = {event.value: event.name.lower() for event in GameEvent}
+    return {
+        "events": {names.get(code, str(code)): count for code, count in sorted(events.items())},
+        "deaths_by_cause": dict(deaths),
+        "deaths_by_level": dict(sorted(level_deaths.items())),
+        "apples_by_level": dict(sorted(level_apples.items())),
+        "deadliest_cells": {level: [list(cell) + [count] for cell, count in cells.most_common(5)]
+                            for level, cells in sorted(death_cells.items())},
+        "max_speed": max_speed,
+        "max_score": max_score,
+    }
+
+
+def main(argv=None):
+    """Command line interface for inspecting telemetry logs."""
+    parser = argparse.ArgumentParser(description="Inspect Snake Game telemetry logs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    summary_parser = subparsers.add_parser("summary", help="Aggregate events from a log directory")
+    summary_parser.add_argument("directory")
+
+    export_parser = subparsers.add_parser("export", help="Export events as JSON lines")
+    export_parser.add_argument("directory")
+    export_parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+
+    args = parser.parse_args(argv)
+    paths = log_files(args.directory)
+
+    if args.command == "summary":
+        print(json.dumps(summarize(paths), indent=2))
+    elif args.command == "export":
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as out:
+                count = export_jsonl(paths, out)
+            print(f"Exported {count} events to {args.output}")
+        else:
+            export_jsonl(paths, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+"""
+Shared setup for the tests.
+
+The game modules live at the repository root and some of them set up
+pygame when imported, so the root goes on ``sys.path`` and SDL is pointed
+at its dummy drivers before any test module imports them.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,12 @@
+"""
+Tests of the multi-snake arena against a naive reference.
+
+``arena.check`` plays noisy bot games and compares every tick with
+``naive_deaths`` and an occupancy grid rebuilt from the snake bodies.
+"""
+
+import arena
+
+
+def test_occupancy_grid_matches_naive_scan():
+    assert arena.check(range(6), max_ticks=1500) > 0
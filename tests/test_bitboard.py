@@ -0,0 +1,28 @@
+"""
+Differential tests of the bitboard engine against GameLogic.
+
+``bitboard.differential_test`` plays both engines side by side and fails
+on the first tick where their state or events differ.
+"""
+
+import bitboard
+from snake_game import GameLogic
+
+SEEDS = [0, 1, 7, 42]
+STEPS = 3000
+
+
+def test_bitboard_game_matches_game_logic():
+    ticks, games = bitboard.differential_test(SEEDS, STEPS)
+    assert ticks == len(SEEDS) * STEPS
+    assert games >= len(SEEDS)
+
+
+def test_replayed_games_end_alike():
+    for seed in SEEDS:
+        actions = bitboard.record_actions(seed, STEPS)
+        reference = bitboard.replay(GameLogic, seed, actions)
+        candidate = bitboard.replay(bitboard.BitboardGame, seed, actions)
+        assert candidate.rng.getstate() == reference.rng.getstate(), seed
+        assert (candidate.score, candidate.moves) == (reference.score, reference.moves), seed
+        assert list(candidate.snake.body) == list(reference.snake.body), seed
@@ -0,0 +1,12 @@
+"""
+Tests of recording and reading back play datasets.
+
+``dataset.check`` records a bot over two sessions into one dataset and
+compares the rows read back, streamed and sampled, with the ticks played.
+"""
+
+import dataset
+
+
+def test_recorded_rows_read_back():
+    dataset.check(4000)
@@ -0,0 +1,17 @@
+"""
+Tests of chunk streaming in the endless world.
+
+``endless.check`` wanders through a world and fails if a chunk near the
+head is missing, the cache outgrows its capacity, a regenerated chunk
+differs or any chunk had to be generated on demand.
+"""
+
+import pytest
+
+import endless
+
+
+@pytest.mark.parametrize("seed", [0, 3])
+def test_chunks_are_streamed_ahead_of_the_snake(seed):
+    generated, _ = endless.check(seed, 8000)
+    assert generated > 0
@@ -0,0 +1,65 @@
+"""
+Differential tests of the compiled simulation kernels against GameLogic.
+
+Whether the kernels are compiled is decided when kernels.py is imported,
+so each mode runs in its own interpreter, with NUMBA_DISABLE_JIT set or
+unset. ``kernels.differential_test`` fails on the first tick where the
+engines differ and compares the final random generator states; the
+recorded games are then replayed in bulk with ``KernelGame.play``.
+"""
+
+import importlib.util
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEEDS = [0, 1, 7, 42]
+STEPS = 3000
+
+SCRIPT = f"""
+import zlib
+from array import array
+
+import kernels
+from snake_game import GameLogic
+
+print("compiled" if kernels.JIT else "interpreted")
+ticks, games = kernels.differential_test({SEEDS!r}, {STEPS})
+assert ticks == {len(SEEDS) * STEPS}, ticks
+for seed in {SEEDS!r}:
+    actions = kernels.record_actions(seed, {STEPS})
+    reference = kernels.replay_engine(GameLogic, seed, actions)
+    game = kernels.play_games(kernels.KernelGame, seed, kernels.games_of(actions))
+    game.sync_rng()
+    assert game.rng.getstate() == reference.rng.getstate(), seed
+    print(zlib.crc32(array("I", game.rng.getstate()[1])))
+"""
+
+
+def run_kernels(disable_jit: bool) -> list:
+    """Run SCRIPT with or without the JIT and return the lines it printed."""
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1",
+               PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    env.pop("NUMBA_DISABLE_JIT", None)
+    if disable_jit:
+        env["NUMBA_DISABLE_JIT"] = "1"
+    result = subprocess.run([sys.executable, "-c", SCRIPT], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=600)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.split()
+
+
+def test_interpreted_kernels_match_game_logic():
+    lines = run_kernels(disable_jit=True)
+    assert lines[0] == "interpreted"
+
+
+@pytest.mark.skipif(importlib.util.find_spec("numba") is None, reason="numba is not installed")
+def test_compiled_kernels_match_interpreted():
+    compiled = run_kernels(disable_jit=False)
+    interpreted = run_kernels(disable_jit=True)
+    assert compiled[0] == "compiled"
+    assert compiled[1:] == interpreted[1:]
@@ -0,0 +1,28 @@
+"""
+Tests of StepHistory undo and redo on the engines it supports.
+
+``lookahead.check`` plays each seed through, stepping forward with a
+``StepHistory`` and making excursions that are undone and redone, and
+fails if the game ever differs from one that played the same moves
+without undoing anything.
+"""
+
+import random
+
+import pytest
+
+import lookahead
+from compact import CompactGame
+
+SEEDS = [0, 1, 7, 42]
+STEPS = 1500
+
+
+@pytest.mark.parametrize("engine", lookahead.ENGINES, ids=lambda engine: engine.__name__)
+def test_undo_and_redo_match_plain_play(engine):
+    assert lookahead.check(SEEDS, STEPS, engine=engine) == len(SEEDS) * STEPS
+
+
+def test_rejects_games_it_cannot_undo():
+    with pytest.raises(TypeError, match="StepHistory cannot undo moves"):
+        lookahead.StepHistory(CompactGame(random.Random(0)))
@@ -0,0 +1,392 @@
+"""
+Bot tournaments for the Snake Game.
+
+Every bot plays the same seeded games, and each seed is a match between all
+of them: the higher score wins (equal scores draw). Results update Elo
+ratings as each match completes.
+
+Bots are given as ``module:Class`` (or ``path/to/file.py:Class``), where the
+class is constructed without arguments and has a
+``choose_direction(game) -> Direction`` method, like the players in
+``bots.py``. Each bot runs sandboxed in its own process, with an optional
+memory limit. Every tick the game state is written to a shared-memory buffer
+in the ``savegame`` format (without the random generator, so food cannot be
+predicted) and the bot is woken with a semaphore. A bot that has not
+answered within its time budget keeps its last direction for that tick; a
+bot still busy or dead when a game ends is restarted.
+
+Games are spread across runner processes, each holding its own player
+processes, that pull (seed, bot) games from one shared queue as they become
+free, so a slow game never holds up the rest.
+
+Usage:
+    python tournament.py bots:GreedyBot bots:RandomBot lookahead:LookaheadBot
+                         [--games 200] [--workers 4] [--move-time 0.02] [--ratings ratings.csv]
+"""
+
+import argparse
+import ctypes
+import importlib
+import importlib.util
+import math
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+try:
+    import resource
+except ImportError:  # resource is POSIX only; bots run without a memory limit
+    resource = None
+
+import savegame
+from bitboard import BitboardGame
+from snake_game import GRID_HEIGHT, GRID_WIDTH, Direction, GameLogic, GameState
+
+# Upper bound on a serialized game without its random generator: body and
+# obstacle cells are 4 bytes each and there cannot be more of either than
+# cells on the board (plus the portal shaft)
+CHANNEL_BYTES = (savegame.HEADER.size + savegame.STATE.size + savegame.CRC.size
+                 + 12 * (GRID_WIDTH + 2) * (GRID_HEIGHT + 2))
+NO_MOVE = -1
+# Time a bot that missed its deadline gets to finish after the game ends
+SETTLE_TIME = 1.0
+INITIAL_RATING = 1500.0
+ELO_K = 16.0
+
+
+def load_bot(spec: str):
+    """Construct the bot described by ``module:Class`` or ``path.py:Class``."""
+    module_name, _, attribute = spec.rpartition(":")
+    if not module_name or not attribute:
+        raise ValueError(f"Bot must be given as module:Class, not {spec!r}")
+    if module_name.endswith(".py"):
+        module_spec = importlib.util.spec_from_file_location(os.path.basename(module_name)[:-3], module_name)
+        if module_spec is None:
+            raise ValueError(f"Cannot load bot module {module_name}")
+        module = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(module_name)
+    return getattr(module, attribute)()
+
+
+def _serve(spec: str, channel: "PlayerChannel", memory_limit: Optional[int]):
+    """Player process: answer move requests on ``channel`` until killed."""
+    if memory_limit and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    bot = load_bot(spec)
+    game = GameLogic(random.Random(0))
+    answered = 0
+    obstacles = None
+    while True:
+        channel.requested.acquire()
+        with channel.lock:
+            seq = channel.request_seq.value
+            data = ctypes.string_at(channel.state, channel.size.value)
+        if seq == answered:
+            # A request already answered late; the state has not changed since
+            continue
+        savegame.loads(data, game)
+        game.state = GameState.PLAYING
+        # Keep the previous obstacle list while the level is unchanged so bots can cache per level
+        current = game.level_manager.obstacles
+        if obstacles is not None and [o.positions for o in obstacles] == [o.positions for o in current]:
+            game.level_manager.obstacles = obstacles
+        else:
+            obstacles = current
+        try:
+            move = savegame.DIRECTION_INDEX[bot.choose_direction(game)]
+        except Exception:  # a broken bot forfeits the move, not the tournament
+            move = NO_MOVE
+        with channel.lock:
+            channel.reply_seq.value = seq
+            channel.reply.value = move
+        answered = seq
+        channel.replied.release()
+
+
+class PlayerChannel:
+    """Shared memory and semaphores between a runner and one player process."""
+
+    def __init__(self):
+        """Allocate the shared buffers."""
+        self.state = multiprocessing.RawArray(ctypes.c_char, CHANNEL_BYTES)
+        self.size = multiprocessing.RawValue(ctypes.c_uint32)
+        self.request_seq = multiprocessing.RawValue(ctypes.c_uint64)
+        self.reply_seq = multiprocessing.RawValue(ctypes.c_uint64)
+        self.reply = multiprocessing.RawValue(ctypes.c_int8)
+        self.lock = multiprocessing.Lock()
+        self.requested = multiprocessing.Semaphore(0)
+        self.replied = multiprocessing.Semaphore(0)
+
+
+class Player:
+    """A bot in its own process, asked for one move at a time under a deadline."""
+
+    def __init__(self, spec: str, memory_limit: Optional[int] = None):
+        """Start the player process for bot ``spec``."""
+        self.spec = spec
+        self.memory_limit = memory_limit
+        self.seq = 0
+        self.restarts = 0
+        self._start()
+
+    def _start(self):
+        """Start a fresh player process with a fresh channel."""
+        self.channel = PlayerChannel()
+        self.seq = 0
+        self.process = multiprocessing.Process(target=_serve, args=(self.spec, self.channel, self.memory_limit),
+                                               name=f"player {self.spec}", daemon=True)
+        self.process.start()
+
+    def ask(self, game: GameLogic, budget: float) -> Optional[Direction]:
+        """Return the bot's move for ``game``, or None if it is not given within ``budget`` seconds."""
+        data = savegame.dumps(game, include_rng=False)
+        channel = self.channel
+        self.seq += 1
+        with channel.lock:
+            ctypes.memmove(channel.state, data, len(data))
+            channel.size.value = len(data)
+            channel.request_seq.value = self.seq
+        channel.requested.release()
+        deadline = time.perf_counter() + budget
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or not channel.replied.acquire(timeout=remaining):
+                return None
+            # Earlier replies that missed their deadline are skipped
+            with channel.lock:
+                if channel.reply_seq.value == self.seq:
+                    move = channel.reply.value
+                    return None if move == NO_MOVE else savegame.DIRECTIONS[move]
+
+    def settle(self):
+        """After a game, restart the player if it is dead or still stuck on a move."""
+        deadline = time.perf_counter() + SETTLE_TIME
+        while self.process.is_alive() and self.channel.reply_seq.value != self.seq:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            self.channel.replied.acquire(timeout=remaining)
+        if self.process.is_alive() and self.channel.reply_seq.value == self.seq:
+            return
+        self.close()
+        self.restarts += 1
+        self._start()
+
+    def close(self):
+        """Stop the player process."""
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+
+
+class GameResult(NamedTuple):
+    """Outcome of one bot playing one seeded game."""
+
+    seed: int
+    bot: int
+    score: int
+    level: int
+    moves: int
+    missed: int
+    restarted: bool
+
+
+def play_game(player: Player, bot: int, seed: int, move_time: float, max_moves: int) -> GameResult:
+    """Play seed ``seed`` with ``player``, which keeps its direction on any move it misses."""
+    game = BitboardGame(random.Random(seed))
+    game.start_playing()
+    missed = 0
+    while game.state != GameState.GAME_OVER and game.moves < max_moves:
+        if game.state == GameState.PLAYING:
+            direction = player.ask(game, move_time)
+            if direction is None:
+                missed += 1
+            else:
+                game.snake.change_direction(direction)
+        game.update()
+    restarts = player.restarts
+    player.settle()
+    return GameResult(seed, bot, game.score, game.level_manager.current_level, game.moves, missed,
+                      player.restarts != restarts)
+
+
+def _run_games(specs: Sequence[str], tasks, results, move_time: float, max_moves: int,
+               memory_limit: Optional[int]):
+    """Runner process: play games from ``tasks`` until a None arrives."""
+    players: Dict[int, Player] = {}
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            seed, bot = task
+            if bot not in players:
+                players[bot] = Player(specs[bot], memory_limit)
+            results.put(play_game(players[bot], bot, seed, move_time, max_moves))
+    finally:
+        for player in players.values():
+            player.close()
+
+
+class Ratings:
+    """Elo ratings updated one match at a time."""
+
+    def __init__(self, names: Sequence[str], k: float = ELO_K):
+        """Start every bot in ``names`` at the initial rating."""
+        self.names = list(names)
+        self.k = k
+        self.ratings = [INITIAL_RATING] * len(names)
+        self.wins = [0] * len(names)
+        self.draws = [0] * len(names)
+        self.losses = [0] * len(names)
+        self.total_score = [0] * len(names)
+        self.missed = [0] * len(names)
+        self.restarts = [0] * len(names)
+        self.matches = 0
+
+    def record_match(self, results: Sequence[GameResult]):
+        """Rate one seed played by every bot; ``results`` is indexed by bot.
+
+        Every pair of bots counts as a game between them, all rated from the
+        ratings before the match, so the order of bots does not matter.
+        """
+        before = list(self.ratings)
+        for a in range(len(results)):
+            result = results[a]
+            self.total_score[a] += result.score
+            self.missed[a] += result.missed
+            self.restarts[a] += result.restarted
+            for b in range(len(results)):
+                if a == b:
+                    continue
+                if result.score > results[b].score:
+                    outcome = 1.0
+                    self.wins[a] += 1
+                elif result.score < results[b].score:
+                    outcome = 0.0
+                    self.losses[a] += 1
+                else:
+                    outcome = 0.5
+                    self.draws[a] += 1
+                expected = 1.0 / (1.0 + math.pow(10.0, (before[b] - before[a]) / 400.0))
+                self.ratings[a] += self.k * (outcome - expected)
+        self.matches += 1
+
+    def table(self) -> str:
+        """Return the ratings as a text table, best first."""
+        width = max(len(name) for name in self.names)
+        lines = [f"{'bot':{width}s} {'elo':>7s} {'won':>6s} {'drawn':>6s} {'lost':>6s} "
+                 f"{'avg score':>9s} {'missed':>7s} {'restarts':>8s}"]
+        for i in sorted(range(len(self.names)), key=lambda i: -self.ratings[i]):
+            lines.append(f"{self.names[i]:{width}s} {self.ratings[i]:7.1f} {self.wins[i]:6d} {self.draws[i]:6d} "
+                         f"{self.losses[i]:6d} {self.total_score[i] / max(self.matches, 1):9.1f} "
+                         f"{self.missed[i]:7d} {self.restarts[i]:8d}")
+        return "\n".join(lines)
+
+    def write_csv(self, path: str):
+        """Atomically replace ``path`` with the current ratings as CSV."""
+        temporary = path + ".tmp"
+        with open(temporary, "w") as f:
+            f.write("bot,elo,won,drawn,lost,matches,average_score,missed_moves,restarts\n")
+            for i, name in enumerate(self.names):
+                f.write(f"{name},{self.ratings[i]:.1f},{self.wins[i]},{self.draws[i]},{self.losses[i]},"
+                        f"{self.matches},{self.total_score[i] / max(self.matches, 1):.1f},"
+                        f"{self.missed[i]},{self.restarts[i]}\n")
+        os.replace(temporary, path)
+
+
+def tournament(specs: Sequence[str], seeds: Sequence[int], workers: int, move_time: float = 0.02,
+               max_moves: int = 20000, memory_limit: Optional[int] = None, on_match=None) -> Ratings:
+    """Play every seed with every bot and return the ratings.
+
+    ``on_match(ratings)`` is called after each match is rated.
+    """
+    for spec in specs:
+        load_bot(spec)  # fail here on a bad bot rather than in a player process
+    tasks = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    # Seed by seed, so matches complete (and are rated) steadily rather than all at the end
+    for seed in seeds:
+        for bot in range(len(specs)):
+            tasks.put((seed, bot))
+    runners = []
+    for i in range(workers):
+        tasks.put(None)
+        runner = multiprocessing.Process(target=_run_games, name=f"runner {i}",
+                                         args=(specs, tasks, results, move_time, max_moves, memory_limit))
+        runner.start()
+        runners.append(runner)
+
+    ratings = Ratings(specs)
+    pending: Dict[int, List[Optional[GameResult]]] = {}
+    try:
+        remaining = len(seeds) * len(specs)
+        while remaining:
+            try:
+                result = results.get(timeout=1.0)
+            except queue.Empty:
+                if not any(runner.is_alive() for runner in runners):
+                    raise RuntimeError("All tournament runners exited before finishing")
+                continue
+            remaining -= 1
+            match = pending.setdefault(result.seed, [None] * len(specs))
+            match[result.bot] = result
+            if all(match):
+                del pending[result.seed]
+                ratings.record_match(match)
+                if on_match is not None:
+                    on_match(ratings)
+        for runner in runners:
+            runner.join()
+    finally:
+        for runner in runners:
+            if runner.is_alive():
+                runner.terminate()
+    return ratings
+
+
+def main(argv=None):
+    """Command line entry point for bot tournaments."""
+    parser = argparse.ArgumentParser(description="Rate bots by playing them on the same seeded games")
+    parser.add_argument("bots", nargs="+", help="Bots as module:Class or path/to/file.py:Class")
+    parser.add_argument("--games", type=int, default=200, help="Number of seeded games (matches)")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--move-time", type=float, default=0.02, help="Seconds a bot has for each move")
+    parser.add_argument("--max-moves", type=int, default=20000, help="Move limit per game")
+    parser.add_argument("--memory-limit", type=int, metavar="MB", help="Address space limit per bot process")
+    parser.add_argument("--ratings", metavar="PATH", help="Keep a CSV ratings table up to date at PATH")
+    args = parser.parse_args(argv)
+    if len(args.bots) < 2:
+        parser.error("A tournament needs at least two bots")
+
+    written = 0.0
+
+    def on_match(ratings: Ratings):
+        nonlocal written
+        if sys.stdout.isatty():
+            print(f"\r{ratings.matches}/{args.games} matches ", end="", flush=True)
+        # Rewriting the table at most once a second keeps it current without slowing the tournament
+        if args.ratings and (time.monotonic() - written >= 1.0 or ratings.matches == args.games):
+            ratings.write_csv(args.ratings)
+            written = time.monotonic()
+
+    start = time.perf_counter()
+    ratings = tournament(args.bots, range(args.first_seed, args.first_seed + args.games), args.workers,
+                         args.move_time, args.max_moves,
+                         args.memory_limit * 1024 * 1024 if args.memory_limit else None, on_match)
+    elapsed = time.perf_counter() - start
+    if sys.stdout.isatty():
+        print("\r\033[K", end="")
+    print(f"{ratings.matches} matches in {elapsed:.1f}s")
+    print(ratings.table())
+
+
+if __name__ == "__main__":
+    main()